@@ -0,0 +1,252 @@
+import argparse
+import contextlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from pathlib import Path
+from typing import Any, Dict, FrozenSet, List, NamedTuple, Optional, Tuple
+
+import arquiva_email
+from progresso import ProgressReporter
+from registro import close_logger
+
+# --- Constantes ---
+TOOL_NAME = "agendador_arquivamento"
+# Pastas arquivadas ao mesmo tempo (threads do pool compartilhado por todas as pastas da lista)
+DEFAULT_WORKERS = 4
+# Pastas arquivadas ao mesmo tempo em um mesmo volume (disco ou compartilhamento de rede)
+DEFAULT_PER_VOLUME_LIMIT = 2
+# Chaves aceitas no arquivo de lista (as mesmas opções da linha de comando do arquiva_email)
+CONFIG_KEYS = {"pastas", "trabalhadores", "limite_por_volume"}
+FOLDER_KEYS = {"pasta", "raiz_arquivo", "leituras_simultaneas", "quarentena", "retentar_falhas"}
+BYTES_PER_MB = 1024 * 1024
+# --- Fim Constantes ---
+
+
+class WatchFolderJob(NamedTuple):
+    """Uma pasta de monitoramento da lista, com sua raiz de arquivo e as opções do arquiva_email."""
+    watch_folder: Path
+    archive_root: Path
+    read_concurrency: int = 1
+    quarantine: bool = False
+    retry_failures: bool = False
+
+
+def volume_key(path: Path) -> str:
+    """
+    Identifica o volume (disco ou compartilhamento) de um caminho pelo dispositivo do próprio
+    caminho ou, se ele ainda não existir, da pasta existente mais próxima.
+    """
+    for candidate in (path, *path.parents):
+        try:
+            return f"dev:{os.stat(candidate).st_dev}"
+        except OSError:
+            continue
+    return path.anchor or str(path)
+
+
+def load_watch_list(config_path: Path) -> Tuple[List[WatchFolderJob], Dict[str, Any]]:
+    """
+    Lê o arquivo JSON com a lista de pastas de monitoramento e retorna as pastas e as opções
+    gerais (trabalhadores, limite_por_volume). Levanta ValueError se a lista for inválida.
+    Exemplo:
+        {"trabalhadores": 6, "limite_por_volume": 2,
+         "pastas": [{"pasta": "D:\\Entrada\\RH", "raiz_arquivo": "E:\\Arquivo\\RH", "quarentena": true},
+                    {"pasta": "D:\\Entrada\\Financeiro"}]}
+    """
+    with config_path.open("r", encoding="utf-8") as f:
+        try:
+            config = json.load(f)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"JSON inválido: {e}") from e
+    if not isinstance(config, dict) or not isinstance(config.get("pastas"), list) or not config["pastas"]:
+        raise ValueError("a lista deve ser um objeto com 'pastas' contendo ao menos uma pasta")
+    unknown_keys = set(config) - CONFIG_KEYS
+    if unknown_keys:
+        raise ValueError(f"chaves desconhecidas: {', '.join(sorted(unknown_keys))}")
+
+    jobs: List[WatchFolderJob] = []
+    seen_watch: Dict[Path, int] = {}
+    seen_archive: Dict[Path, int] = {}
+    for position, entry in enumerate(config["pastas"], start=1):
+        if isinstance(entry, str):
+            entry = {"pasta": entry}
+        if not isinstance(entry, dict) or not entry.get("pasta"):
+            raise ValueError(f"pasta {position}: informe ao menos 'pasta'")
+        unknown_keys = set(entry) - FOLDER_KEYS
+        if unknown_keys:
+            raise ValueError(f"pasta {position}: chaves desconhecidas: {', '.join(sorted(unknown_keys))}")
+        job = WatchFolderJob(
+            watch_folder=Path(entry["pasta"]).resolve(),
+            archive_root=Path(entry.get("raiz_arquivo") or entry["pasta"]).resolve(),
+            read_concurrency=int(entry.get("leituras_simultaneas", 1)),
+            quarantine=bool(entry.get("quarentena", False)),
+            retry_failures=bool(entry.get("retentar_falhas", False)))
+        # Duas pastas com a mesma raiz disputariam os nomes de destino e o índice de falhas (ERROS)
+        for seen, path, label in ((seen_watch, job.watch_folder, "pasta"),
+                                  (seen_archive, job.archive_root, "raiz de arquivo")):
+            if path in seen:
+                raise ValueError(f"pasta {position}: {label} '{path}' repetida (já usada na pasta {seen[path]})")
+            seen[path] = position
+        jobs.append(job)
+    return jobs, {key: config[key] for key in ("trabalhadores", "limite_por_volume") if key in config}
+
+
+class ArchiveScheduler:
+    """
+    Arquiva várias pastas de monitoramento em um só processo, cada uma com um FileArchiver do
+    arquiva_email. As pastas são distribuídas, na ordem da lista, entre as threads de um pool
+    compartilhado; uma pasta só começa se o volume de origem e o de destino ainda estiverem
+    abaixo do limite de pastas simultâneas, para que muitas pastas no mesmo disco ou
+    compartilhamento não disputem as leituras. Cada pasta tem seu log, índice de falhas e
+    métricas, como em uma execução isolada, e o resumo traz a vazão de cada uma.
+    """
+
+    def __init__(self, jobs: List[WatchFolderJob], workers: int = DEFAULT_WORKERS,
+                 per_volume_limit: int = DEFAULT_PER_VOLUME_LIMIT, progress: Optional[ProgressReporter] = None):
+        self.jobs = jobs
+        self.workers = max(workers, 1)
+        self.per_volume_limit = max(per_volume_limit, 1)
+        self.progress: ProgressReporter = progress or ProgressReporter()
+        self.folder_summaries: Dict[WatchFolderJob, Dict[str, Any]] = {}
+        self.moved_files_count = 0
+        self.error_count = 0
+        self.elapsed_seconds = 0.0
+        self._run_start = time.monotonic()
+
+    def run(self) -> None:
+        """Arquiva todas as pastas da lista (as ainda não iniciadas são puladas se houver cancelamento)."""
+        job_volumes: Dict[WatchFolderJob, FrozenSet[str]] = {
+            job: frozenset((volume_key(job.watch_folder), volume_key(job.archive_root))) for job in self.jobs}
+        busy_volumes: Dict[str, int] = {}
+        pending = list(self.jobs)
+        running: Dict[Future, WatchFolderJob] = {}
+
+        self._run_start = time.monotonic()
+        self.progress.start(total=len(self.jobs), stage="Arquivando pastas")
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix=TOOL_NAME) as executor:
+            while pending or running:
+                # Inicia as próximas pastas cujos volumes têm vaga (com nada em execução, sempre há)
+                for job in list(pending):
+                    if len(running) >= self.workers or self.progress.cancelled:
+                        break
+                    if all(busy_volumes.get(volume, 0) < self.per_volume_limit for volume in job_volumes[job]):
+                        for volume in job_volumes[job]:
+                            busy_volumes[volume] = busy_volumes.get(volume, 0) + 1
+                        running[executor.submit(self._archive_folder, job, sorted(job_volumes[job]))] = job
+                        pending.remove(job)
+                if not running:
+                    break  # Cancelado antes de iniciar as pastas restantes
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    job = running.pop(future)
+                    for volume in job_volumes[job]:
+                        busy_volumes[volume] -= 1
+                    summary = future.result()
+                    self.folder_summaries[job] = summary
+                    self.moved_files_count += summary["moved_files_count"]
+                    self.error_count += summary["error_count"]
+                    self.progress.advance(moved=self.moved_files_count, errors=self.error_count)
+        self.elapsed_seconds = time.monotonic() - self._run_start
+        self.progress.finish(moved=self.moved_files_count, errors=self.error_count)
+
+    def _archive_folder(self, job: WatchFolderJob, volumes: List[str]) -> Dict[str, Any]:
+        """Arquiva uma pasta (em uma thread do pool) e retorna seu resumo com a vazão."""
+        wait_seconds = time.monotonic() - self._run_start
+        # Cada pasta conta seu próprio andamento; o cancelamento é o da execução inteira
+        archiver = arquiva_email.FileArchiver(
+            str(job.watch_folder), str(job.archive_root),
+            progress=ProgressReporter(cancel_event=self.progress.cancel_event),
+            read_concurrency=job.read_concurrency, quarantine=job.quarantine, retry_failures=job.retry_failures)
+        started = time.monotonic()
+        try:
+            archiver.process_files()
+        except Exception as e:
+            # Uma pasta com problema (ex.: compartilhamento que caiu) não interrompe as demais
+            archiver.logger.error(
+                f"{job.watch_folder} - Motivo: Erro inesperado durante o arquivamento da pasta. Detalhes: {e}")
+            archiver.error_count += 1
+        finally:
+            close_logger(archiver.logger)
+        elapsed = time.monotonic() - started
+
+        files_scanned = archiver.metrics.counters.get("files_scanned", 0)
+        bytes_moved = archiver.metrics.counters.get("bytes_moved", 0)
+        summary = archiver.summary_dict()
+        summary.update({
+            "volumes": volumes,
+            "wait_seconds": round(wait_seconds, 3),  # Espera por uma thread ou por vaga no volume
+            "elapsed_seconds": round(elapsed, 3),
+            "files_scanned": files_scanned,
+            "bytes_moved": bytes_moved,
+            "files_per_second": round(files_scanned / elapsed, 1) if elapsed > 0 else 0.0,
+            "megabytes_per_second": round(bytes_moved / BYTES_PER_MB / elapsed, 2) if elapsed > 0 else 0.0,
+        })
+        return summary
+
+    def summary_dict(self) -> Dict[str, Any]:
+        """Retorna os totais e o resumo de cada pasta, na ordem da lista, em formato serializável (JSON)."""
+        files_scanned = sum(summary["files_scanned"] for summary in self.folder_summaries.values())
+        return {
+            "tool": TOOL_NAME,
+            "workers": self.workers,
+            "per_volume_limit": self.per_volume_limit,
+            "folder_count": len(self.jobs),
+            "moved_files_count": self.moved_files_count,
+            "error_count": self.error_count,
+            "elapsed_seconds": round(self.elapsed_seconds, 3),
+            "files_per_second": round(files_scanned / self.elapsed_seconds, 1) if self.elapsed_seconds > 0 else 0.0,
+            "cancelled": self.progress.cancelled,
+            "not_started": [str(job.watch_folder) for job in self.jobs if job not in self.folder_summaries],
+            "folders": [self.folder_summaries[job] for job in self.jobs if job in self.folder_summaries],
+        }
+
+
+def build_arg_parser() -> argparse.ArgumentParser:
+    """Cria o parser de argumentos da linha de comando."""
+    parser = argparse.ArgumentParser(
+        description="Arquiva, em um só processo e ao mesmo tempo, várias pastas de monitoramento do arquiva_email "
+                    "listadas em um arquivo JSON, cada uma com sua raiz de arquivo.")
+    parser.add_argument(
+        "lista",
+        help="Arquivo JSON com as pastas: {\"pastas\": [{\"pasta\": ..., \"raiz_arquivo\": ..., "
+             "\"leituras_simultaneas\": N, \"quarentena\": true, \"retentar_falhas\": true}, ...]} "
+             "(só 'pasta' é obrigatória; a raiz padrão é a própria pasta).")
+    parser.add_argument(
+        "--trabalhadores", type=int, metavar="N",
+        help=f"Pastas arquivadas ao mesmo tempo (padrão: 'trabalhadores' da lista ou {DEFAULT_WORKERS}).")
+    parser.add_argument(
+        "--limite-por-volume", dest="limite_por_volume", type=int, metavar="N",
+        help="Pastas arquivadas ao mesmo tempo em um mesmo disco ou compartilhamento, contando origem e destino "
+             f"(padrão: 'limite_por_volume' da lista ou {DEFAULT_PER_VOLUME_LIMIT}).")
+    return parser
+
+
+def run_headless(args: argparse.Namespace, progress: Optional[ProgressReporter] = None) -> Dict[str, Any]:
+    """Arquiva as pastas da lista e retorna o resumo em formato serializável. Levanta ValueError se a lista for inválida."""
+    jobs, settings = load_watch_list(Path(args.lista))
+    workers = args.trabalhadores or int(settings.get("trabalhadores", DEFAULT_WORKERS))
+    per_volume_limit = args.limite_por_volume or int(settings.get("limite_por_volume", DEFAULT_PER_VOLUME_LIMIT))
+    scheduler = ArchiveScheduler(jobs, workers, per_volume_limit, progress=progress)
+    scheduler.run()
+    return scheduler.summary_dict()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Ponto de entrada da linha de comando: imprime o resumo em JSON."""
+    parser = build_arg_parser()
+    args = parser.parse_args(argv)
+    # Mensagens de progresso vão para stderr; stdout fica reservado ao resumo JSON
+    with contextlib.redirect_stdout(sys.stderr):
+        try:
+            summary = run_headless(args)
+        except (OSError, ValueError) as e:
+            parser.error(f"lista de pastas '{args.lista}' inválida: {e}")
+    print(json.dumps(summary, indent=2))
+    return 1 if summary["error_count"] else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
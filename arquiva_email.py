@@ -1,10 +1,22 @@
+import argparse
+import contextlib
 import shutil
 import email
+import json
 import logging
+import os
 import re
+import sys
 from datetime import datetime
 from pathlib import Path
-from typing import Optional, List
+from typing import Any, Dict, Iterator, Optional, List, Set
+
+from leitura_cabecalhos import add_read_concurrency_argument, process_with_prefetch, read_headers
+from metricas import (STAGE_CONFLICT, STAGE_DATE_PARSE, STAGE_HEADER_PARSE, STAGE_MOVE, STAGE_SANITIZE,
+                      RunMetrics)
+from progresso import ProgressReporter
+from registro import LogAggregator, close_logger, setup_file_logger
+from sanitizacao import sanitize_filename
 
 # --- Constantes ---
 # Limite prático para caminhos no Windows (MAX_PATH (260) - 1 para nulo)
@@ -15,6 +27,13 @@ FALLBACK_SANITIZED_FILENAME = "arquivo_renomeado"
 # Máximo de tentativas para resolver nomes duplicados
 MAX_DUPLICATE_RESOLUTION_ATTEMPTS = 10
 LOG_FILENAME_PREFIX = "archive_failures_"
+# Índice dos arquivos que não puderam ser lidos (na pasta de logs), para não relê-los a cada execução
+FAILURE_INDEX_FILENAME = "falhas_arquiva_email.json"
+FAILURE_INDEX_VERSION = 1
+FAILURE_INDEX_TEMP_SUFFIX = ".tmp"
+# Subpasta da pasta de monitoramento para onde vão os arquivos ilegíveis com --quarentena
+QUARANTINE_SUBFOLDER = "Quarentena"
+MAX_QUARANTINE_NAME_ATTEMPTS = 100
 
 # Pasta de monitoramento. Ajuste conforme necessário ou considere torná-la um parâmetro.
 # Original do Desktop de mensagens
@@ -24,13 +43,84 @@ WATCH_FOLDER_PATH_STR = r"C:\backup_mensagens"
 # --- Fim Constantes ---
 
 
+class FailureIndex:
+    """
+    Índice persistente (JSON) dos arquivos cuja leitura falhou, por caminho, tamanho e data de
+    modificação. Enquanto o arquivo não muda, ele é reconhecido como ilegível sem ser reaberto;
+    se muda (exportação refeita, download concluído), volta a ser processado.
+    """
+
+    def __init__(self, index_path: Path):
+        self.index_path = index_path
+        self.entries: Dict[str, Dict[str, Any]] = {}  # Caminho -> tamanho, mtime_ns, motivo e data da falha
+        self.changed = False
+
+    def load(self) -> None:
+        """Carrega o índice; ausente ou ilegível, começa vazio."""
+        try:
+            with self.index_path.open("r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") == FAILURE_INDEX_VERSION:
+                self.entries = data["entries"]
+        except (OSError, ValueError, KeyError, AttributeError):
+            self.entries = {}
+
+    def is_known_failure(self, path: Path, stat: os.stat_result) -> bool:
+        """Indica se o arquivo já falhou antes e não mudou desde então."""
+        entry = self.entries.get(str(path))
+        return entry is not None and entry["size"] == stat.st_size and entry["mtime_ns"] == stat.st_mtime_ns
+
+    def record(self, path: Path, reason: str) -> None:
+        """Registra a falha de leitura do arquivo no estado atual dele."""
+        try:
+            stat = path.stat()
+        except OSError:
+            return  # Sem tamanho e data não há como reconhecê-lo depois
+        self.entries[str(path)] = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "reason": reason,
+                                   "failed_at": datetime.now().isoformat(timespec="seconds")}
+        self.changed = True
+
+    def forget(self, path: Path) -> None:
+        """Remove o arquivo do índice (mudou, sumiu ou foi para a quarentena)."""
+        if self.entries.pop(str(path), None) is not None:
+            self.changed = True
+
+    def save(self) -> None:
+        """Grava o índice (arquivo temporário e renomeação), se mudou."""
+        if not self.changed:
+            return
+        temp_path = self.index_path.with_name(self.index_path.name + FAILURE_INDEX_TEMP_SUFFIX)
+        with temp_path.open("w", encoding="utf-8") as f:
+            json.dump({"version": FAILURE_INDEX_VERSION, "entries": self.entries}, f, indent=1)
+        os.replace(temp_path, self.index_path)
+        self.changed = False
+
+
 class FileArchiver:
     """Arquiva arquivos de uma pasta de monitoramento para uma estrutura de pastas baseada em data."""
 
-    def __init__(self, watch_folder_str: str, archive_root_str: str, log_folder_name: str = LOG_FOLDER_NAME):
+    def __init__(self, watch_folder_str: str, archive_root_str: str, log_folder_name: str = LOG_FOLDER_NAME,
+                 progress: Optional[ProgressReporter] = None, read_concurrency: int = 1,
+                 quarantine: bool = False, retry_failures: bool = False):
+        self.progress: ProgressReporter = progress or ProgressReporter()
+        # Acima de 1, os cabeçalhos dos .eml são lidos antecipadamente em paralelo (compartilhamentos de rede)
+        self.read_concurrency = read_concurrency
         self.watch_folder: Path = Path(watch_folder_str).resolve()
         self.archive_root: Path = Path(archive_root_str).resolve()
         self.log_folder: Path = self.archive_root / log_folder_name
+        # Arquivos ilegíveis: pulados enquanto não mudarem, ou movidos para a quarentena
+        self.quarantine = quarantine
+        self.retry_failures = retry_failures  # Relê também os que já falharam
+        self.quarantine_folder: Path = self.watch_folder / QUARANTINE_SUBFOLDER
+        self.failure_index = FailureIndex(self.log_folder / FAILURE_INDEX_FILENAME)
+        self.skipped_known_failures_count = 0
+        self.new_failures_count = 0
+        self.quarantined_count = 0
+        self._listed_paths: Set[str] = set()
+        self.moved_files_count = 0
+        self.error_count = 0  # Arquivos que não puderam ser movidos
+        self.metrics = RunMetrics("arquiva_email")
+        self.metrics_path: Optional[Path] = None  # Arquivo JSON de métricas da última execução
         self.setup_logger()
 
     def setup_logger(self) -> None:
@@ -42,30 +132,10 @@ class FileArchiver:
             log_file = self.log_folder / \
                 f"{LOG_FILENAME_PREFIX}{timestamp}.log"
 
-            # Configura o logger principal
-            self.logger = logging.getLogger(
-                f"{__name__}.{id(self)}")  # Nome único
-            # Nível de log definido para ERROR
-            self.logger.setLevel(logging.ERROR)
-
-            # Remove handlers existentes para evitar duplicação se chamado novamente
-            if self.logger.hasHandlers():
-                self.logger.handlers.clear()
-
-            # Cria o file handler
-            file_handler = logging.FileHandler(str(log_file), encoding='utf-8')
-            # Nível do handler também definido para ERROR
-            file_handler.setLevel(logging.ERROR)
-
-            # Cria o formatter
-            formatter = logging.Formatter(
-                # Formato ajustado
-                "%(asctime)s - %(levelname)s - Arquivo: %(message)s",
-                datefmt="%Y-%m-%d %H:%M:%S")
-            file_handler.setFormatter(formatter)
-
-            # Adiciona o handler ao logger
-            self.logger.addHandler(file_handler)
+            # Logger com nome único, só para erros, gravado em segundo plano (registro.py)
+            self.logger = setup_file_logger(
+                f"{__name__}.{id(self)}", log_file, logging.ERROR,
+                "%(asctime)s - %(levelname)s - Arquivo: %(message)s", datefmt="%Y-%m-%d %H:%M:%S")
 
         except Exception as e:
             # Se houver erro ao configurar o log, imprime no console
@@ -75,6 +145,8 @@ class FileArchiver:
             self.logger = logging.getLogger(
                 'null_logger_due_to_error')  # Nome mais específico
             self.logger.addHandler(logging.NullHandler())
+        # Conflitos de nome repetidos no mesmo mês viram uma linha de resumo no fim da execução
+        self.log_aggregator = LogAggregator(self.logger)
 
     def process_files(self) -> None:
         """Processa todos os arquivos na pasta de monitoramento."""
@@ -82,62 +154,165 @@ class FileArchiver:
             # Loga o erro se a pasta de origem não existe
             self.logger.error(
                 f"{self.watch_folder} - Motivo: Pasta de monitoramento não encontrada ou não é um diretório.")
+            self.error_count += 1
             return
 
         # Itera apenas pelos arquivos na pasta WATCH_FOLDER
-        for item_path in self.watch_folder.iterdir():
+        self.metrics = RunMetrics("arquiva_email")
+        self.failure_index.load()
+        self.skipped_known_failures_count = self.new_failures_count = self.quarantined_count = 0
+        self._listed_paths = set()
+        self.progress.start(stage="Arquivando")
+        if self.read_concurrency > 1:
+            files_to_process = list(self._iter_files_to_process())
+            self.progress.set_stage("Arquivando", total=len(files_to_process))
+            process_with_prefetch(files_to_process, self._handle_file, self.read_concurrency,
+                                  should_stop=lambda: self.progress.cancelled, metrics=self.metrics)
+        else:
+            for item_path in self._iter_files_to_process():
+                if self.progress.cancelled:
+                    break
+                self._handle_file(item_path)
+        if not self.progress.cancelled:
+            if self.quarantine:
+                self._quarantine_failures()
+            # Arquivos que saíram da pasta não precisam mais estar no índice
+            for path_str in [p for p in self.failure_index.entries if p not in self._listed_paths]:
+                self.failure_index.forget(Path(path_str))
+        try:
+            self.failure_index.save()
+        except OSError as e:
+            self.logger.error(f"{self.failure_index.index_path} - Motivo: Falha ao gravar o índice de arquivos "
+                              f"ilegíveis. Detalhes: {e}")
+            self.error_count += 1
+        self.log_aggregator.flush()
+        self.progress.finish(moved=self.moved_files_count, errors=self.error_count)
+        self.metrics.increment("errors", self.error_count)
+        self.metrics_path = self.metrics.write_json(self.log_folder)
+
+    def _iter_files_to_process(self) -> Iterator[Path]:
+        """
+        Percorre os arquivos da pasta de monitoramento (sem subpastas). Arquivos que já falharam
+        na leitura e não mudaram desde então são pulados sem serem abertos.
+        """
+        for item_path in self.metrics.timed_iter(self.watch_folder.iterdir()):
             if item_path.is_file():
                 # Ignora arquivos .ffs_db silenciosamente
                 if item_path.name.lower().endswith(".ffs_db") or item_path.name.lower().endswith(".ffs_lock"):
                     continue
-                self.process_file(item_path)
+                self._listed_paths.add(str(item_path))
+                if str(item_path) in self.failure_index.entries:
+                    if self._is_unchanged_failure(item_path):
+                        self.skipped_known_failures_count += 1
+                        continue
+                    self.failure_index.forget(item_path)  # Mudou (ou --retentar-falhas): tenta de novo
+                yield item_path
+
+    def _is_unchanged_failure(self, file_path: Path) -> bool:
+        """Indica se o arquivo está no índice de falhas e não mudou desde a falha."""
+        if self.retry_failures:
+            return False
+        try:
+            return self.failure_index.is_known_failure(file_path, file_path.stat())
+        except OSError:
+            return False
+
+    def _record_read_failure(self, eml_path: Path, reason: str) -> None:
+        """Guarda a falha de leitura no índice, para o arquivo não ser relido enquanto não mudar."""
+        self.failure_index.record(eml_path, reason)
+        self.new_failures_count += 1
 
-    def process_file(self, file_path: Path) -> None:
+    def _quarantine_failures(self) -> None:
+        """
+        Move de uma vez para a subpasta de quarentena os arquivos ilegíveis (os que falharam agora
+        e os pulados por já terem falhado), mantendo o nome; em conflito, acrescenta um contador.
+        """
+        for path_str in list(self.failure_index.entries):
+            file_path = Path(path_str)
+            if file_path.parent != self.watch_folder:
+                continue
+            # Conferido direto no índice: com --retentar-falhas, _is_unchanged_failure seria sempre falso
+            try:
+                if not self.failure_index.is_known_failure(file_path, file_path.stat()):
+                    continue
+            except OSError:
+                continue
+            try:
+                self.quarantine_folder.mkdir(exist_ok=True)
+                target_path = self.quarantine_folder / file_path.name
+                counter = 1
+                while target_path.exists() and counter <= MAX_QUARANTINE_NAME_ATTEMPTS:
+                    target_path = self.quarantine_folder / f"{file_path.stem}_{counter}{file_path.suffix}"
+                    counter += 1
+                if target_path.exists():
+                    self.logger.error(f"{file_path.name} - Motivo: Nome indisponível em '{self.quarantine_folder}'. "
+                                      "Arquivo mantido na pasta de monitoramento.")
+                    self.error_count += 1
+                    continue
+                shutil.move(str(file_path), str(target_path))
+            except OSError as e:
+                self.logger.error(f"{file_path.name} - Motivo: Falha ao mover para a quarentena "
+                                  f"'{self.quarantine_folder}'. Detalhes: {e}")
+                self.error_count += 1
+                continue
+            self.failure_index.forget(file_path)
+            self.quarantined_count += 1
+
+    def _handle_file(self, item_path: Path, headers: Optional[email.message.Message] = None) -> None:
+        """Processa um arquivo listado, contabilizando métricas e progresso."""
+        self.metrics.increment("files_scanned")
+        with self.metrics.measure_file():
+            self.process_file(item_path, headers)
+        self.progress.advance(moved=self.moved_files_count, errors=self.error_count)
+
+    def process_file(self, file_path: Path, headers: Optional[email.message.Message] = None) -> None:
         """Processa um único arquivo, chamando a função apropriada."""
         try:
             if file_path.suffix.lower() == ".eml":
-                self.process_eml_file(file_path)
+                self.process_eml_file(file_path, headers)
             else:
                 self.process_other_file(file_path)
         except Exception as e:
             # Loga erro genérico no processamento do arquivo que impede a movimentação
             self.logger.error(
                 f"{file_path.name} (em {file_path.parent}) - Motivo: Erro inesperado durante o processamento inicial. Detalhes: {e}")
+            self.error_count += 1
 
-    def process_eml_file(self, eml_path: Path) -> None:
-        """Processa arquivos .eml para extrair data e mover."""
-        msg: Optional[email.message.Message] = None
-        try:
-            # Tenta ler com UTF-8
-            with eml_path.open('r', encoding='utf-8') as f:
-                msg = email.message_from_file(f)
-        except UnicodeDecodeError:
-            try:
-                # Se falhar, tenta com Latin-1
-                with eml_path.open('r', encoding='latin-1') as f:
-                    msg = email.message_from_file(f)
-            except Exception as e:
-                # Loga erro se a leitura falhar com ambos encodings
-                self.logger.error(
-                    f"{eml_path.name} - Motivo: Falha ao ler o arquivo (tentativas UTF-8 e Latin-1). Detalhes: {e}")
-                return  # Impede a movimentação
-        except Exception as e:
-            # Loga erro genérico de leitura
-            self.logger.error(
-                f"{eml_path.name} - Motivo: Falha ao ler o arquivo. Detalhes: {e}")
-            return  # Impede a movimentação
+    def process_eml_file(self, eml_path: Path, headers: Optional[email.message.Message] = None) -> None:
+        """
+        Processa arquivos .eml para extrair data e mover. `headers` são os cabeçalhos já lidos
+        antecipadamente, se houver; senão o arquivo é lido aqui.
+        """
+        msg: Optional[email.message.Message] = headers
+        if msg is None:
+            with self.metrics.stage(STAGE_HEADER_PARSE):
+                try:
+                    # Só o cabeçalho é lido (UTF-8, ou Latin-1 se falhar); arquivos grandes via mmap
+                    msg = read_headers(eml_path)
+                except Exception as e:
+                    # Loga erro genérico de leitura
+                    self.logger.error(
+                        f"{eml_path.name} - Motivo: Falha ao ler o arquivo. Detalhes: {e}")
+                    self.error_count += 1
+                    # Arquivo sumido ou em uso (exportação em andamento) pode dar certo na próxima vez
+                    if not isinstance(e, (FileNotFoundError, PermissionError)):
+                        self._record_read_failure(eml_path, f"Falha ao ler o arquivo: {e}")
+                    return  # Impede a movimentação
 
         # Se msg não foi lido com sucesso (caso raro, mas possível)
         if not msg:
             self.logger.error(
                 f"{eml_path.name} - Motivo: Não foi possível interpretar o conteúdo do e-mail após leitura.")
+            self.error_count += 1
+            self._record_read_failure(eml_path, "Conteúdo do e-mail não interpretado")
             return  # Impede a movimentação
 
         date_str = msg.get("Date")
         # A falha na análise da data agora usa a data atual, não impede a movimentação,
         # então não logamos mais como erro aqui.
         # Passa o path para logs internos se necessário
-        date_obj = self._parse_date(date_str, eml_path)
+        with self.metrics.stage(STAGE_DATE_PARSE):
+            date_obj = self._parse_date(date_str, eml_path)
 
         year = date_obj.strftime("%Y")
         year_month = date_obj.strftime("%Y-%m")
@@ -181,14 +356,16 @@ class FileArchiver:
     def process_other_file(self, file_path: Path) -> None:
         """Processa outros tipos de arquivo usando data de modificação."""
         try:
-            modification_time = file_path.stat().st_mtime
-            date_obj = datetime.fromtimestamp(modification_time)
+            with self.metrics.stage(STAGE_DATE_PARSE):
+                modification_time = file_path.stat().st_mtime
+                date_obj = datetime.fromtimestamp(modification_time)
         except OSError as e:
             # Loga erro se não conseguir obter data de modificação
             self.logger.error(
                 f"{file_path.name} - Motivo: Falha ao obter data de modificação. Detalhes: {e}")
             # Poderia optar por usar data atual ou retornar para não mover
             # Vamos retornar para garantir que só mova se tiver data válida
+            self.error_count += 1
             return  # Impede a movimentação
 
         year = date_obj.strftime("%Y")
@@ -202,23 +379,7 @@ class FileArchiver:
         Remove ou substitui caracteres inválidos, o prefixo 'msg ',
         espaços extras e normaliza números no início do nome.
         """
-        sanitized = re.sub(r'^msg\s+', '', filename, flags=re.IGNORECASE)
-        sanitized = re.sub(r'[<>:"/\\|?*]', '_', sanitized)
-        sanitized = re.sub(r'[\x00-\x1f]', '', sanitized)
-        sanitized = sanitized.strip()
-
-        match = re.match(r'^(\d+)(.*)', sanitized)
-        if match:
-            number_str, rest_of_name = match.groups()
-            try:
-                number = int(number_str)
-                sanitized = str(number) + rest_of_name
-            except ValueError:  # Para números muito grandes
-                if len(number_str) > 1 and number_str.startswith('0'):
-                    sanitized = number_str.lstrip('0') + rest_of_name
-                else:
-                    sanitized = number_str + rest_of_name
-
+        sanitized = sanitize_filename(filename)
         if not sanitized:
             self.logger.error(  # Erro, pois um nome de arquivo vazio é problemático
                 f"Nome do arquivo '{filename}' resultou em vazio após sanitização. Usando fallback '{FALLBACK_SANITIZED_FILENAME}'.")
@@ -273,57 +434,84 @@ class FileArchiver:
         except OSError as e:
             self.logger.error(
                 f"{file_path.name} - Motivo: Erro ao criar pasta de destino '{archive_folder}'. Detalhes: {e}")
+            self.error_count += 1
             return  # Impede a movimentação
 
         original_filename = file_path.name
-        sanitized_filename = self._sanitize_filename(original_filename)
+        with self.metrics.stage(STAGE_SANITIZE):
+            sanitized_filename = self._sanitize_filename(original_filename)
 
-        current_final_filename = self._truncate_filename(
-            archive_folder, sanitized_filename, EFFECTIVE_MAX_PATH - SAFE_PATH_MARGIN)
+            current_final_filename = self._truncate_filename(
+                archive_folder, sanitized_filename, EFFECTIVE_MAX_PATH - SAFE_PATH_MARGIN)
 
         destination_path = archive_folder / current_final_filename
         num_attempts = 0
         original_conflicting_filename_part = current_final_filename
 
-        while destination_path.exists() and num_attempts < MAX_DUPLICATE_RESOLUTION_ATTEMPTS:
-            num_attempts += 1
-            if num_attempts == 1:  # Loga apenas na primeira tentativa de renomeação por duplicidade
-                self.logger.error(  # Log como erro, pois é um conflito que precisa de ação
-                    f"{file_path.name} - Motivo: Conflito de nome em '{archive_folder}' para '{original_conflicting_filename_part}'. Tentando renomear.")
-
-            base_name_orig, ext_orig = Path(original_conflicting_filename_part).stem, Path(
-                original_conflicting_filename_part).suffix
-            if not base_name_orig:  # Caso o nome original seja apenas uma extensão ou vazio após sanitização/truncamento
-                base_name_orig = FALLBACK_SANITIZED_FILENAME.split(
-                    '.')[0]  # Use o fallback sem extensão
-
-            if num_attempts <= MAX_DUPLICATE_RESOLUTION_ATTEMPTS / 2:  # Tenta com contador primeiro
-                name_with_counter = f"{base_name_orig}_{num_attempts}{ext_orig}"
-                current_final_filename = self._truncate_filename(
-                    archive_folder, name_with_counter, EFFECTIVE_MAX_PATH - SAFE_PATH_MARGIN)
-            else:  # Depois tenta com timestamp
-                timestamp = datetime.now().strftime("%Y%m%d%H%M%S%f")
-                name_with_timestamp = f"{base_name_orig}_{timestamp}{ext_orig}"
-                current_final_filename = self._truncate_filename(
-                    archive_folder, name_with_timestamp, EFFECTIVE_MAX_PATH - SAFE_PATH_MARGIN)
-
-            destination_path = archive_folder / current_final_filename
+        with self.metrics.stage(STAGE_CONFLICT):
+            while destination_path.exists() and num_attempts < MAX_DUPLICATE_RESOLUTION_ATTEMPTS:
+                num_attempts += 1
+                if num_attempts == 1:  # Loga apenas na primeira tentativa de renomeação por duplicidade
+                    self.log_aggregator.log(  # Log como erro, pois é um conflito que precisa de ação
+                        logging.ERROR, "conflitos de nome", archive_folder.name,
+                        f"{file_path.name} - Motivo: Conflito de nome em '{archive_folder}' para '{original_conflicting_filename_part}'. Tentando renomear.")
+
+                base_name_orig, ext_orig = Path(original_conflicting_filename_part).stem, Path(
+                    original_conflicting_filename_part).suffix
+                if not base_name_orig:  # Caso o nome original seja apenas uma extensão ou vazio após sanitização/truncamento
+                    base_name_orig = FALLBACK_SANITIZED_FILENAME.split(
+                        '.')[0]  # Use o fallback sem extensão
+
+                if num_attempts <= MAX_DUPLICATE_RESOLUTION_ATTEMPTS / 2:  # Tenta com contador primeiro
+                    name_with_counter = f"{base_name_orig}_{num_attempts}{ext_orig}"
+                    current_final_filename = self._truncate_filename(
+                        archive_folder, name_with_counter, EFFECTIVE_MAX_PATH - SAFE_PATH_MARGIN)
+                else:  # Depois tenta com timestamp
+                    timestamp = datetime.now().strftime("%Y%m%d%H%M%S%f")
+                    name_with_timestamp = f"{base_name_orig}_{timestamp}{ext_orig}"
+                    current_final_filename = self._truncate_filename(
+                        archive_folder, name_with_timestamp, EFFECTIVE_MAX_PATH - SAFE_PATH_MARGIN)
+
+                destination_path = archive_folder / current_final_filename
 
         if destination_path.exists():
             self.logger.error(
                 f"{file_path.name} - Motivo: Conflito de nome irresolúvel em '{archive_folder}' para '{original_conflicting_filename_part}' "
                 f"após {num_attempts} tentativas. Arquivo não movido.")
+            self.error_count += 1
             return
 
         try:
-            shutil.move(str(file_path), str(destination_path))
+            with self.metrics.stage(STAGE_MOVE):
+                file_size = file_path.stat().st_size
+                shutil.move(str(file_path), str(destination_path))
+            self.moved_files_count += 1
+            self.metrics.increment("files_moved")
+            self.metrics.increment("bytes_moved", file_size)
         except Exception as e:
             self.logger.error(
                 f"{file_path.name} - Motivo: Falha ao mover para '{destination_path}'. Detalhes: {e}")
-
-
-def main() -> None:
-    """Função principal para configurar e executar o arquivador de arquivos."""
+            self.error_count += 1
+
+    def summary_dict(self) -> Dict[str, Any]:
+        """Retorna os contadores da última execução em formato serializável (JSON)."""
+        return {
+            "tool": "arquiva_email",
+            "watch_folder": str(self.watch_folder),
+            "archive_root": str(self.archive_root),
+            "moved_files_count": self.moved_files_count,
+            "skipped_known_failures_count": self.skipped_known_failures_count,
+            "new_failures_count": self.new_failures_count,
+            "quarantined_count": self.quarantined_count,
+            "error_count": self.error_count,
+            "cancelled": self.progress.cancelled,
+            "log_folder": str(self.log_folder),
+            "metrics_path": str(self.metrics_path) if self.metrics_path else None,
+        }
+
+
+def main_gui() -> None:
+    """Fluxo padrão: arquiva a pasta de monitoramento fixa e exibe o resultado em uma janela."""
     watch_folder = Path(WATCH_FOLDER_PATH_STR)
     archive_root = watch_folder  # Arquiva dentro da pasta de monitoramento, em subpastas
 
@@ -350,6 +538,7 @@ def main() -> None:
     # Passa strings como esperado pelo __init__
     archiver = FileArchiver(str(watch_folder), str(archive_root))
     archiver.process_files()
+    close_logger(archiver.logger)  # Grava o que falta do log antes de apontá-lo ao usuário
     print("\nProcessamento concluído.")
 
     # Informa onde verificar os logs de falha
@@ -447,5 +636,52 @@ def show_auto_close_message(message: str, timeout: int) -> None:
     root.mainloop()
 
 
+def build_arg_parser() -> argparse.ArgumentParser:
+    """Cria o parser de argumentos da linha de comando."""
+    parser = argparse.ArgumentParser(
+        description="Arquiva os arquivos de uma pasta de monitoramento em subpastas Ano/Ano-Mês.")
+    parser.add_argument(
+        "pasta", nargs="?",
+        help=f"Pasta de monitoramento. Se omitida, usa '{WATCH_FOLDER_PATH_STR}' e exibe o resultado em uma janela.")
+    parser.add_argument(
+        "--raiz-arquivo", dest="raiz_arquivo",
+        help="Pasta raiz onde a estrutura Ano/Ano-Mês será criada (padrão: a própria pasta).")
+    parser.add_argument(
+        "--quarentena", action="store_true",
+        help=f"Move os arquivos que não puderam ser lidos para a subpasta '{QUARANTINE_SUBFOLDER}' "
+             "(padrão: ficam na pasta e são pulados enquanto não mudarem).")
+    parser.add_argument(
+        "--retentar-falhas", dest="retentar_falhas", action="store_true",
+        help="Relê também os arquivos que já falharam em execuções anteriores e não mudaram.")
+    add_read_concurrency_argument(parser)
+    return parser
+
+
+def run_headless(args: argparse.Namespace, progress: Optional[ProgressReporter] = None) -> Dict[str, Any]:
+    """Executa o arquivamento sem interface gráfica e retorna o resumo em formato serializável."""
+    archiver = FileArchiver(args.pasta, args.raiz_arquivo or args.pasta, progress=progress,
+                            read_concurrency=args.leituras_simultaneas, quarantine=args.quarentena,
+                            retry_failures=args.retentar_falhas)
+    try:
+        archiver.process_files()
+    finally:
+        close_logger(archiver.logger)
+    return archiver.summary_dict()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Ponto de entrada: modo linha de comando se a pasta for informada, senão fluxo padrão com janela."""
+    args = build_arg_parser().parse_args(argv)
+    if args.pasta is None:
+        main_gui()
+        return 0
+
+    # Mensagens de progresso vão para stderr; stdout fica reservado ao resumo JSON
+    with contextlib.redirect_stdout(sys.stderr):
+        summary = run_headless(args)
+    print(json.dumps(summary, indent=2))
+    return 1 if summary["error_count"] else 0
+
+
 if __name__ == "__main__":
-    main()
+    raise SystemExit(main())
@@ -1,11 +1,20 @@
+import argparse
+import contextlib
+import json
 import os
 import shutil
 import email
 import logging
 import re
+import sys
 from datetime import datetime
-import tkinter as tk
-from tkinter import filedialog, messagebox
+
+from leitura_cabecalhos import add_read_concurrency_argument, process_with_prefetch, read_headers
+from metricas import (STAGE_CONFLICT, STAGE_DATE_PARSE, STAGE_HEADER_PARSE, STAGE_LISTING, STAGE_MOVE,
+                      STAGE_SANITIZE, RunMetrics)
+from progresso import ProgressReporter
+from registro import close_logger, setup_file_logger
+from sanitizacao import sanitize_filename
 
 # Definir constantes do arquiva_email.py (ou arquiva_raiz.py)
 MAX_PATH_LENGTH = 259
@@ -13,7 +22,10 @@ SAFE_FILENAME_MARGIN = 10
 
 
 class FileArchiver:
-    def __init__(self, watch_folder, archive_root, log_folder):
+    def __init__(self, watch_folder, archive_root, log_folder, progress=None, read_concurrency=1):
+        self.progress = progress or ProgressReporter()
+        # Acima de 1, os cabeçalhos dos .eml são lidos antecipadamente em paralelo
+        self.read_concurrency = read_concurrency
         self.watch_folder = watch_folder
         self.archive_root = archive_root
         self.log_folder = log_folder
@@ -21,6 +33,8 @@ class FileArchiver:
         self.processed_files_count = 0
         self.error_count = 0
         self.created_folders = set()
+        self.metrics = RunMetrics("arquiva_email_gui")
+        self.metrics_path = None  # Arquivo JSON de métricas da última execução
 
     def setup_logger(self):
         """Configura o logger para registrar apenas erros."""
@@ -33,21 +47,9 @@ class FileArchiver:
             log_file = os.path.join(
                 self.log_folder, f"archive_failures_{timestamp}.log")
 
-            self.logger = logging.getLogger(__name__)
-            self.logger.setLevel(logging.ERROR)
-
-            if self.logger.hasHandlers():
-                self.logger.handlers.clear()
-
-            file_handler = logging.FileHandler(log_file, encoding='utf-8')
-            file_handler.setLevel(logging.ERROR)
-
-            formatter = logging.Formatter(
-                "%(asctime)s - %(levelname)s - Arquivo: %(message)s",
-                datefmt="%Y-%m-%d %H:%M:%S")
-            file_handler.setFormatter(formatter)
-
-            self.logger.addHandler(file_handler)
+            self.logger = setup_file_logger(
+                __name__, log_file, logging.ERROR,
+                "%(asctime)s - %(levelname)s - Arquivo: %(message)s", datefmt="%Y-%m-%d %H:%M:%S")
 
         except Exception as e:
             # Erro crítico na configuração do log, imprime no console e usa NullHandler
@@ -69,23 +71,41 @@ class FileArchiver:
                 f"ERRO: Pasta de monitoramento não encontrada: {self.watch_folder}")
             return
 
-        files_to_process = [f for f in os.listdir(self.watch_folder)
-                            if os.path.isfile(os.path.join(self.watch_folder, f))
-                            # Ignora .ffs_db e _lock
-                            and not (f.lower().endswith(".ffs_db") or f.lower().endswith(".ffs_lock"))]
+        self.metrics = RunMetrics("arquiva_email_gui")
+        with self.metrics.stage(STAGE_LISTING):
+            files_to_process = [f for f in os.listdir(self.watch_folder)
+                                if os.path.isfile(os.path.join(self.watch_folder, f))
+                                # Ignora .ffs_db e _lock
+                                and not (f.lower().endswith(".ffs_db") or f.lower().endswith(".ffs_lock"))]
 
         if not files_to_process:
             # Se não há arquivos, não há o que processar (não é um erro)
             return  # Sai mais cedo
 
-        for filename in files_to_process:
-            file_path = os.path.join(self.watch_folder, filename)
-            self.process_file(file_path)
-
-    def process_file(self, file_path):
+        self.progress.start(total=len(files_to_process), stage="Arquivando")
+        file_paths = [os.path.join(self.watch_folder, filename) for filename in files_to_process]
+        if self.read_concurrency > 1:
+            process_with_prefetch(file_paths, self._handle_file, self.read_concurrency,
+                                  should_stop=lambda: self.progress.cancelled, metrics=self.metrics)
+        else:
+            for file_path in file_paths:
+                if self.progress.cancelled:
+                    break
+                self._handle_file(file_path)
+        self.progress.finish(moved=self.processed_files_count, errors=self.error_count)
+        self.metrics.increment("errors", self.error_count)
+        self.metrics_path = self.metrics.write_json(self.log_folder)
+
+    def _handle_file(self, file_path, headers=None):
+        self.metrics.increment("files_scanned")
+        with self.metrics.measure_file():
+            self.process_file(file_path, headers)
+        self.progress.advance(moved=self.processed_files_count, errors=self.error_count)
+
+    def process_file(self, file_path, headers=None):
         try:
             if file_path.lower().endswith(".eml"):
-                self.process_eml_file(file_path)
+                self.process_eml_file(file_path, headers)
             else:
                 self.process_other_file(file_path)
         except Exception as e:
@@ -94,27 +114,20 @@ class FileArchiver:
             # Incrementa erro
             self.error_count += 1
 
-    def process_eml_file(self, eml_path):
-        msg = None
-        try:
-            with open(eml_path, 'r', encoding='utf-8') as f:
-                msg = email.message_from_file(f)
-        except UnicodeDecodeError:
-            try:
-                with open(eml_path, 'r', encoding='latin-1') as f:
-                    msg = email.message_from_file(f)
-            except Exception as e:
-                self.logger.error(
-                    f"{eml_path} - Motivo: Falha ao ler o arquivo (tentativas UTF-8 e Latin-1). Detalhes: {e}")
-                # Incrementa erro
-                self.error_count += 1
-                return
-        except Exception as e:
-            self.logger.error(
-                f"{eml_path} - Motivo: Falha ao ler o arquivo. Detalhes: {e}")
-            # Incrementa erro
-            self.error_count += 1
-            return
+    def process_eml_file(self, eml_path, headers=None):
+        # Cabeçalhos já lidos antecipadamente, se houver; senão o arquivo é lido aqui
+        msg = headers
+        if msg is None:
+            with self.metrics.stage(STAGE_HEADER_PARSE):
+                try:
+                    # Só o cabeçalho é lido (UTF-8, ou Latin-1 se falhar); arquivos grandes via mmap
+                    msg = read_headers(eml_path)
+                except Exception as e:
+                    self.logger.error(
+                        f"{eml_path} - Motivo: Falha ao ler o arquivo. Detalhes: {e}")
+                    # Incrementa erro
+                    self.error_count += 1
+                    return
 
         if not msg:
             self.logger.error(
@@ -125,7 +138,8 @@ class FileArchiver:
 
         date_str = msg.get("Date")
         # _parse_date lida com data inválida internamente
-        date_obj = self._parse_date(date_str, eml_path)
+        with self.metrics.stage(STAGE_DATE_PARSE):
+            date_obj = self._parse_date(date_str, eml_path)
 
         year = date_obj.strftime("%Y")
         year_month = date_obj.strftime("%Y-%m")
@@ -196,8 +210,9 @@ class FileArchiver:
 
     def process_other_file(self, file_path):
         try:
-            modification_time = os.path.getmtime(file_path)
-            date_obj = datetime.fromtimestamp(modification_time)
+            with self.metrics.stage(STAGE_DATE_PARSE):
+                modification_time = os.path.getmtime(file_path)
+                date_obj = datetime.fromtimestamp(modification_time)
         except OSError as e:
             self.logger.error(
                 f"{file_path} - Motivo: Falha ao obter data de modificação. Detalhes: {e}")
@@ -214,32 +229,9 @@ class FileArchiver:
 
     def _sanitize_filename(self, filename):
         """Remove ou substitui caracteres inválidos e o prefixo 'msg '."""
-        # 1. Remove o prefixo "msg " (case-insensitive) do início
-        #    O padrão ^ indica o início da string
-        #    re.IGNORECASE faz a busca ignorar maiúsculas/minúsculas
-        # Adicionado \s+ para remover o espaço seguinte também
-        sanitized = re.sub(r'^msg\s+', '', filename, flags=re.IGNORECASE)
-
-        # 2. Remove caracteres inválidos: < > : " / \ | ? *
-        sanitized = re.sub(r'[<>:"/\\|?*]', '_', sanitized)
-
-        # 3. Remove caracteres de controle (ASCII 0-31)
-        sanitized = re.sub(r'[\x00-\x1f]', '', sanitized)
-
-        # 4. Remove espaços em branco no início ou fim (após remover prefixo e inválidos)
-        sanitized = sanitized.strip()
-
-        # 5. Normaliza números no início do nome para remover zeros à esquerda
-        # Procura por um número no início do nome do arquivo
-        match = re.match(r'^(\d+)(.*)', sanitized)
-        if match:
-            number_str, rest_of_name = match.groups()
-            # Converte para inteiro para remover zeros à esquerda
-            number = int(number_str)
-            # Reconstrói o nome com o número sem zeros à esquerda
-            sanitized = str(number) + rest_of_name
-
-        # 6. Garante que o nome não seja vazio após a limpeza
+        # Prefixo "msg ", caracteres inválidos/de controle, espaços nas pontas e zeros à esquerda
+        sanitized = sanitize_filename(filename)
+        # Garante que o nome não seja vazio após a limpeza
         if not sanitized:
             # Se o nome original era apenas "msg " ou algo similar que foi removido
             sanitized = "arquivo_renomeado"  # Ou gerar um nome único com timestamp
@@ -307,12 +299,13 @@ class FileArchiver:
             return
 
         original_filename = os.path.basename(file_path)
-        # 1. Sanitizar
-        sanitized_filename = self._sanitize_filename(original_filename)
-        # 2. Truncar (considerando a pasta de destino)
-        max_allowed_path = MAX_PATH_LENGTH - SAFE_FILENAME_MARGIN
-        final_filename = self._truncate_filename(
-            archive_folder, sanitized_filename, max_allowed_path)
+        with self.metrics.stage(STAGE_SANITIZE):
+            # 1. Sanitizar
+            sanitized_filename = self._sanitize_filename(original_filename)
+            # 2. Truncar (considerando a pasta de destino)
+            max_allowed_path = MAX_PATH_LENGTH - SAFE_FILENAME_MARGIN
+            final_filename = self._truncate_filename(
+                archive_folder, sanitized_filename, max_allowed_path)
         destination_path = os.path.join(archive_folder, final_filename)
 
         # 3. Lidar com duplicados
@@ -320,57 +313,62 @@ class FileArchiver:
         base, ext = os.path.splitext(final_filename)
         temp_final_filename = final_filename  # Guarda o nome antes de adicionar sufixos
 
-        while os.path.exists(destination_path):
-            # Tenta adicionar _contador
-            new_filename_base = f"{base}_{counter}"
-            potential_new_filename = f"{new_filename_base}{ext}"
-            potential_new_path = os.path.join(
-                archive_folder, potential_new_filename)
-
-            # Verifica se o nome com contador ainda cabe no limite de path
-            if len(potential_new_path.encode('utf-8')) <= max_allowed_path:
-                final_filename = potential_new_filename
-            else:
-                # Se não couber, tenta truncar a base original e adicionar timestamp
-                timestamp = datetime.now().strftime("%Y%m%d%H%M%S%f")
-                # Usa a base do nome *antes* de adicionar o contador para truncar
-                base_original_sem_contador, ext_original = os.path.splitext(
-                    temp_final_filename)
-                nome_com_timestamp = f"{base_original_sem_contador}_{timestamp}{ext_original}"
-
-                # Trunca o nome com timestamp
-                final_filename = self._truncate_filename(
-                    archive_folder, nome_com_timestamp, max_allowed_path)
-                potential_new_path_ts = os.path.join(
-                    archive_folder, final_filename)
-
-                # Verifica colisão *novamente* após truncar com timestamp (raro, mas possível)
-                if os.path.exists(potential_new_path_ts):
+        with self.metrics.stage(STAGE_CONFLICT):
+            while os.path.exists(destination_path):
+                # Tenta adicionar _contador
+                new_filename_base = f"{base}_{counter}"
+                potential_new_filename = f"{new_filename_base}{ext}"
+                potential_new_path = os.path.join(
+                    archive_folder, potential_new_filename)
+
+                # Verifica se o nome com contador ainda cabe no limite de path
+                if len(potential_new_path.encode('utf-8')) <= max_allowed_path:
+                    final_filename = potential_new_filename
+                else:
+                    # Se não couber, tenta truncar a base original e adicionar timestamp
+                    timestamp = datetime.now().strftime("%Y%m%d%H%M%S%f")
+                    # Usa a base do nome *antes* de adicionar o contador para truncar
+                    base_original_sem_contador, ext_original = os.path.splitext(
+                        temp_final_filename)
+                    nome_com_timestamp = f"{base_original_sem_contador}_{timestamp}{ext_original}"
+
+                    # Trunca o nome com timestamp
+                    final_filename = self._truncate_filename(
+                        archive_folder, nome_com_timestamp, max_allowed_path)
+                    potential_new_path_ts = os.path.join(
+                        archive_folder, final_filename)
+
+                    # Verifica colisão *novamente* após truncar com timestamp (raro, mas possível)
+                    if os.path.exists(potential_new_path_ts):
+                        self.logger.error(
+                            f"{file_path} - Motivo: Conflito de nome irresolúvel em '{archive_folder}' após tentar adicionar contador e timestamp (arquivo duplicado: {original_filename}).")
+                        # Incrementa erro
+                        self.error_count += 1
+                        return  # Não pode mover
+                    else:
+                        # Nome com timestamp truncado funcionou, sai do loop while
+                        destination_path = potential_new_path_ts
+                        break  # Sai do while
+
+                # Atualiza destination_path para a próxima iteração do while (caso contador funcione)
+                destination_path = os.path.join(archive_folder, final_filename)
+                counter += 1
+                # Adiciona um limite para evitar loops infinitos em casos extremos
+                if counter > 100:
                     self.logger.error(
-                        f"{file_path} - Motivo: Conflito de nome irresolúvel em '{archive_folder}' após tentar adicionar contador e timestamp (arquivo duplicado: {original_filename}).")
-                    # Incrementa erro
+                        f"{file_path} - Motivo: Loop infinito detectado ao tentar resolver nome duplicado para '{original_filename}' em '{archive_folder}'.")
                     self.error_count += 1
                     return  # Não pode mover
-                else:
-                    # Nome com timestamp truncado funcionou, sai do loop while
-                    destination_path = potential_new_path_ts
-                    break  # Sai do while
-
-            # Atualiza destination_path para a próxima iteração do while (caso contador funcione)
-            destination_path = os.path.join(archive_folder, final_filename)
-            counter += 1
-            # Adiciona um limite para evitar loops infinitos em casos extremos
-            if counter > 100:
-                self.logger.error(
-                    f"{file_path} - Motivo: Loop infinito detectado ao tentar resolver nome duplicado para '{original_filename}' em '{archive_folder}'.")
-                self.error_count += 1
-                return  # Não pode mover
 
         # 4. Mover o arquivo
         try:
-            shutil.move(file_path, destination_path)
+            with self.metrics.stage(STAGE_MOVE):
+                file_size = os.path.getsize(file_path)
+                shutil.move(file_path, destination_path)
             # Incrementa contador de sucesso
             self.processed_files_count += 1
+            self.metrics.increment("files_moved")
+            self.metrics.increment("bytes_moved", file_size)
             # Removido print de sucesso individual
             # print(f"Arquivo {os.path.basename(destination_path)} arquivado em {archive_folder}")
         except Exception as e:
@@ -379,10 +377,26 @@ class FileArchiver:
             # Incrementa erro
             self.error_count += 1
 
+    def summary_dict(self):
+        """Retorna os contadores da última execução em formato serializável (JSON)."""
+        return {
+            "tool": "arquiva_email_gui",
+            "watch_folder": str(self.watch_folder),
+            "archive_root": str(self.archive_root),
+            "processed_files_count": self.processed_files_count,
+            "error_count": self.error_count,
+            "cancelled": self.progress.cancelled,
+            "log_folder": str(self.log_folder),
+            "metrics_path": str(self.metrics_path) if self.metrics_path else None,
+        }
+
 
 # select_folder permanece o mesmo
 def select_folder():
     """Abre uma janela para o usuário selecionar uma pasta."""
+    import tkinter as tk  # Importado apenas no modo gráfico
+    from tkinter import filedialog
+
     root = tk.Tk()
     root.withdraw()  # Oculta a janela principal do Tkinter
     folder_selected = filedialog.askdirectory(
@@ -399,6 +413,8 @@ def show_auto_close_message(message, timeout):
         message: Texto da mensagem
         timeout: Tempo em milissegundos antes do fechamento automático
     """
+    import tkinter as tk  # Importado apenas no modo gráfico
+
     # Criar janela
     root = tk.Tk()
     root.title("Processamento Concluído")
@@ -468,7 +484,11 @@ def show_auto_close_message(message, timeout):
     root.mainloop()
 
 
-def main():
+def main_gui():
+    """Fluxo gráfico: seleciona a pasta, arquiva os arquivos e exibe o resumo."""
+    import tkinter as tk  # Importado apenas no modo gráfico
+    from tkinter import messagebox
+
     # Usa Tkinter para seleção inicial, mas oculta a janela root principal
     root_temp = tk.Tk()
     root_temp.withdraw()
@@ -504,6 +524,7 @@ def main():
 
     archiver = FileArchiver(watch_folder, archive_root, log_folder)
     archiver.process_files()
+    close_logger(archiver.logger)  # Grava o que falta do log antes de apontá-lo ao usuário
 
     # --- Construção da Mensagem Final ---
     summary_message = "-" * 30 + "\n"
@@ -558,5 +579,41 @@ def main():
     show_auto_close_message(summary_message, 5000)  # Exibe por 15 segundos
 
 
+def build_arg_parser():
+    """Cria o parser de argumentos da linha de comando."""
+    parser = argparse.ArgumentParser(
+        description="Arquiva os arquivos de uma pasta em subpastas Ano/Ano-Mês dentro dela.")
+    parser.add_argument(
+        "pasta", nargs="?",
+        help="Pasta a ser processada. Se omitida, abre a interface gráfica.")
+    add_read_concurrency_argument(parser)
+    return parser
+
+
+def run_headless(args, progress=None):
+    """Executa o arquivamento sem interface gráfica e retorna o resumo em formato serializável."""
+    archiver = FileArchiver(args.pasta, args.pasta, os.path.join(args.pasta, "ERROS"), progress=progress,
+                            read_concurrency=args.leituras_simultaneas)
+    try:
+        archiver.process_files()
+    finally:
+        close_logger(archiver.logger)
+    return archiver.summary_dict()
+
+
+def main(argv=None):
+    """Ponto de entrada: modo linha de comando se a pasta for informada, senão modo gráfico."""
+    args = build_arg_parser().parse_args(argv)
+    if args.pasta is None:
+        main_gui()
+        return 0
+
+    # Mensagens de progresso vão para stderr; stdout fica reservado ao resumo JSON
+    with contextlib.redirect_stdout(sys.stderr):
+        summary = run_headless(args)
+    print(json.dumps(summary, indent=2))
+    return 1 if summary["error_count"] else 0
+
+
 if __name__ == "__main__":
-    main()
+    raise SystemExit(main())
@@ -1,11 +1,20 @@
+import argparse
+import contextlib
+import json
+import os
 import shutil
 import logging
-import re
+import sys
 from datetime import datetime
 from pathlib import Path
-from typing import List, Optional
-import tkinter as tk
-from tkinter import filedialog, messagebox
+from typing import Any, Dict, List, Optional, Set
+
+from diario_operacoes import OperationJournal
+from empacotar_meses import is_pack_file
+from metricas import STAGE_CONFLICT, STAGE_MOVE, STAGE_SANITIZE, RunMetrics
+from progresso import ProgressReporter
+from registro import LogAggregator, close_logger, setup_file_logger
+from sanitizacao import sanitize_filename
 
 # --- Constantes ---
 # Limite prático para caminhos no Windows para evitar problemas com funções padrão.
@@ -27,14 +36,17 @@ class FileMover:
     sanitizando nomes e tratando conflitos e limites de comprimento de caminho.
     """
 
-    def __init__(self, root_folder_path: str, log_folder_name: str = LOG_FOLDER_NAME):
+    def __init__(self, root_folder_path: str, log_folder_name: str = LOG_FOLDER_NAME,
+                 progress: Optional[ProgressReporter] = None):
         """
         Inicializa o FileMover.
 
         Args:
             root_folder_path: Caminho para a pasta raiz onde os arquivos serão centralizados.
             log_folder_name: Nome da pasta onde os logs serão salvos (dentro da root_folder_path).
+            progress: Recebe os eventos de progresso e o pedido de cancelamento (opcional).
         """
+        self.progress: ProgressReporter = progress or ProgressReporter()
         self.root_folder: Path = Path(root_folder_path).resolve()
         self.log_folder: Path = self.root_folder / log_folder_name
         self.setup_logger()
@@ -42,6 +54,20 @@ class FileMover:
             f.lower() for f in DEFAULT_EXCLUDED_FOLDERS]
         self.summary_message: str = ""
 
+        # --- Contadores da última execução ---
+        self.processed_files_count = 0
+        self.renamed_files_count = 0
+        self.moved_files_count = 0
+        self.error_count = 0
+        self.removed_folders_count = 0
+        # Retomada de execução interrompida (diário de operações)
+        self.resumed_files_count = 0  # Arquivos pulados por já terem sido tratados
+        self.replayed_moves_count = 0
+        self.rolled_back_moves_count = 0
+        self.journal: Optional[OperationJournal] = None
+        self.metrics = RunMetrics("arquiva_raiz")
+        self.metrics_path: Optional[Path] = None  # Arquivo JSON de métricas da última execução
+
     def process_files_in_root(self) -> None:
         """Processa arquivos: move de subpastas para a raiz e renomeia (sanitiza/trunca) arquivos na raiz e os movidos."""
         if not self.root_folder.exists() or not self.root_folder.is_dir():
@@ -49,14 +75,31 @@ class FileMover:
                 f"Pasta raiz não encontrada ou não é um diretório: {self.root_folder}")
             return
 
-        processed_files_count = 0
-        renamed_files_count = 0
-        moved_files_count = 0
-        error_count = 0
+        self.processed_files_count = 0
+        self.renamed_files_count = 0
+        self.moved_files_count = 0
+        self.error_count = 0
+        self.removed_folders_count = 0
+        self.metrics = RunMetrics("arquiva_raiz")
         max_allowed_path_len = EFFECTIVE_MAX_PATH - SAFE_PATH_MARGIN
 
+        # Diário de operações: retoma uma execução interrompida (movimentações pela metade e
+        # arquivos já tratados) e registra esta
+        self.journal = OperationJournal(self.log_folder, "arquiva_raiz", {"root_folder": str(self.root_folder)},
+                                        self.logger)
+        recovery = self.journal.start()
+        resume_skip: Set[str] = recovery.skip_paths
+        self.resumed_files_count = 0
+        self.replayed_moves_count = recovery.replayed
+        self.rolled_back_moves_count = recovery.rolled_back
+        self.error_count += recovery.errors
+
+        self.progress.start(stage="Centralizando")
         # Itera por todas as pastas, incluindo a raiz (`topdown=True` permite modificar `dir_names`)
-        for current_root_str, dir_names, file_names in os.walk(str(self.root_folder), topdown=True):
+        for current_root_str, dir_names, file_names in self.metrics.timed_iter(
+                os.walk(str(self.root_folder), topdown=True)):
+            if self.progress.cancelled:
+                break
             current_root_path = Path(current_root_str)
 
             # Remove pastas excluídas da lista `dir_names` para não entrar nelas
@@ -67,98 +110,44 @@ class FileMover:
             ]
 
             for original_filename in file_names:
+                if self.progress.cancelled:
+                    break
+                self.progress.advance(moved=self.processed_files_count, errors=self.error_count)
                 source_path = current_root_path / original_filename
 
                 # Ignora arquivos dentro da pasta de log (comparando pais resolvidos)
                 if source_path.parent.resolve() == self.log_folder.resolve():
                     continue
-
-                # 1. Aplica sanitização ao nome do arquivo
-                sanitized_filename = self._sanitize_filename(original_filename)
-                sanitization_occurred = (
-                    original_filename != sanitized_filename)
-                if sanitization_occurred:
-                    self.logger.info(
-                        f"Sanitizando nome: '{original_filename}' -> '{sanitized_filename}' (Origem: '{current_root_path}')")
-
-                # 2. Aplica truncamento inicial ao nome sanitizado, considerando o destino (root_folder)
-                current_final_filename = self._truncate_filename(
-                    self.root_folder, sanitized_filename, max_allowed_path_len)
-
-                potential_destination_path = self.root_folder / current_final_filename
-
-                # 3. Pula se o arquivo já está na raiz e o nome final é o mesmo (nenhuma ação necessária)
-                if current_root_path == self.root_folder and source_path == potential_destination_path:
+                # Meses empacotados pelo empacotar_meses não são trazidos para a raiz
+                if is_pack_file(source_path):
                     continue
-
-                # 4. Verifica se já existe um arquivo com o nome final no destino (root_folder)
-                #    e resolve conflitos adicionando timestamp e re-truncando se necessário.
-                destination_path = potential_destination_path
-                num_attempts = 0
-                original_conflicting_filename_part = current_final_filename  # Para logs mais claros
-
-                while destination_path.exists() and num_attempts < MAX_DUPLICATE_RESOLUTION_ATTEMPTS:
-                    num_attempts += 1
-                    timestamp = datetime.now().strftime("%Y%m%d%H%M%S%f")
-                    base_name, ext = Path(original_conflicting_filename_part).stem, Path(
-                        original_conflicting_filename_part).suffix
-
-                    name_with_timestamp = f"{base_name}_{timestamp}{ext}"
-
-                    current_final_filename = self._truncate_filename(
-                        self.root_folder, name_with_timestamp, max_allowed_path_len
-                    )
-                    destination_path = self.root_folder / current_final_filename
-
-                    if num_attempts == 1:  # Loga na primeira tentativa de renomeação por duplicidade
-                        self.logger.warning(
-                            f"Conflito de nome em '{self.root_folder}' para '{original_conflicting_filename_part}'. "
-                            f"Tentando renomear para '{current_final_filename}' (Origem: '{source_path}')")
-
-                if destination_path.exists():  # Ainda existe após MAX_ATTEMPTS
-                    self.logger.error(
-                        f"Não foi possível encontrar um nome único para '{original_conflicting_filename_part}' "
-                        f"em '{self.root_folder}' após {num_attempts} tentativas. Pulando '{source_path}'.")
-                    error_count += 1
-                    current_final_filename = None  # Marca para pular este arquivo
-
-                if current_final_filename is None:
+                if resume_skip and str(source_path) in resume_skip:
+                    self.resumed_files_count += 1  # Já tratado na execução interrompida
                     continue
-
-                # destination_path já está atualizado pelo loop acima ou é o potential_destination_path
-
-                # 5. Executa a ação: Mover (se veio de subpasta) ou Renomear (se já estava na raiz)
-                try:
-                    if current_root_path == self.root_folder:
-                        # Renomeia o arquivo dentro da pasta raiz, se o nome mudou
-                        if source_path != destination_path:
-                            source_path.rename(destination_path)
-                            renamed_files_count += 1
-                            processed_files_count += 1
-                    else:
-                        # Move o arquivo da subpasta para a raiz
-                        shutil.move(str(source_path), str(destination_path))
-                        moved_files_count += 1
-                        processed_files_count += 1
-
-                except (OSError, shutil.Error) as e:
-                    action_verb = "renomear" if current_root_path == self.root_folder else "mover"
-                    self.logger.error(
-                        f"Erro ao {action_verb} '{source_path}' para '{destination_path}': {e}")
-                    error_count += 1
+                self.metrics.increment("files_scanned")
+                errors_before = self.error_count
+                with self.metrics.measure_file():
+                    self._process_file(source_path, current_root_path, max_allowed_path_len)
+                # Só arquivos tratados sem erro são pulados na retomada; os que falharam são tentados de novo
+                if self.error_count == errors_before:
+                    self.journal.seen(source_path)
 
         summary_message = "-" * 30 + "\n"
-        if processed_files_count > 0:
+        if self.processed_files_count > 0:
             summary_message += "Processamento concluído:\n"
-            if renamed_files_count > 0:
-                summary_message += f"- {renamed_files_count} arquivos renomeados na pasta raiz.\n"
-            if moved_files_count > 0:
-                summary_message += f"- {moved_files_count} arquivos movidos das subpastas para a raiz.\n"
+            if self.renamed_files_count > 0:
+                summary_message += f"- {self.renamed_files_count} arquivos renomeados na pasta raiz.\n"
+            if self.moved_files_count > 0:
+                summary_message += f"- {self.moved_files_count} arquivos movidos das subpastas para a raiz.\n"
         else:
             summary_message += "Nenhum arquivo precisou ser movido ou renomeado.\n"
+        if self.resumed_files_count or self.replayed_moves_count or self.rolled_back_moves_count:
+            summary_message += (f"- Execução interrompida retomada: {self.resumed_files_count} arquivos já tratados "
+                                f"pulados, {self.replayed_moves_count} movimentações concluídas, "
+                                f"{self.rolled_back_moves_count} cópias pela metade desfeitas.\n")
 
-        if error_count > 0:
-            summary_message += f"\nAtenção: Ocorreram {error_count} erros durante a operação. Verifique o log em '{self.log_folder}'.\n"
+        if self.error_count > 0:
+            summary_message += f"\nAtenção: Ocorreram {self.error_count} erros durante a operação. Verifique o log em '{self.log_folder}'.\n"
         else:
             log_file_exists = False
             if self.log_folder.exists():
@@ -170,14 +159,115 @@ class FileMover:
             else:
                 summary_message += "\nOperação concluída sem erros ou necessidade de alterações nos nomes dos arquivos.\n"
 
+        if self.progress.cancelled:
+            summary_message += "\nOperação cancelada pelo usuário antes do fim; os arquivos restantes não foram processados.\n"
+        self.progress.finish(moved=self.processed_files_count, errors=self.error_count)
+        # Execução até o fim apaga o diário; cancelada, ele fica para a próxima retomar
+        self.journal.close(finished=not self.progress.cancelled)
+        self.log_aggregator.flush()
+        self.metrics.increment("errors", self.error_count)
+        self.metrics_path = self.metrics.write_json(self.log_folder)
+
         self.summary_message = summary_message
 
-        if moved_files_count > 0:
+        if self.moved_files_count > 0:
             empty_folders_message = self.remove_empty_folders()
             self.summary_message += "\n" + empty_folders_message
         else:
             self.summary_message += "\nNenhuma pasta vazia para remover (nenhum arquivo foi movido)."
 
+    def _process_file(self, source_path: Path, current_root_path: Path, max_allowed_path_len: int) -> None:
+        """Sanitiza, trunca e move (ou renomeia na raiz) um único arquivo, resolvendo conflitos de nome."""
+        original_filename = source_path.name
+
+        with self.metrics.stage(STAGE_SANITIZE):
+            # 1. Aplica sanitização ao nome do arquivo
+            sanitized_filename = self._sanitize_filename(original_filename)
+            sanitization_occurred = (
+                original_filename != sanitized_filename)
+            if sanitization_occurred:
+                self.log_aggregator.log(
+                    logging.INFO, "nomes sanitizados", str(current_root_path),
+                    f"Sanitizando nome: '{original_filename}' -> '{sanitized_filename}' (Origem: '{current_root_path}')")
+
+            # 2. Aplica truncamento inicial ao nome sanitizado, considerando o destino (root_folder)
+            current_final_filename = self._truncate_filename(
+                self.root_folder, sanitized_filename, max_allowed_path_len)
+
+        potential_destination_path = self.root_folder / current_final_filename
+
+        # 3. Pula se o arquivo já está na raiz e o nome final é o mesmo (nenhuma ação necessária)
+        if current_root_path == self.root_folder and source_path == potential_destination_path:
+            return
+
+        # 4. Verifica se já existe um arquivo com o nome final no destino (root_folder)
+        #    e resolve conflitos adicionando timestamp e re-truncando se necessário.
+        destination_path = potential_destination_path
+        num_attempts = 0
+        original_conflicting_filename_part = current_final_filename  # Para logs mais claros
+
+        with self.metrics.stage(STAGE_CONFLICT):
+            while destination_path.exists() and num_attempts < MAX_DUPLICATE_RESOLUTION_ATTEMPTS:
+                num_attempts += 1
+                timestamp = datetime.now().strftime("%Y%m%d%H%M%S%f")
+                base_name, ext = Path(original_conflicting_filename_part).stem, Path(
+                    original_conflicting_filename_part).suffix
+
+                name_with_timestamp = f"{base_name}_{timestamp}{ext}"
+
+                current_final_filename = self._truncate_filename(
+                    self.root_folder, name_with_timestamp, max_allowed_path_len
+                )
+                destination_path = self.root_folder / current_final_filename
+
+                if num_attempts == 1:  # Loga na primeira tentativa de renomeação por duplicidade
+                    self.log_aggregator.log(
+                        logging.WARNING, "conflitos de nome", str(current_root_path),
+                        f"Conflito de nome em '{self.root_folder}' para '{original_conflicting_filename_part}'. "
+                        f"Tentando renomear para '{current_final_filename}' (Origem: '{source_path}')")
+
+        if destination_path.exists():  # Ainda existe após MAX_ATTEMPTS
+            self.logger.error(
+                f"Não foi possível encontrar um nome único para '{original_conflicting_filename_part}' "
+                f"em '{self.root_folder}' após {num_attempts} tentativas. Pulando '{source_path}'.")
+            self.error_count += 1
+            current_final_filename = None  # Marca para pular este arquivo
+
+        if current_final_filename is None:
+            return
+
+        # destination_path já está atualizado pelo loop acima ou é o potential_destination_path
+
+        # 5. Executa a ação: Mover (se veio de subpasta) ou Renomear (se já estava na raiz)
+        op_id = 0
+        try:
+            with self.metrics.stage(STAGE_MOVE):
+                if current_root_path == self.root_folder:
+                    # Renomeia o arquivo dentro da pasta raiz, se o nome mudou
+                    if source_path != destination_path:
+                        op_id = self.journal.intent(source_path, destination_path)
+                        source_path.rename(destination_path)
+                        self.renamed_files_count += 1
+                        self.processed_files_count += 1
+                        self.metrics.increment("files_renamed")
+                else:
+                    # Move o arquivo da subpasta para a raiz
+                    file_size = source_path.stat().st_size
+                    op_id = self.journal.intent(source_path, destination_path)
+                    shutil.move(str(source_path), str(destination_path))
+                    self.moved_files_count += 1
+                    self.processed_files_count += 1
+                    self.metrics.increment("files_moved")
+                    self.metrics.increment("bytes_moved", file_size)
+            self.journal.done(op_id)
+
+        except (OSError, shutil.Error) as e:
+            self.journal.failed(op_id)
+            action_verb = "renomear" if current_root_path == self.root_folder else "mover"
+            self.logger.error(
+                f"Erro ao {action_verb} '{source_path}' para '{destination_path}': {e}")
+            self.error_count += 1
+
     def remove_empty_folders(self) -> str:
         """Remove pastas vazias APENAS das subpastas de onde os arquivos foram movidos."""
         message = "Verificando pastas vazias para remoção...\n"
@@ -213,6 +303,7 @@ class FileMover:
                         f"Erro ao verificar ou remover a pasta '{current_root_path}': {e}")
                     error_remove_count += 1
 
+        self.removed_folders_count = removed_count
         if removed_count > 0:
             message += f"Remoção de pastas vazias concluída. {removed_count} pastas removidas.\n"
         else:
@@ -230,40 +321,18 @@ class FileMover:
         timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
         log_file = self.log_folder / f"process_root_log_{timestamp}.log"
 
-        self.logger = logging.getLogger(
-            f"{__name__}.{id(self)}")  # Nome único para o logger
-        if not self.logger.hasHandlers():
-            self.logger.setLevel(logging.INFO)
-            file_handler = logging.FileHandler(str(log_file), encoding='utf-8')
-            file_handler.setLevel(logging.INFO)
-            formatter = logging.Formatter(
-                "%(asctime)s - %(levelname)s - %(message)s", datefmt="%Y-%m-%d %H:%M:%S")
-            file_handler.setFormatter(formatter)
-            self.logger.addHandler(file_handler)
+        self.logger = setup_file_logger(
+            f"{__name__}.{id(self)}", log_file, logging.INFO,  # Nome único para o logger
+            "%(asctime)s - %(levelname)s - %(message)s", datefmt="%Y-%m-%d %H:%M:%S")
+        # Sanitizações e conflitos de nome repetidos (por pasta de origem) viram uma linha de resumo
+        self.log_aggregator = LogAggregator(self.logger)
 
     def _sanitize_filename(self, filename: str) -> str:
         """
         Remove ou substitui caracteres inválidos, o prefixo 'msg ',
         espaços extras e normaliza números no início do nome.
         """
-        sanitized = re.sub(r'^msg\s+', '', filename, flags=re.IGNORECASE)
-        sanitized = re.sub(r'[<>:"/\\|?*]', '_', sanitized)
-        sanitized = re.sub(r'[\x00-\x1f]', '', sanitized)
-        sanitized = sanitized.strip()
-
-        match = re.match(r'^(\d+)(.*)', sanitized)
-        if match:
-            number_str, rest_of_name = match.groups()
-            try:  # Adicionado try-except para números muito grandes que não cabem em int
-                number = int(number_str)
-                sanitized = str(number) + rest_of_name
-            except ValueError:
-                # Se o número for muito grande, mantenha como string, mas remova zeros à esquerda se houver mais de um dígito e começar com zero
-                if len(number_str) > 1 and number_str.startswith('0'):
-                    sanitized = number_str.lstrip('0') + rest_of_name
-                else:  # Mantém o número original se for um único '0' ou não começar com '0'
-                    sanitized = number_str + rest_of_name
-
+        sanitized = sanitize_filename(filename)
         if not sanitized:
             self.logger.warning(
                 f"Nome do arquivo '{filename}' resultou em vazio após sanitização. Usando fallback.")
@@ -317,9 +386,31 @@ class FileMover:
         # Se não precisou truncar a base (já coberto pelo primeiro if, mas como segurança)
         return filename
 
+    def summary_dict(self) -> Dict[str, Any]:
+        """Retorna os contadores da última execução em formato serializável (JSON)."""
+        return {
+            "tool": "arquiva_raiz",
+            "root_folder": str(self.root_folder),
+            "processed_files_count": self.processed_files_count,
+            "renamed_files_count": self.renamed_files_count,
+            "moved_files_count": self.moved_files_count,
+            "removed_folders_count": self.removed_folders_count,
+            "resumed_files_count": self.resumed_files_count,
+            "replayed_moves_count": self.replayed_moves_count,
+            "rolled_back_moves_count": self.rolled_back_moves_count,
+            "error_count": self.error_count,
+            "cancelled": self.progress.cancelled,
+            "log_folder": str(self.log_folder),
+            "metrics_path": str(self.metrics_path) if self.metrics_path else None,
+            "summary": self.summary_message,
+        }
+
 
 def select_folder() -> Optional[str]:
     """Abre uma janela para o usuário selecionar uma pasta."""
+    import tkinter as tk  # Importado apenas no modo gráfico
+    from tkinter import filedialog
+
     root_tk = tk.Tk()
     root_tk.withdraw()
     folder_selected = filedialog.askdirectory(title="Selecione a Pasta Raiz")
@@ -327,8 +418,11 @@ def select_folder() -> Optional[str]:
     return folder_selected
 
 
-def main() -> None:
-    """Função principal para executar o processo de movimentação e sanitização de arquivos."""
+def main_gui() -> None:
+    """Fluxo gráfico: seleciona a pasta raiz, centraliza os arquivos e exibe o resumo."""
+    import tkinter as tk  # Importado apenas no modo gráfico
+    from tkinter import messagebox
+
     # Necessário para que as caixas de diálogo do tkinter funcionem corretamente
     # mesmo que a janela principal não seja exibida ou seja destruída rapidamente.
     root_for_dialogs = tk.Tk()
@@ -364,14 +458,9 @@ def main() -> None:
                         parent=root_for_dialogs)
     root_for_dialogs.destroy()  # Destruir a root temporária dos dialogs iniciais
 
-    # Precisamos importar os aqui porque FileMover ainda usa os.walk internamente
-    # Se FileMover for totalmente migrado para não usar os.walk, esta importação pode ser removida.
-    # TODO: Avaliar a substituição completa de os.walk em FileMover se Path.glob/rglob for suficiente.
-    global os
-    import os
-
     mover = FileMover(root_folder_str)
     mover.process_files_in_root()
+    close_logger(mover.logger)  # Grava o que falta do log antes de apontá-lo ao usuário
 
     log_files_exist = False
     if mover.log_folder.exists():
@@ -391,6 +480,8 @@ def show_auto_close_message(message: str, timeout: int) -> None:
     """
     Exibe uma mensagem que se fecha automaticamente após o tempo especificado.
     """
+    import tkinter as tk  # Importado apenas no modo gráfico
+
     msg_root = tk.Tk()
     msg_root.title("Processamento Concluído")
 
@@ -442,5 +533,48 @@ def show_auto_close_message(message: str, timeout: int) -> None:
     msg_root.mainloop()
 
 
+def build_arg_parser() -> argparse.ArgumentParser:
+    """Cria o parser de argumentos da linha de comando."""
+    parser = argparse.ArgumentParser(
+        description="Centraliza na pasta raiz os arquivos de todas as subpastas, sanitizando os nomes.")
+    parser.add_argument(
+        "pasta", nargs="?",
+        help="Pasta raiz onde os arquivos serão centralizados. Se omitida, abre a interface gráfica.")
+    return parser
+
+
+def run_headless(args: argparse.Namespace, progress: Optional[ProgressReporter] = None) -> Dict[str, Any]:
+    """Executa a centralização sem interface gráfica e retorna o resumo em formato serializável."""
+    root_folder_path = Path(args.pasta)
+    if not root_folder_path.is_dir():
+        return {
+            "tool": "arquiva_raiz",
+            "root_folder": str(root_folder_path),
+            "error_count": 1,
+            "summary": f"ERRO: A pasta {root_folder_path} não foi encontrada ou não é um diretório.",
+        }
+
+    mover = FileMover(args.pasta, progress=progress)
+    try:
+        mover.process_files_in_root()
+    finally:
+        close_logger(mover.logger)
+    return mover.summary_dict()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Ponto de entrada: modo linha de comando se a pasta for informada, senão modo gráfico."""
+    args = build_arg_parser().parse_args(argv)
+    if args.pasta is None:
+        main_gui()
+        return 0
+
+    # Mensagens de progresso vão para stderr; stdout fica reservado ao resumo JSON
+    with contextlib.redirect_stdout(sys.stderr):
+        summary = run_headless(args)
+    print(json.dumps(summary, indent=2))
+    return 1 if summary["error_count"] else 0
+
+
 if __name__ == "__main__":
-    main()
+    raise SystemExit(main())
@@ -1,13 +1,24 @@
+import argparse
+import contextlib
 import shutil
 import email
+import json
 import os  # Adicionado para os.walk
 import logging
 import re
+import sys
 from datetime import datetime
 from pathlib import Path
-from typing import Optional, List
-import tkinter as tk_module  # Alias to avoid conflict
-from tkinter import filedialog, messagebox
+from typing import Any, Callable, Dict, Optional, List, Set
+
+from diario_operacoes import OperationJournal
+from empacotar_meses import is_pack_file
+from leitura_cabecalhos import add_read_concurrency_argument, parse_headers_compat, process_with_prefetch, read_headers
+from metricas import (STAGE_CONFLICT, STAGE_DATE_PARSE, STAGE_HEADER_PARSE, STAGE_MOVE, STAGE_SANITIZE,
+                      RunMetrics)
+from progresso import ProgressReporter
+from registro import LogAggregator, close_logger, setup_file_logger
+from sanitizacao import sanitize_filename
 
 # --- Constantes ---
 # Limite prático para caminhos no Windows (MAX_PATH (260) - 1 para nulo)
@@ -27,7 +38,13 @@ DEFAULT_EXCLUDED_FOLDERS = ["anos anteriores", "erros"]
 class FileArchiver:
     """Arquiva arquivos de uma pasta e suas subpastas para uma estrutura de pastas baseada em data."""
 
-    def __init__(self, watch_folder_str: str, archive_root_str: str, log_folder_name: str = LOG_FOLDER_NAME):
+    # Nome usado nas métricas, no diário e no resumo, e interpretação dos cabeçalhos lidos
+    # (o renomear_arquivar troca os dois)
+    tool_name = "arquiva_subpastas"
+    parse_headers = staticmethod(parse_headers_compat)
+
+    def __init__(self, watch_folder_str: str, archive_root_str: str, log_folder_name: str = LOG_FOLDER_NAME,
+                 progress: Optional[ProgressReporter] = None, read_concurrency: int = 1):
         """
         Inicializa o FileArchiver para processamento recursivo.
 
@@ -36,7 +53,12 @@ class FileArchiver:
             archive_root_str: Caminho da pasta raiz onde a estrutura de arquivamento (Ano/Mês) será criada.
                               Normalmente, é o mesmo que watch_folder_str para este script.
             log_folder_name: Nome da pasta de log (será criada dentro de archive_root_str).
+            progress: Recebe os eventos de progresso e o pedido de cancelamento (opcional).
+            read_concurrency: Acima de 1, lista toda a árvore primeiro e lê antecipadamente, em paralelo,
+                              os cabeçalhos dos .eml (útil em compartilhamentos de rede).
         """
+        self.progress: ProgressReporter = progress or ProgressReporter()
+        self.read_concurrency = read_concurrency
         self.watch_folder: Path = Path(watch_folder_str).resolve()
         # Geralmente o mesmo que watch_folder
         self.archive_root: Path = Path(archive_root_str).resolve()
@@ -51,7 +73,15 @@ class FileArchiver:
         self.error_count = 0
         self.created_folders_count = 0
         self.deleted_empty_folders_count = 0  # Novo contador
+        # Retomada de execução interrompida (diário de operações)
+        self.resumed_files_count = 0  # Arquivos pulados por já terem sido tratados
+        self.replayed_moves_count = 0
+        self.rolled_back_moves_count = 0
+        self.journal: Optional[OperationJournal] = None
+        self._resume_skip: Set[str] = set()
         self.summary_message = ""
+        self.metrics = RunMetrics(self.tool_name)
+        self.metrics_path: Optional[Path] = None  # Arquivo JSON de métricas da última execução
         # --- End Counters and Summary ---
 
     def setup_logger(self) -> None:
@@ -63,24 +93,9 @@ class FileArchiver:
             log_file = self.log_folder / \
                 f"{LOG_FILENAME_PREFIX}{timestamp}.log"
 
-            self.logger = logging.getLogger(
-                f"{__name__}.subpastas.{id(self)}")  # Unique logger name
-            self.logger.propagate = False  # Prevent propagation if root logger exists
-            self.logger.setLevel(logging.ERROR)
-
-            # Remove handlers existentes para evitar duplicação
-            if self.logger.hasHandlers():
-                self.logger.handlers.clear()
-
-            file_handler = logging.FileHandler(str(log_file), encoding='utf-8')
-            file_handler.setLevel(logging.ERROR)
-
-            formatter = logging.Formatter(
-                "%(asctime)s - %(levelname)s - Arquivo: %(message)s",
-                datefmt="%Y-%m-%d %H:%M:%S")
-            file_handler.setFormatter(formatter)
-
-            self.logger.addHandler(file_handler)
+            self.logger = setup_file_logger(
+                f"{__name__}.subpastas.{id(self)}", log_file, logging.ERROR,  # Unique logger name
+                "%(asctime)s - %(levelname)s - Arquivo: %(message)s", datefmt="%Y-%m-%d %H:%M:%S")
 
         except Exception as e:
             critical_error_msg = f"ERRO CRÍTICO: Não foi possível configurar o logger em {self.log_folder}. Erro: {e}"
@@ -93,6 +108,8 @@ class FileArchiver:
             except Exception:  # pylint: disable=broad-except
                 pass  # Ignora se nem isso funcionar
             self.error_count += 1
+        # Conflitos de nome (por mês) e datas ilegíveis (por pasta) repetidos viram uma linha de resumo
+        self.log_aggregator = LogAggregator(self.logger)
 
     def process_files_recursively(self) -> None:
         """Processa arquivos recursivamente a partir da watch_folder e gera uma mensagem de resumo."""
@@ -117,15 +134,45 @@ class FileArchiver:
         self.created_folders_count = 0
         self.deleted_empty_folders_count = 0  # Resetar contador para a execução
         # Não resetar self.error_count totalmente para manter erros de setup do logger
-
-        self.process_folder(self.watch_folder)
+        self.metrics = RunMetrics(self.tool_name)
+
+        # Diário de operações: retoma uma execução interrompida (movimentações pela metade e
+        # arquivos já tratados) e registra esta
+        self.journal = OperationJournal(
+            self.log_folder, self.tool_name,
+            {"watch_folder": str(self.watch_folder), "archive_root": str(self.archive_root)}, self.logger)
+        recovery = self.journal.start()
+        self._resume_skip = recovery.skip_paths
+        self.resumed_files_count = 0
+        self.replayed_moves_count = recovery.replayed
+        self.rolled_back_moves_count = recovery.rolled_back
+        self.error_count += recovery.errors
+
+        self.progress.start(stage="Arquivando")
+        if self.read_concurrency > 1:
+            files_to_process: List[Path] = []
+            self.process_folder(self.watch_folder, files_to_process.append)
+            self.progress.set_stage("Arquivando", total=len(files_to_process))
+            process_with_prefetch(files_to_process, self._handle_file, self.read_concurrency, parse=self.parse_headers,
+                                  should_stop=lambda: self.progress.cancelled, metrics=self.metrics)
+        else:
+            self.process_folder(self.watch_folder)
         # Garante que erros de processamento sejam somados
         self.error_count = initial_error_count + \
             (self.error_count - initial_error_count)
 
         # --- Apagar pastas vazias ---
-        self._delete_empty_folders(self.watch_folder)
+        if not self.progress.cancelled:
+            self.progress.set_stage("Removendo pastas vazias")
+            self._delete_empty_folders(self.watch_folder)
         # --- Fim Apagar pastas vazias ---
+        # Execução até o fim apaga o diário; cancelada, ele fica para a próxima retomar
+        self.journal.close(finished=not self.progress.cancelled)
+        self._resume_skip = set()
+        self.log_aggregator.flush()
+        self.progress.finish(moved=self.moved_files_count, errors=self.error_count)
+        self.metrics.increment("errors", self.error_count)
+        self.metrics_path = self.metrics.write_json(self.log_folder)
 
         # --- Generate Summary Message ---
         summary = "-" * 30 + "\n"
@@ -146,17 +193,28 @@ class FileArchiver:
                 summary += "Nenhum arquivo precisou ser movido ou renomeado. Organização e nomes já estavam corretos.\n"
             else:
                 summary += "Nenhuma ação de movimentação ou renomeio foi concluída com sucesso (verifique os erros).\n"
+        if self.resumed_files_count or self.replayed_moves_count or self.rolled_back_moves_count:
+            summary += (f"- Execução interrompida retomada: {self.resumed_files_count} arquivos já tratados pulados, "
+                        f"{self.replayed_moves_count} movimentações concluídas, "
+                        f"{self.rolled_back_moves_count} cópias pela metade desfeitas.\n")
 
         if self.error_count > 0:
             summary += f"\nAtenção: Ocorreram {self.error_count} erros durante a operação. Verifique o log em '{self.log_folder}'.\n"
         elif actions_taken:
             summary += "\nOperação concluída sem erros registrados.\n"
+        if self.progress.cancelled:
+            summary += "\nOperação cancelada pelo usuário antes do fim; os arquivos restantes não foram processados.\n"
 
         self.summary_message = summary
         # --- End Generate Summary Message ---
 
-    def process_folder(self, current_folder_path: Path) -> None:
-        """Processa recursivamente os itens em uma pasta."""
+    def process_folder(self, current_folder_path: Path,
+                       on_file: Optional[Callable[[Path], None]] = None) -> None:
+        """
+        Processa recursivamente os itens em uma pasta. Com `on_file`, os arquivos encontrados são
+        apenas repassados a ele (ex.: para montar a lista usada na leitura antecipada).
+        """
+        on_file = on_file or self._handle_file
         try:
             if not current_folder_path.is_dir():  # Verificação extra
                 self.logger.error(
@@ -164,16 +222,23 @@ class FileArchiver:
                 self.error_count += 1
                 return
 
-            for item_path in current_folder_path.iterdir():
+            for item_path in self.metrics.timed_iter(current_folder_path.iterdir()):
+                if self.progress.cancelled:
+                    return
                 try:
                     if item_path.is_dir():
                         if item_path.name.lower() not in self.excluded_folders_lower and \
                            item_path.resolve() != self.log_folder.resolve():
-                            self.process_folder(item_path)  # Chamada recursiva
+                            self.process_folder(item_path, on_file)  # Chamada recursiva
                     elif item_path.is_file():
                         if item_path.name.lower().endswith(".ffs_db") or item_path.name.lower().endswith(".ffs_lock"):  # Ignora .ffs_db
                             continue
-                        self.process_file(item_path)
+                        if is_pack_file(item_path):  # Mês empacotado pelo empacotar_meses: fica onde está
+                            continue
+                        if self._resume_skip and str(item_path) in self._resume_skip:
+                            self.resumed_files_count += 1  # Já tratado na execução interrompida
+                            continue
+                        on_file(item_path)
                 except OSError as e_item:
                     self.logger.error(
                         f"{item_path.name} (em {item_path.parent}) - Motivo: Erro ao acessar item. Detalhes: {e_item}")
@@ -191,11 +256,26 @@ class FileArchiver:
                 f"{current_folder_path} - Motivo: Erro inesperado ao processar pasta. Detalhes: {e}")
             self.error_count += 1
 
-    def process_file(self, file_path: Path) -> None:
+    def _handle_file(self, file_path: Path, headers: Optional[email.message.Message] = None) -> None:
+        """Processa um arquivo encontrado na varredura, contabilizando métricas e progresso."""
+        self.metrics.increment("files_scanned")
+        errors_before = self._run_error_count()
+        with self.metrics.measure_file():
+            self.process_file(file_path, headers)
+        # Só arquivos tratados sem erro são pulados na retomada; os que falharam são tentados de novo
+        if self.journal is not None and self._run_error_count() == errors_before:
+            self.journal.seen(file_path)
+        self.progress.advance(moved=self.moved_files_count, errors=self.error_count)
+
+    def _run_error_count(self) -> int:
+        """Erros registrados até agora na execução."""
+        return self.error_count
+
+    def process_file(self, file_path: Path, headers: Optional[email.message.Message] = None) -> None:
         """Processa um único arquivo, determinando seu tipo e chamando a função apropriada."""
         try:
             if file_path.suffix.lower() == ".eml":
-                self.process_eml_file(file_path)
+                self.process_eml_file(file_path, headers)
             else:
                 self.process_other_file(file_path)
         except Exception as e:
@@ -203,36 +283,32 @@ class FileArchiver:
                 f"{file_path.name} (em {file_path.parent}) - Motivo: Erro inesperado durante o processamento inicial. Detalhes: {e}")
             self.error_count += 1
 
-    def process_eml_file(self, eml_path: Path) -> None:
-        """Processa arquivos .eml para extrair data e mover."""
-        msg: Optional[email.message.Message] = None
-        try:
-            with eml_path.open('r', encoding='utf-8') as f:
-                msg = email.message_from_file(f)
-        except UnicodeDecodeError:
-            try:
-                with eml_path.open('r', encoding='latin-1') as f:
-                    msg = email.message_from_file(f)
-            except Exception as e:
-                self.logger.error(
-                    f"{eml_path.name} - Motivo: Falha ao ler o arquivo (tentativas UTF-8 e Latin-1). Detalhes: {e}")
-                self.error_count += 1
-                return
-        except FileNotFoundError:
-            self.logger.error(
-                f"{eml_path.name} - Motivo: Arquivo não encontrado (pode ter sido movido/excluído).")
-            self.error_count += 1
-            return
-        except OSError as e:  # Erros de permissão, etc.
-            self.logger.error(
-                f"{eml_path.name} - Motivo: Erro de sistema ao ler o arquivo. Detalhes: {e}")
-            self.error_count += 1
-            return
-        except Exception as e:  # Outros erros de leitura
-            self.logger.error(
-                f"{eml_path.name} - Motivo: Falha genérica ao ler o arquivo. Detalhes: {e}")
-            self.error_count += 1
-            return
+    def process_eml_file(self, eml_path: Path, headers: Optional[email.message.Message] = None) -> None:
+        """
+        Processa arquivos .eml para extrair data e mover. `headers` são os cabeçalhos já lidos
+        antecipadamente, se houver; senão o arquivo é lido aqui.
+        """
+        msg: Optional[email.message.Message] = headers
+        if msg is None:
+            with self.metrics.stage(STAGE_HEADER_PARSE):
+                try:
+                    # Só o cabeçalho é lido (UTF-8, ou Latin-1 se falhar); arquivos grandes via mmap
+                    msg = read_headers(eml_path, self.parse_headers)
+                except FileNotFoundError:
+                    self.logger.error(
+                        f"{eml_path.name} - Motivo: Arquivo não encontrado (pode ter sido movido/excluído).")
+                    self.error_count += 1
+                    return
+                except OSError as e:  # Erros de permissão, etc.
+                    self.logger.error(
+                        f"{eml_path.name} - Motivo: Erro de sistema ao ler o arquivo. Detalhes: {e}")
+                    self.error_count += 1
+                    return
+                except Exception as e:  # Outros erros de leitura
+                    self.logger.error(
+                        f"{eml_path.name} - Motivo: Falha genérica ao ler o arquivo. Detalhes: {e}")
+                    self.error_count += 1
+                    return
 
         if not msg:
             self.logger.error(
@@ -241,7 +317,8 @@ class FileArchiver:
             return
 
         date_str = msg.get("Date")
-        date_obj = self._parse_date(date_str, eml_path)
+        with self.metrics.stage(STAGE_DATE_PARSE):
+            date_obj = self._parse_date(date_str, eml_path)
 
         year = date_obj.strftime("%Y")
         year_month = date_obj.strftime("%Y-%m")
@@ -285,7 +362,8 @@ class FileArchiver:
             except ValueError:
                 continue
 
-        self.logger.error(
+        self.log_aggregator.log(
+            logging.ERROR, "datas ilegíveis", str(file_path_for_log.parent),
             f"{file_path_for_log.name} - Motivo: Falha ao interpretar data '{date_str}'. Usando data/hora atual.")
         self.error_count += 1
         return datetime.now()
@@ -293,8 +371,9 @@ class FileArchiver:
     def process_other_file(self, file_path: Path) -> None:
         """Processa outros tipos de arquivo usando data de modificação."""
         try:
-            modification_time = file_path.stat().st_mtime
-            date_obj = datetime.fromtimestamp(modification_time)
+            with self.metrics.stage(STAGE_DATE_PARSE):
+                modification_time = file_path.stat().st_mtime
+                date_obj = datetime.fromtimestamp(modification_time)
         except FileNotFoundError:
             self.logger.error(
                 f"{file_path.name} - Motivo: Arquivo não encontrado ao obter data de modificação.")
@@ -319,23 +398,7 @@ class FileArchiver:
 
     def _sanitize_filename(self, filename: str) -> str:
         """Remove ou substitui caracteres inválidos, o prefixo 'msg ' e normaliza números."""
-        sanitized = re.sub(r'^msg\s+', '', filename, flags=re.IGNORECASE)
-        sanitized = re.sub(r'[<>:"/\\|?*]', '_', sanitized)
-        sanitized = re.sub(r'[\x00-\x1f]', '', sanitized)
-        sanitized = sanitized.strip()
-
-        match = re.match(r'^(\d+)(.*)', sanitized)
-        if match:
-            number_str, rest_of_name = match.groups()
-            try:
-                number = int(number_str)
-                sanitized = str(number) + rest_of_name
-            except ValueError:  # Para números muito grandes
-                if len(number_str) > 1 and number_str.startswith('0'):
-                    sanitized = number_str.lstrip('0') + rest_of_name
-                else:
-                    sanitized = number_str + rest_of_name
-
+        sanitized = sanitize_filename(filename)
         if not sanitized:
             self.logger.error(
                 f"Nome do arquivo '{filename}' resultou em vazio após sanitização. Usando fallback '{FALLBACK_SANITIZED_FILENAME}'.")
@@ -380,10 +443,12 @@ class FileArchiver:
 
         return filename  # Não precisou truncar a base
 
-    def move_file_to_archive(self, source_path: Path, target_destination_folder: Path) -> None:
+    def move_file_to_archive(self, source_path: Path, target_destination_folder: Path,
+                             target_filename: Optional[str] = None) -> None:
         """
         Move ou renomeia o arquivo para a pasta de destino, tratando sanitização,
         truncamento e duplicados. Decide entre mover, renomear no local ou ignorar.
+        `target_filename` dá outro nome ao arquivo no destino (padrão: o nome atual).
         """
         if not source_path.exists():
             return
@@ -406,40 +471,43 @@ class FileArchiver:
             self.error_count += 1
             return
 
-        original_filename = source_path.name
-        sanitized_filename = self._sanitize_filename(original_filename)
-        max_allowed_path = EFFECTIVE_MAX_PATH - SAFE_PATH_MARGIN
+        original_filename = target_filename or source_path.name
+        with self.metrics.stage(STAGE_SANITIZE):
+            sanitized_filename = self._sanitize_filename(original_filename)
+            max_allowed_path = EFFECTIVE_MAX_PATH - SAFE_PATH_MARGIN
 
-        desired_filename_in_target = self._truncate_filename(
-            target_destination_folder, sanitized_filename, max_allowed_path)
+            desired_filename_in_target = self._truncate_filename(
+                target_destination_folder, sanitized_filename, max_allowed_path)
 
         current_target_filename = desired_filename_in_target
         destination_path = target_destination_folder / current_target_filename
         num_attempts = 0
 
         # Loop para resolver conflitos se o destino existe E NÃO é o mesmo arquivo de origem
-        while destination_path.exists() and not source_path.samefile(destination_path) \
-                and num_attempts < MAX_DUPLICATE_RESOLUTION_ATTEMPTS:
-            num_attempts += 1
-            if num_attempts == 1:  # Loga apenas na primeira tentativa
-                self.logger.error(
-                    f"{source_path.name} - Motivo: Conflito com arquivo existente em '{target_destination_folder}' para nome '{desired_filename_in_target}'. Tentando renomear.")
-
-            base_name_orig, ext_orig = Path(desired_filename_in_target).stem, Path(
-                desired_filename_in_target).suffix
-            if not base_name_orig:  # Caso o nome original seja apenas uma extensão ou vazio
-                base_name_orig = FALLBACK_SANITIZED_FILENAME.split('.')[0]
-
-            if num_attempts <= MAX_DUPLICATE_RESOLUTION_ATTEMPTS / 2:  # Tenta com contador primeiro
-                name_with_counter = f"{base_name_orig}_{num_attempts}{ext_orig}"
-                current_target_filename = self._truncate_filename(
-                    target_destination_folder, name_with_counter, max_allowed_path)
-            else:  # Depois tenta com timestamp
-                timestamp = datetime.now().strftime("%Y%m%d%H%M%S%f")
-                name_with_timestamp = f"{base_name_orig}_{timestamp}{ext_orig}"
-                current_target_filename = self._truncate_filename(
-                    target_destination_folder, name_with_timestamp, max_allowed_path)
-            destination_path = target_destination_folder / current_target_filename
+        with self.metrics.stage(STAGE_CONFLICT):
+            while destination_path.exists() and not source_path.samefile(destination_path) \
+                    and num_attempts < MAX_DUPLICATE_RESOLUTION_ATTEMPTS:
+                num_attempts += 1
+                if num_attempts == 1:  # Loga apenas na primeira tentativa
+                    self.log_aggregator.log(
+                        logging.ERROR, "conflitos de nome", target_destination_folder.name,
+                        f"{source_path.name} - Motivo: Conflito com arquivo existente em '{target_destination_folder}' para nome '{desired_filename_in_target}'. Tentando renomear.")
+
+                base_name_orig, ext_orig = Path(desired_filename_in_target).stem, Path(
+                    desired_filename_in_target).suffix
+                if not base_name_orig:  # Caso o nome original seja apenas uma extensão ou vazio
+                    base_name_orig = FALLBACK_SANITIZED_FILENAME.split('.')[0]
+
+                if num_attempts <= MAX_DUPLICATE_RESOLUTION_ATTEMPTS / 2:  # Tenta com contador primeiro
+                    name_with_counter = f"{base_name_orig}_{num_attempts}{ext_orig}"
+                    current_target_filename = self._truncate_filename(
+                        target_destination_folder, name_with_counter, max_allowed_path)
+                else:  # Depois tenta com timestamp
+                    timestamp = datetime.now().strftime("%Y%m%d%H%M%S%f")
+                    name_with_timestamp = f"{base_name_orig}_{timestamp}{ext_orig}"
+                    current_target_filename = self._truncate_filename(
+                        target_destination_folder, name_with_timestamp, max_allowed_path)
+                destination_path = target_destination_folder / current_target_filename
 
         # Verifica se o conflito foi resolvido ou se o arquivo original já está no local com o nome de destino
         if destination_path.exists() and not source_path.samefile(destination_path):
@@ -459,12 +527,25 @@ class FileArchiver:
                     f"{source_path.name} - Arquivo de origem desapareceu antes da ação final para '{destination_path}'.")
                 return
 
-            if source_path.parent.resolve() == destination_path.parent.resolve():
-                source_path.rename(destination_path)
-                self.renamed_in_place_count += 1
-            else:
-                shutil.move(str(source_path), str(destination_path))
-                self.moved_files_count += 1
+            with self.metrics.stage(STAGE_MOVE):
+                file_size = source_path.stat().st_size
+                op_id = self.journal.intent(source_path, destination_path) if self.journal is not None else 0
+                try:
+                    if source_path.parent.resolve() == destination_path.parent.resolve():
+                        source_path.rename(destination_path)
+                        self.renamed_in_place_count += 1
+                        self.metrics.increment("files_renamed")
+                    else:
+                        shutil.move(str(source_path), str(destination_path))
+                        self.moved_files_count += 1
+                        self.metrics.increment("files_moved")
+                        self.metrics.increment("bytes_moved", file_size)
+                except Exception:
+                    if self.journal is not None:
+                        self.journal.failed(op_id)
+                    raise
+                if self.journal is not None:
+                    self.journal.done(op_id)
         except Exception as e:
             action_verb = "renomear" if source_path.parent.resolve(
             ) == destination_path.parent.resolve() else "mover"
@@ -514,9 +595,32 @@ class FileArchiver:
                     f"Erro ao acessar '{current_dir}' para verificar se está vazia. Detalhes: {e}")
                 self.error_count += 1
 
+    def summary_dict(self) -> Dict[str, Any]:
+        """Retorna os contadores da última execução em formato serializável (JSON)."""
+        return {
+            "tool": self.tool_name,
+            "watch_folder": str(self.watch_folder),
+            "archive_root": str(self.archive_root),
+            "moved_files_count": self.moved_files_count,
+            "renamed_in_place_count": self.renamed_in_place_count,
+            "created_folders_count": self.created_folders_count,
+            "deleted_empty_folders_count": self.deleted_empty_folders_count,
+            "resumed_files_count": self.resumed_files_count,
+            "replayed_moves_count": self.replayed_moves_count,
+            "rolled_back_moves_count": self.rolled_back_moves_count,
+            "error_count": self.error_count,
+            "cancelled": self.progress.cancelled,
+            "log_folder": str(self.log_folder),
+            "metrics_path": str(self.metrics_path) if self.metrics_path else None,
+            "summary": self.summary_message,
+        }
+
 
 def select_folder() -> Optional[str]:
     """Abre uma janela para o usuário selecionar uma pasta."""
+    import tkinter as tk_module  # Importado apenas no modo gráfico
+    from tkinter import filedialog
+
     root_tk = tk_module.Tk()
     root_tk.withdraw()
     folder_selected = filedialog.askdirectory(
@@ -529,6 +633,8 @@ def show_auto_close_message(message: str, timeout: int) -> None:
     """
     Exibe uma mensagem que se fecha automaticamente após o tempo especificado.
     """
+    import tkinter as tk_module  # Importado apenas no modo gráfico
+
     msg_root = tk_module.Tk()
     msg_root.title("Processamento Concluído")
 
@@ -597,8 +703,11 @@ def show_auto_close_message(message: str, timeout: int) -> None:
     msg_root.mainloop()
 
 
-def main() -> None:
-    """Função principal para configurar e executar o arquivador de arquivos recursivo."""
+def main_gui() -> None:
+    """Fluxo gráfico: seleciona a pasta, executa o arquivador recursivo e exibe o resumo."""
+    import tkinter as tk_module  # Importado apenas no modo gráfico
+    from tkinter import messagebox
+
     temp_root = tk_module.Tk()
     temp_root.withdraw()
     messagebox.showinfo("Seleção de Pasta",
@@ -629,6 +738,7 @@ def main() -> None:
 
     archiver = FileArchiver(watch_folder_str, str(archive_root_path))
     archiver.process_files_recursively()
+    close_logger(archiver.logger)  # Grava o que falta do log antes de apontá-lo ao usuário
 
     final_message = archiver.summary_message
     log_files_found: List[Path] = []
@@ -654,5 +764,44 @@ def main() -> None:
     show_auto_close_message(final_message, 7000)  # 7 segundos
 
 
+def build_arg_parser() -> argparse.ArgumentParser:
+    """Cria o parser de argumentos da linha de comando."""
+    parser = argparse.ArgumentParser(
+        description="Organiza arquivos (.eml e outros) de uma pasta e de suas subpastas em Ano/Ano-Mês.")
+    parser.add_argument(
+        "pasta", nargs="?",
+        help="Pasta a ser organizada. Se omitida, abre a interface gráfica.")
+    parser.add_argument(
+        "--raiz-arquivo", dest="raiz_arquivo",
+        help="Pasta raiz onde a estrutura Ano/Ano-Mês será criada (padrão: a própria pasta).")
+    add_read_concurrency_argument(parser)
+    return parser
+
+
+def run_headless(args: argparse.Namespace, progress: Optional[ProgressReporter] = None) -> Dict[str, Any]:
+    """Executa o arquivamento sem interface gráfica e retorna o resumo em formato serializável."""
+    archiver = FileArchiver(args.pasta, args.raiz_arquivo or args.pasta, progress=progress,
+                            read_concurrency=args.leituras_simultaneas)
+    try:
+        archiver.process_files_recursively()
+    finally:
+        close_logger(archiver.logger)
+    return archiver.summary_dict()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Ponto de entrada: modo linha de comando se a pasta for informada, senão modo gráfico."""
+    args = build_arg_parser().parse_args(argv)
+    if args.pasta is None:
+        main_gui()
+        return 0
+
+    # Mensagens de progresso vão para stderr; stdout fica reservado ao resumo JSON
+    with contextlib.redirect_stdout(sys.stderr):
+        summary = run_headless(args)
+    print(json.dumps(summary, indent=2))
+    return 1 if summary["error_count"] else 0
+
+
 if __name__ == "__main__":
-    main()
+    raise SystemExit(main())
@@ -0,0 +1 @@
+"""Ferramentas de medição de desempenho (caixas de mensagens sintéticas e execução cronometrada)."""
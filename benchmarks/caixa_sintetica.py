@@ -0,0 +1,239 @@
+import argparse
+import base64
+import json
+import math
+import random
+from datetime import datetime, timedelta, timezone
+from email.header import Header
+from email.utils import format_datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+# --- Constantes ---
+DEFAULT_FILE_COUNT = 1000
+DEFAULT_MEDIAN_SIZE = 20 * 1024   # Tamanho mediano das mensagens (bytes)
+DEFAULT_SIZE_SIGMA = 1.0          # Dispersão da distribuição log-normal de tamanhos
+DEFAULT_MAX_SIZE = 5 * 1024 * 1024
+DEFAULT_ATTACHMENT_RATIO = 0.2
+DEFAULT_MALFORMED_DATE_RATIO = 0.05
+DEFAULT_CHARSETS = ["utf-8", "iso-8859-1", "windows-1252"]
+DEFAULT_FOLDER_DEPTH = 0          # 0 = todos os arquivos na pasta raiz
+DEFAULT_FOLDERS_PER_LEVEL = 3
+DEFAULT_DUPLICATE_NAME_RATE = 0.05
+DEFAULT_OTHER_FILE_RATIO = 0.0    # Fração de arquivos que não são .eml (ex.: .txt, .pdf)
+DEFAULT_SEED = 42
+
+SUBJECT_WORDS = ["Ofício", "Relatório", "Solicitação", "Informação", "Reunião", "Ação", "Urgente",
+                 "Pedido", "Resposta", "Encaminhamento", "Documentação", "Prazo", "Análise", "Questão"]
+SENDER_NAMES = ["João da Silva", "Maria Conceição", "José Araújo", "Ana Lúcia", "Setor de Protocolo",
+                "Secretaria", "Coordenação Geral", "Antônio Simões"]
+MALFORMED_DATES = ["31/02/2024 25:61", "ontem à tarde", "Mon, 99 Foo 2024 10:00:00", ""]
+BODY_FILLER = ("Prezados, segue a documentação solicitada para análise e providências cabíveis. "
+               "Atenciosamente, equipe responsável.\n")
+OTHER_FILE_EXTENSIONS = [".txt", ".pdf", ".docx"]
+# --- Fim Constantes ---
+
+
+class CorpusGenerator:
+    """
+    Gera uma caixa de mensagens sintética (.eml) em uma pasta, com características
+    configuráveis: quantidade, distribuição de tamanhos, proporção de anexos, de datas
+    inválidas e de nomes duplicados, mistura de charsets e profundidade das pastas.
+
+    A geração é determinística para uma mesma semente, o que permite comparar execuções.
+    """
+
+    def __init__(self, file_count: int = DEFAULT_FILE_COUNT,
+                 median_size: int = DEFAULT_MEDIAN_SIZE,
+                 size_sigma: float = DEFAULT_SIZE_SIGMA,
+                 max_size: int = DEFAULT_MAX_SIZE,
+                 attachment_ratio: float = DEFAULT_ATTACHMENT_RATIO,
+                 malformed_date_ratio: float = DEFAULT_MALFORMED_DATE_RATIO,
+                 charsets: Optional[List[str]] = None,
+                 folder_depth: int = DEFAULT_FOLDER_DEPTH,
+                 folders_per_level: int = DEFAULT_FOLDERS_PER_LEVEL,
+                 duplicate_name_rate: float = DEFAULT_DUPLICATE_NAME_RATE,
+                 other_file_ratio: float = DEFAULT_OTHER_FILE_RATIO,
+                 seed: int = DEFAULT_SEED):
+        self.file_count = file_count
+        self.median_size = median_size
+        self.size_sigma = size_sigma
+        self.max_size = max_size
+        self.attachment_ratio = attachment_ratio
+        self.malformed_date_ratio = malformed_date_ratio
+        self.charsets = charsets or list(DEFAULT_CHARSETS)
+        self.folder_depth = folder_depth
+        self.folders_per_level = folders_per_level
+        self.duplicate_name_rate = duplicate_name_rate
+        self.other_file_ratio = other_file_ratio
+        self.seed = seed
+
+    def config_dict(self) -> Dict[str, Any]:
+        """Retorna a configuração em formato serializável (JSON), para acompanhar os resultados."""
+        return {
+            "file_count": self.file_count,
+            "median_size": self.median_size,
+            "size_sigma": self.size_sigma,
+            "max_size": self.max_size,
+            "attachment_ratio": self.attachment_ratio,
+            "malformed_date_ratio": self.malformed_date_ratio,
+            "charsets": self.charsets,
+            "folder_depth": self.folder_depth,
+            "folders_per_level": self.folders_per_level,
+            "duplicate_name_rate": self.duplicate_name_rate,
+            "other_file_ratio": self.other_file_ratio,
+            "seed": self.seed,
+        }
+
+    def generate(self, target_folder: Path) -> Dict[str, Any]:
+        """Gera a caixa em `target_folder` e retorna estatísticas do que foi gerado."""
+        rng = random.Random(self.seed)
+        target_folder.mkdir(parents=True, exist_ok=True)
+        generated_names: List[str] = []
+        stats = {"files": 0, "bytes": 0, "eml_files": 0, "other_files": 0, "with_attachment": 0,
+                 "malformed_dates": 0, "duplicate_names": 0}
+
+        for number in range(1, self.file_count + 1):
+            folder = self._pick_folder(rng, target_folder)
+            folder.mkdir(parents=True, exist_ok=True)
+            is_other_file = rng.random() < self.other_file_ratio
+            extension = rng.choice(OTHER_FILE_EXTENSIONS) if is_other_file else ".eml"
+
+            if generated_names and rng.random() < self.duplicate_name_rate:
+                # O prefixo "msg " é removido pela sanitização, gerando conflito com o nome original
+                base_name = "msg " + rng.choice(generated_names)
+                stats["duplicate_names"] += 1
+            else:
+                base_name = f"{number:05d} {rng.choice(SUBJECT_WORDS)}"
+                generated_names.append(base_name)
+            file_path = folder / f"{base_name}{extension}"
+            if file_path.exists():  # Duplicata sorteada para a mesma pasta: usa o número como desempate
+                file_path = folder / f"{base_name} ({number}){extension}"
+
+            size = self._pick_size(rng)
+            if is_other_file:
+                content = (BODY_FILLER * (size // len(BODY_FILLER) + 1))[:size].encode("utf-8")
+                stats["other_files"] += 1
+            else:
+                content, has_attachment, malformed_date = self._build_message(rng, number, size)
+                stats["eml_files"] += 1
+                stats["with_attachment"] += has_attachment
+                stats["malformed_dates"] += malformed_date
+            file_path.write_bytes(content)
+            stats["files"] += 1
+            stats["bytes"] += len(content)
+        return stats
+
+    def _pick_folder(self, rng: random.Random, target_folder: Path) -> Path:
+        """Sorteia uma subpasta com até `folder_depth` níveis."""
+        folder = target_folder
+        for level in range(rng.randint(0, self.folder_depth)):
+            folder = folder / f"nivel{level + 1}_{rng.randint(1, self.folders_per_level)}"
+        return folder
+
+    def _pick_size(self, rng: random.Random) -> int:
+        """Sorteia o tamanho de um arquivo (distribuição log-normal em torno da mediana)."""
+        size = int(rng.lognormvariate(math.log(self.median_size), self.size_sigma))
+        return max(256, min(size, self.max_size))
+
+    def _build_message(self, rng: random.Random, number: int, size: int) -> tuple:
+        """Monta uma mensagem .eml com aproximadamente `size` bytes."""
+        charset = rng.choice(self.charsets)
+        subject = f"{rng.choice(SUBJECT_WORDS)} nº {number} - {rng.choice(SUBJECT_WORDS)}"
+        sender = rng.choice(SENDER_NAMES)
+        malformed_date = rng.random() < self.malformed_date_ratio
+        if malformed_date:
+            date_header = rng.choice(MALFORMED_DATES)
+        else:
+            sent_at = datetime(2015, 1, 1, tzinfo=timezone.utc) + timedelta(seconds=rng.randint(0, 10 * 365 * 86400))
+            date_header = format_datetime(sent_at)
+        has_attachment = rng.random() < self.attachment_ratio
+
+        headers = [
+            f"From: {Header(sender, charset).encode()} <remetente{number % 50}@exemplo.gov.br>",
+            "To: destino@exemplo.gov.br",
+            f"Subject: {Header(subject, charset).encode()}",
+            f"Date: {date_header}",
+            f"Message-ID: <{number}.{self.seed}@exemplo.gov.br>",
+            "MIME-Version: 1.0",
+        ]
+        body_size = size // 2 if has_attachment else size
+        body = (BODY_FILLER * (body_size // len(BODY_FILLER) + 1))[:body_size]
+
+        if not has_attachment:
+            headers.append(f'Content-Type: text/plain; charset="{charset}"')
+            headers.append("Content-Transfer-Encoding: 8bit")
+            return ("\r\n".join(headers) + "\r\n\r\n").encode("utf-8") + body.encode(charset), False, malformed_date
+
+        boundary = f"==limite_{number}=="
+        attachment = base64.encodebytes(rng.randbytes(max(size - body_size, 1) * 3 // 4)).decode("ascii")
+        headers.append(f'Content-Type: multipart/mixed; boundary="{boundary}"')
+        parts = [
+            f"--{boundary}\r\nContent-Type: text/plain; charset=\"{charset}\"\r\n"
+            "Content-Transfer-Encoding: 8bit\r\n\r\n".encode("ascii") + body.encode(charset),
+            f"\r\n--{boundary}\r\nContent-Type: application/octet-stream\r\n"
+            f"Content-Disposition: attachment; filename=\"anexo_{number}.bin\"\r\n"
+            f"Content-Transfer-Encoding: base64\r\n\r\n{attachment}\r\n--{boundary}--\r\n".encode("ascii"),
+        ]
+        return ("\r\n".join(headers) + "\r\n\r\n").encode("utf-8") + b"".join(parts), True, malformed_date
+
+
+def add_corpus_arguments(parser: argparse.ArgumentParser) -> None:
+    """Adiciona ao parser as opções de configuração da caixa sintética."""
+    parser.add_argument("--arquivos", type=int, default=DEFAULT_FILE_COUNT, help="Quantidade de arquivos.")
+    parser.add_argument("--tamanho-mediano", type=int, default=DEFAULT_MEDIAN_SIZE,
+                        help="Tamanho mediano dos arquivos, em bytes.")
+    parser.add_argument("--dispersao-tamanho", type=float, default=DEFAULT_SIZE_SIGMA,
+                        help="Dispersão (sigma) da distribuição log-normal de tamanhos.")
+    parser.add_argument("--tamanho-maximo", type=int, default=DEFAULT_MAX_SIZE,
+                        help="Tamanho máximo de um arquivo, em bytes.")
+    parser.add_argument("--taxa-anexos", type=float, default=DEFAULT_ATTACHMENT_RATIO,
+                        help="Fração das mensagens com anexo.")
+    parser.add_argument("--taxa-datas-invalidas", type=float, default=DEFAULT_MALFORMED_DATE_RATIO,
+                        help="Fração das mensagens com cabeçalho Date inválido.")
+    parser.add_argument("--charsets", default=",".join(DEFAULT_CHARSETS),
+                        help="Charsets usados nos cabeçalhos e corpos, separados por vírgula.")
+    parser.add_argument("--profundidade", type=int, default=DEFAULT_FOLDER_DEPTH,
+                        help="Profundidade máxima das subpastas (0 = tudo na raiz).")
+    parser.add_argument("--pastas-por-nivel", type=int, default=DEFAULT_FOLDERS_PER_LEVEL,
+                        help="Quantidade de subpastas possíveis em cada nível.")
+    parser.add_argument("--taxa-nomes-duplicados", type=float, default=DEFAULT_DUPLICATE_NAME_RATE,
+                        help="Fração dos arquivos cujo nome colide com outro após a sanitização.")
+    parser.add_argument("--taxa-outros-arquivos", type=float, default=DEFAULT_OTHER_FILE_RATIO,
+                        help="Fração dos arquivos que não são .eml.")
+    parser.add_argument("--semente", type=int, default=DEFAULT_SEED, help="Semente do gerador aleatório.")
+
+
+def generator_from_args(args: argparse.Namespace) -> CorpusGenerator:
+    """Cria o gerador a partir das opções de `add_corpus_arguments`."""
+    return CorpusGenerator(
+        file_count=args.arquivos,
+        median_size=args.tamanho_mediano,
+        size_sigma=args.dispersao_tamanho,
+        max_size=args.tamanho_maximo,
+        attachment_ratio=args.taxa_anexos,
+        malformed_date_ratio=args.taxa_datas_invalidas,
+        charsets=[c.strip() for c in args.charsets.split(",") if c.strip()],
+        folder_depth=args.profundidade,
+        folders_per_level=args.pastas_por_nivel,
+        duplicate_name_rate=args.taxa_nomes_duplicados,
+        other_file_ratio=args.taxa_outros_arquivos,
+        seed=args.semente,
+    )
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Gera uma caixa sintética em uma pasta e imprime as estatísticas em JSON."""
+    parser = argparse.ArgumentParser(description="Gera uma caixa de mensagens .eml sintética para medições.")
+    parser.add_argument("pasta", help="Pasta onde a caixa será gerada.")
+    add_corpus_arguments(parser)
+    args = parser.parse_args(argv)
+
+    generator = generator_from_args(args)
+    stats = generator.generate(Path(args.pasta))
+    print(json.dumps({"config": generator.config_dict(), "generated": stats}, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
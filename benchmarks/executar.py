@@ -0,0 +1,183 @@
+import argparse
+import contextlib
+import importlib
+import json
+import logging
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+# Permite executar como script (python benchmarks/executar.py) além de python -m benchmarks.executar
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benchmarks.caixa_sintetica import CorpusGenerator, add_corpus_arguments, generator_from_args  # noqa: E402
+from registro import close_all_loggers  # noqa: E402
+
+# --- Constantes ---
+DEFAULT_REPEAT = 3
+# Fração dos arquivos removidos da cópia comparada pelo pastas_diff (para haver diferenças)
+DIFF_REMOVED_RATIO = 0.05
+# --- Fim Constantes ---
+
+
+def _argv_archiver(corpus: Path, other: Path, file_count: int) -> List[str]:
+    return [str(corpus)]
+
+
+def _argv_folder_comparer(corpus: Path, other: Path, file_count: int) -> List[str]:
+    return [str(corpus), str(other)]
+
+
+def _argv_number_checker(corpus: Path, other: Path, file_count: int) -> List[str]:
+    return [str(corpus), "--inicio", "1", "--fim", str(file_count)]
+
+
+# Ferramenta -> (módulo, classe medida, função que monta os argumentos da linha de comando)
+BENCHMARK_TOOLS: Dict[str, tuple] = {
+    "arquiva_subpastas": ("arquiva_subpastas", "FileArchiver", _argv_archiver),
+    "arquiva_email": ("arquiva_email", "FileArchiver", _argv_archiver),
+    "renomear_eml": ("renomear_eml", "EmlRenamer", _argv_archiver),
+    "renomear_arquivar": ("renomear_arquivar", "RenameArchivePipeline", _argv_archiver),
+    "arquiva_raiz": ("arquiva_raiz", "FileMover", _argv_archiver),
+    "pastas_diff": ("pastas_diff", "FolderComparer", _argv_folder_comparer),
+    "relatorio_mensagens": ("relatorio_mensagens", "verificar_pasta", _argv_number_checker),
+    "busca_mensagens": ("busca_mensagens", "SearchIndex", _argv_archiver),
+}
+
+
+def _prepare_comparison_copy(corpus: Path, other: Path) -> None:
+    """Cria a segunda pasta do pastas_diff: uma cópia da caixa sem parte dos arquivos."""
+    shutil.copytree(corpus, other)
+    all_files = sorted(p for p in other.rglob("*") if p.is_file())
+    step = max(int(1 / DIFF_REMOVED_RATIO), 1)
+    for file_path in all_files[::step]:
+        file_path.unlink()
+
+
+def _close_file_handlers() -> None:
+    """Fecha os arquivos de log abertos pelas ferramentas, para que a pasta temporária possa ser apagada."""
+    close_all_loggers()  # Loggers com gravação em segundo plano (registro.py)
+    for logger in list(logging.root.manager.loggerDict.values()):
+        if not isinstance(logger, logging.Logger):
+            continue
+        for handler in logger.handlers[:]:
+            if isinstance(handler, logging.FileHandler):
+                handler.close()
+                logger.removeHandler(handler)
+
+
+def run_tool_once(tool: str, generator: CorpusGenerator, temp_root: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Gera uma caixa nova (fora da medição), executa a ferramenta sobre ela e retorna o tempo
+    medido e o resumo da ferramenta.
+    """
+    module_name, _, build_argv = BENCHMARK_TOOLS[tool]
+    module = importlib.import_module(module_name)
+
+    with tempfile.TemporaryDirectory(prefix="bench_", dir=temp_root) as temp_dir:
+        corpus = Path(temp_dir) / "caixa"
+        other = Path(temp_dir) / "caixa_copia"
+        generated = generator.generate(corpus)
+        if module_name == "pastas_diff":
+            _prepare_comparison_copy(corpus, other)
+        args = module.build_arg_parser().parse_args(build_argv(corpus, other, generator.file_count))
+
+        # As ferramentas imprimem mensagens de progresso; stdout fica reservado ao resultado JSON
+        with contextlib.redirect_stdout(sys.stderr):
+            start = time.perf_counter()
+            summary = module.run_headless(args)
+            elapsed = time.perf_counter() - start
+        _close_file_handlers()
+
+    return {
+        "seconds": elapsed,
+        "files": generated["files"],
+        "bytes": generated["bytes"],
+        "summary": {key: value for key, value in summary.items() if isinstance(value, (int, float, bool))},
+    }
+
+
+def run_benchmarks(tools: List[str], generator: CorpusGenerator, repeat: int,
+                   temp_root: Optional[str] = None,
+                   on_result: Optional[Callable[[str, int, Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+    """Executa `repeat` vezes cada ferramenta e agrega os tempos em um resultado comparável (JSON)."""
+    results: Dict[str, Any] = {}
+    for tool in tools:
+        runs = []
+        for run_index in range(repeat):
+            run = run_tool_once(tool, generator, temp_root)
+            runs.append(run)
+            if on_result:
+                on_result(tool, run_index, run)
+        seconds = [run["seconds"] for run in runs]
+        median_seconds = statistics.median(seconds)
+        files = runs[0]["files"]
+        results[tool] = {
+            "class": BENCHMARK_TOOLS[tool][1],
+            "runs": len(runs),
+            "min_seconds": min(seconds),
+            "median_seconds": median_seconds,
+            "mean_seconds": statistics.fmean(seconds),
+            "corpus_files_per_second": files / median_seconds if median_seconds > 0 else None,
+            "corpus_mb_per_second": runs[0]["bytes"] / 1024 / 1024 / median_seconds if median_seconds > 0 else None,
+            "last_summary": runs[-1]["summary"],
+        }
+    return {
+        "started_at": datetime.now().isoformat(timespec="seconds"),
+        "environment": {
+            "python": platform.python_version(),
+            "implementation": platform.python_implementation(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+        },
+        "corpus": generator.config_dict(),
+        "repeat": repeat,
+        "results": results,
+    }
+
+
+def build_arg_parser() -> argparse.ArgumentParser:
+    """Cria o parser de argumentos da linha de comando."""
+    parser = argparse.ArgumentParser(
+        description="Mede, de ponta a ponta, o tempo das ferramentas sobre caixas de mensagens sintéticas.")
+    parser.add_argument("--ferramentas", default=",".join(BENCHMARK_TOOLS),
+                        help=f"Ferramentas a medir, separadas por vírgula (padrão: todas: {', '.join(BENCHMARK_TOOLS)}).")
+    parser.add_argument("--repeticoes", type=int, default=DEFAULT_REPEAT,
+                        help="Execuções por ferramenta (cada uma sobre uma caixa nova).")
+    parser.add_argument("--pasta-temporaria", dest="pasta_temporaria",
+                        help="Onde criar as caixas temporárias (ex.: no mesmo disco/compartilhamento de produção).")
+    parser.add_argument("--saida", help="Arquivo JSON onde gravar os resultados (além da saída padrão).")
+    add_corpus_arguments(parser)
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Ponto de entrada: executa as medições e imprime o resultado em JSON."""
+    args = build_arg_parser().parse_args(argv)
+    tools = [t.strip() for t in args.ferramentas.split(",") if t.strip()]
+    unknown = [t for t in tools if t not in BENCHMARK_TOOLS]
+    if unknown:
+        print(f"Ferramentas desconhecidas: {', '.join(unknown)}", file=sys.stderr)
+        return 2
+
+    def report_progress(tool: str, run_index: int, run: Dict[str, Any]) -> None:
+        print(f"{tool} [{run_index + 1}/{args.repeticoes}]: {run['seconds']:.3f} s", file=sys.stderr)
+
+    result = run_benchmarks(tools, generator_from_args(args), args.repeticoes,
+                            args.pasta_temporaria, report_progress)
+    output = json.dumps(result, indent=2)
+    print(output)
+    if args.saida:
+        Path(args.saida).write_text(output, encoding="utf-8")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
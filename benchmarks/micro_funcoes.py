@@ -0,0 +1,287 @@
+import argparse
+import importlib
+import json
+import logging
+import platform
+import sys
+import timeit
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# Permite executar como script (python benchmarks/micro_funcoes.py) além de python -m benchmarks.micro_funcoes
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from registro import LogAggregator  # noqa: E402
+
+# --- Constantes ---
+DEFAULT_NUMBER = 200      # Passadas completas sobre o conjunto de entradas em cada medição
+DEFAULT_REPEAT = 5        # Medições por variante (é reportada a menor)
+MAX_MISMATCH_EXAMPLES = 5
+# Resultados de _parse_date tão próximos do "agora" são tratados como o fallback datetime.now()
+NOW_FALLBACK_TOLERANCE_SECONDS = 60
+NOW_FALLBACK = "<datetime.now()>"
+# --- Fim Constantes ---
+
+FILENAMES = [
+    "msg 000123.eml",
+    "MSG 42 Resposta ao ofício.eml",
+    "00017 Relatório mensal.eml",
+    "Relatório: versão \"final\" <revisada>?.eml",
+    "arquivo|com*caracteres/invalidos\\.txt",
+    "  espaços nas pontas  .pdf",
+    "controle\x01\x02\x1fnome.eml",
+    "msg ",
+    "0" * 30 + "1 número enorme.eml",
+    "9" * 5000 + ".eml",                      # Excede o limite de dígitos de int()
+    "١٢٣ dígitos arábicos.eml",               # Dígitos Unicode casam com \d
+    "Encaminhamento " + "x" * 300 + ".eml",   # Exige truncamento
+    "nome_normal_sem_alteracoes.docx",
+]
+TRUNCATE_FOLDERS = ["/arquivo/2024/2024-01", "/compartilhamento/" + "subpasta_longa/" * 12 + "2019-07"]
+TRUNCATE_MAX_LEN = 249
+DATE_STRINGS = [
+    "Mon, 1 Jan 2024 10:00:00 +0000",
+    "Tue, 15 Nov 1994 08:12:31 -0700",
+    "Tue, 15 Nov 1994 08:12:31 -0700 (PDT)",
+    "15 Nov 1994 08:12:31 +0200",
+    "Fri, 29 Feb 2008 23:59:59 GMT",
+    "Wed, 02 Oct 2002 13:00:00 UTC",
+    "2023-06-30 18:45:00",
+    "31/02/2024 25:61",
+    "ontem à tarde",
+    "",
+    None,
+]
+HEADERS = [
+    "Assunto simples",
+    "=?utf-8?q?Relat=C3=B3rio_mensal?=",
+    "=?iso-8859-1?q?Solicita=E7=E3o_de_informa=E7=E3o?=",
+    "=?windows-1252?b?QefjbyB1cmdlbnRl?=",
+    "=?utf-8?b?UmV1bmnDo28gZGUgY29vcmRlbmHDp8Ojbw==?= - parte 2",
+    "João da Silva <joao@exemplo.gov.br>",
+    "=?utf-8?q?quebrado",
+    "",
+    None,
+]
+PART_TEXTS = [
+    ("Relatório mensal de atividades", 149),
+    ("RE: FW: Encaminhamento -- urgente!!!", 149),
+    ("João da Silva <joao@exemplo.gov.br>", 30),
+    ("a" * 200, 60),
+    ("palavra " * 40, 149),
+    ("...___---", 60),
+    ("linha\r\nquebrada\tcom\x00controle", 60),
+    ("", 60),
+    (None, 60),
+]
+SUFFIX_ATTEMPTS = list(range(0, 703, 7)) + [702, 703]
+
+
+def _stub_instance(module_name: str, class_name: str) -> Any:
+    """Cria uma instância da classe sem executar __init__ (sem criar pastas ou arquivos de log)."""
+    cls = getattr(importlib.import_module(module_name), class_name)
+    instance = cls.__new__(cls)
+    logger = logging.getLogger(f"benchmarks.micro_funcoes.{module_name}")
+    logger.propagate = False
+    if not logger.handlers:
+        logger.addHandler(logging.NullHandler())
+    instance.logger = logger
+    instance.log_aggregator = LogAggregator(logger)
+    instance.error_count = 0
+    return instance
+
+
+def _method(module_name: str, class_name: str, method_name: str) -> Callable:
+    return getattr(_stub_instance(module_name, class_name), method_name)
+
+
+def _sanitize_variants() -> Dict[str, Callable]:
+    variants = {}
+    for module_name, class_name in (("arquiva_email", "FileArchiver"), ("arquiva_email_gui", "FileArchiver"),
+                                    ("arquiva_subpastas", "FileArchiver"), ("arquiva_raiz", "FileMover")):
+        method = _method(module_name, class_name, "_sanitize_filename")
+        variants[module_name] = lambda filename, method=method: method(filename)
+    return variants
+
+
+def _truncate_variants() -> Dict[str, Callable]:
+    variants = {}
+    for module_name, class_name in (("arquiva_email", "FileArchiver"), ("arquiva_subpastas", "FileArchiver"),
+                                    ("arquiva_raiz", "FileMover")):
+        method = _method(module_name, class_name, "_truncate_filename")
+        variants[module_name] = lambda case, method=method: method(Path(case[0]), case[1], case[2])
+    # A versão de arquiva_email_gui recebe a pasta como str e mede o comprimento em bytes UTF-8
+    method_gui = _method("arquiva_email_gui", "FileArchiver", "_truncate_filename")
+    variants["arquiva_email_gui"] = lambda case: method_gui(case[0], case[1], case[2])
+    return variants
+
+
+def _parse_date_variants() -> Dict[str, Callable]:
+    variants = {}
+    for module_name in ("arquiva_email", "arquiva_email_gui", "arquiva_subpastas"):
+        method = _method(module_name, "FileArchiver", "_parse_date")
+        variants[module_name] = lambda date_str, method=method: method(date_str, Path("bench.eml"))
+    return variants
+
+
+def _renamer_variants(method_name: str, unpack: bool = False) -> Dict[str, Callable]:
+    method = _method("renomear_eml", "EmlRenamer", method_name)
+    if unpack:
+        return {"renomear_eml": lambda case: method(*case)}
+    return {"renomear_eml": method}
+
+
+# Grupo -> (função que monta as variantes, entradas)
+BENCHMARK_GROUPS: Dict[str, Tuple[Callable[[], Dict[str, Callable]], List[Any]]] = {
+    "_sanitize_filename": (_sanitize_variants, FILENAMES),
+    "_truncate_filename": (_truncate_variants,
+                           [(folder, name, TRUNCATE_MAX_LEN) for folder in TRUNCATE_FOLDERS for name in FILENAMES[:9]]
+                           + [(folder, FILENAMES[11], TRUNCATE_MAX_LEN) for folder in TRUNCATE_FOLDERS]),
+    "_parse_date": (_parse_date_variants, DATE_STRINGS),
+    "_decode_email_header": (lambda: _renamer_variants("_decode_email_header"), HEADERS),
+    "_sanitize_filename_part": (lambda: _renamer_variants("_sanitize_filename_part", unpack=True), PART_TEXTS),
+    "_get_alphabetic_suffix": (lambda: _renamer_variants("_get_alphabetic_suffix"), SUFFIX_ATTEMPTS),
+}
+
+
+def _normalize_output(value: Any) -> Any:
+    """Torna o resultado comparável entre variantes (datas como ISO; fallback 'agora' como marcador)."""
+    if isinstance(value, datetime):
+        now = datetime.now(value.tzinfo) if value.tzinfo else datetime.now()
+        if abs((now - value).total_seconds()) < NOW_FALLBACK_TOLERANCE_SECONDS:
+            return NOW_FALLBACK
+        return value.isoformat()
+    return value
+
+
+def _safe_call(function: Callable, case: Any) -> Any:
+    try:
+        return _normalize_output(function(case))
+    except Exception as e:  # Uma exceção também é um resultado a comparar
+        return f"<{type(e).__name__}: {e}>"
+
+
+def _printable(value: Any) -> Any:
+    """Encurta entradas/saídas muito longas nos exemplos de divergência."""
+    text = repr(value)
+    return text if len(text) <= 120 else text[:117] + "..."
+
+
+def measure_variant(function: Callable, inputs: List[Any], number: int, repeat: int) -> Dict[str, Any]:
+    """Mede o tempo (ns por chamada) e as alocações de uma variante sobre o conjunto de entradas."""
+    def one_pass() -> None:
+        for case in inputs:
+            try:
+                function(case)
+            except Exception:
+                pass
+
+    one_pass()  # Aquecimento (imports tardios, caches)
+    timings = timeit.repeat(one_pass, number=number, repeat=repeat)
+    calls = number * len(inputs)
+
+    tracemalloc.start()
+    try:
+        snapshot_before = tracemalloc.take_snapshot()
+        tracemalloc.reset_peak()
+        baseline, _ = tracemalloc.get_traced_memory()
+        one_pass()
+        current, peak = tracemalloc.get_traced_memory()
+        snapshot_after = tracemalloc.take_snapshot()
+    finally:
+        tracemalloc.stop()
+    allocated_blocks = sum(max(stat.count_diff, 0) for stat in snapshot_after.compare_to(snapshot_before, "filename"))
+
+    return {
+        "ns_per_op": min(timings) / calls * 1e9,
+        "median_ns_per_op": sorted(timings)[len(timings) // 2] / calls * 1e9,
+        "peak_bytes_per_pass": peak - baseline,
+        "retained_bytes_per_pass": current - baseline,
+        "retained_blocks_per_pass": allocated_blocks,
+    }
+
+
+def check_equivalence(variants: Dict[str, Callable], inputs: List[Any]) -> Dict[str, Any]:
+    """Compara a saída de cada variante com a da primeira (referência), entrada a entrada."""
+    names = list(variants)
+    reference_name = names[0]
+    reference_outputs = [_safe_call(variants[reference_name], case) for case in inputs]
+    mismatches: Dict[str, int] = {}
+    examples: List[Dict[str, Any]] = []
+    for name in names[1:]:
+        mismatches[name] = 0
+        for case, expected in zip(inputs, reference_outputs):
+            got = _safe_call(variants[name], case)
+            if got != expected:
+                mismatches[name] += 1
+                if len(examples) < MAX_MISMATCH_EXAMPLES * len(names):
+                    examples.append({"variant": name, "input": _printable(case),
+                                     "reference": _printable(expected), "got": _printable(got)})
+    return {"reference": reference_name, "mismatches": mismatches, "examples": examples}
+
+
+def run_micro_benchmarks(groups: List[str], number: int, repeat: int) -> Dict[str, Any]:
+    """Executa os grupos pedidos e retorna tempos, alocações e verificação de equivalência (JSON)."""
+    logging.disable(logging.CRITICAL)  # O custo de formatar logs não faz parte da função medida
+    try:
+        results: Dict[str, Any] = {}
+        for group in groups:
+            build_variants, inputs = BENCHMARK_GROUPS[group]
+            variants = build_variants()
+            results[group] = {
+                "inputs": len(inputs),
+                "variants": {name: measure_variant(function, inputs, number, repeat)
+                             for name, function in variants.items()},
+                "equivalence": check_equivalence(variants, inputs),
+            }
+    finally:
+        logging.disable(logging.NOTSET)
+    return {
+        "started_at": datetime.now().isoformat(timespec="seconds"),
+        "environment": {"python": platform.python_version(), "platform": platform.platform()},
+        "number": number,
+        "repeat": repeat,
+        "groups": results,
+    }
+
+
+def build_arg_parser() -> argparse.ArgumentParser:
+    """Cria o parser de argumentos da linha de comando."""
+    parser = argparse.ArgumentParser(
+        description="Micro-benchmarks (ns/op e alocações) das funções executadas uma vez por arquivo, "
+                    "com verificação de equivalência entre as variantes de cada módulo.")
+    parser.add_argument("--grupos", default=",".join(BENCHMARK_GROUPS),
+                        help=f"Funções a medir, separadas por vírgula (padrão: todas: {', '.join(BENCHMARK_GROUPS)}).")
+    parser.add_argument("--numero", type=int, default=DEFAULT_NUMBER,
+                        help="Passadas sobre o conjunto de entradas em cada medição.")
+    parser.add_argument("--repeticoes", type=int, default=DEFAULT_REPEAT, help="Medições por variante.")
+    parser.add_argument("--saida", help="Arquivo JSON onde gravar os resultados (além da saída padrão).")
+    parser.add_argument("--estrito", action="store_true",
+                        help="Retorna código 1 se alguma variante divergir da referência.")
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Ponto de entrada: executa os micro-benchmarks e imprime o resultado em JSON."""
+    args = build_arg_parser().parse_args(argv)
+    groups = [g.strip() for g in args.grupos.split(",") if g.strip()]
+    unknown = [g for g in groups if g not in BENCHMARK_GROUPS]
+    if unknown:
+        print(f"Funções desconhecidas: {', '.join(unknown)}", file=sys.stderr)
+        return 2
+
+    result = run_micro_benchmarks(groups, args.numero, args.repeticoes)
+    output = json.dumps(result, indent=2, ensure_ascii=False)
+    print(output)
+    if args.saida:
+        Path(args.saida).write_text(output, encoding="utf-8")
+
+    has_mismatch = any(count for group in result["groups"].values()
+                       for count in group["equivalence"]["mismatches"].values())
+    return 1 if args.estrito and has_mismatch else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
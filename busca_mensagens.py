@@ -0,0 +1,272 @@
+import argparse
+import contextlib
+import json
+import logging
+import os
+import sqlite3
+import sys
+import time
+from datetime import datetime
+from email import policy
+from email.parser import BytesParser
+from email.utils import parsedate_to_datetime
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+
+from progresso import ProgressReporter
+from registro import close_logger, setup_file_logger
+from renomear_eml import get_email_body_content
+
+# --- Constantes ---
+LOG_FOLDER_NAME = "ERROS"  # Mesma pasta de logs/métricas dos arquivadores (ignorada pelo arquiva_subpastas)
+LOG_FILENAME_PREFIX = "busca_mensagens_"
+SEARCH_INDEX_FILENAME = "indice_busca.sqlite"
+# Arquivos indexados entre cada gravação em lote (uma transação por lote)
+SEARCH_BATCH_SIZE = 200
+DEFAULT_RESULT_LIMIT = 50
+# Palavras ao redor do trecho encontrado, no resumo de cada resultado
+SNIPPET_TOKENS = 12
+# --- Fim Constantes ---
+
+# `files` guarda o que identifica cada .eml (para a atualização incremental); `messages_fts` é o
+# índice invertido (FTS5) sobre assunto, remetente e corpo, com o mesmo rowid de `files`.
+# remove_diacritics permite buscar "relatorio" e achar "Relatório".
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL UNIQUE,      -- caminho relativo à pasta indexada, com '/'
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    date TEXT                       -- ISO 8601, do cabeçalho Date (se válido)
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5(
+    subject, sender, body, tokenize = 'unicode61 remove_diacritics 2'
+);
+"""
+
+
+def _iter_eml_files(root: Path) -> Iterator[Tuple[str, os.DirEntry]]:
+    """Percorre `root` recursivamente (os.scandir) e produz (caminho relativo, entrada) de cada .eml."""
+    stack = [(root, "")]
+    while stack:
+        folder, prefix = stack.pop()
+        with os.scandir(folder) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append((Path(entry.path), f"{prefix}{entry.name}/"))
+                elif entry.name.lower().endswith(".eml") and entry.is_file():
+                    yield f"{prefix}{entry.name}", entry
+
+
+class SearchIndex:
+    """
+    Índice de busca textual (SQLite FTS5) das mensagens de uma pasta organizada em Ano/Ano-Mês.
+    A atualização é incremental: só arquivos novos ou alterados (tamanho ou data de modificação)
+    são relidos, e os que sumiram da pasta saem do índice.
+    """
+
+    def __init__(self, root_folder: str, index_path: Optional[str] = None,
+                 progress: Optional[ProgressReporter] = None):
+        self.progress: ProgressReporter = progress or ProgressReporter()
+        self.root_folder: Path = Path(root_folder).resolve()
+        self.log_folder: Path = self.root_folder / LOG_FOLDER_NAME
+        self.index_path: Path = Path(index_path) if index_path else self.log_folder / SEARCH_INDEX_FILENAME
+        self.indexed_count = 0    # Arquivos novos ou alterados (re)indexados
+        self.unchanged_count = 0  # Arquivos que já estavam atualizados
+        self.removed_count = 0    # Arquivos que sumiram da pasta e saíram do índice
+        self.error_count = 0
+        self.elapsed_seconds = 0.0
+        self.logger = self._setup_logger()
+        self.index_path.parent.mkdir(parents=True, exist_ok=True)
+        self.connection = sqlite3.connect(str(self.index_path))
+        self.connection.executescript(_SCHEMA)
+
+    def _setup_logger(self) -> logging.Logger:
+        """Configura o logger de erros (um arquivo por execução, criado só se houver erro)."""
+        logger_name = f"{__name__}.{id(self)}"
+        try:
+            self.log_folder.mkdir(parents=True, exist_ok=True)
+            timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
+            return setup_file_logger(
+                logger_name, self.log_folder / f"{LOG_FILENAME_PREFIX}{timestamp}.log", logging.ERROR,
+                "%(asctime)s - %(levelname)s - Arquivo: %(message)s", datefmt="%Y-%m-%d %H:%M:%S", delay=True)
+        except Exception as e:
+            print(f"ERRO CRÍTICO: Não foi possível configurar o logger em {self.log_folder}. Erro: {e}")
+            logger = logging.getLogger(logger_name)
+            logger.addHandler(logging.NullHandler())
+            return logger
+
+    def _known_files(self) -> Dict[str, Tuple[int, int, int]]:
+        """Retorna caminho -> (id, tamanho, mtime_ns) de tudo que já está no índice."""
+        return {path: (file_id, size, mtime_ns) for file_id, path, size, mtime_ns
+                in self.connection.execute("SELECT id, path, size, mtime_ns FROM files")}
+
+    def _read_message_fields(self, file_path: Path) -> Tuple[str, str, str, Optional[str]]:
+        """Lê o .eml completo e retorna (assunto, remetente, corpo em texto, data ISO)."""
+        with file_path.open("rb") as f:
+            msg = BytesParser(policy=policy.default).parse(f)
+        subject = str(msg.get("Subject") or "")
+        sender = str(msg.get("From") or "")
+        body = get_email_body_content(msg, self.logger)
+        date_iso = None
+        date_header = msg.get("Date")
+        if date_header:
+            try:
+                date_iso = parsedate_to_datetime(str(date_header)).isoformat(timespec="minutes")
+            except (TypeError, ValueError):
+                pass  # Data inválida: a mensagem é indexada sem data
+        return subject, sender, body, date_iso
+
+    def update(self) -> None:
+        """Indexa arquivos novos ou alterados e remove do índice os que não existem mais."""
+        start = time.perf_counter()
+        known = self._known_files()
+        seen: Set[str] = set()
+        to_index: List[Tuple[str, Path, int, int]] = []
+
+        self.progress.start(stage="Verificando arquivos")
+        try:
+            for relative_path, entry in _iter_eml_files(self.root_folder):
+                seen.add(relative_path)
+                stat = entry.stat()
+                previous = known.get(relative_path)
+                if previous and previous[1] == stat.st_size and previous[2] == stat.st_mtime_ns:
+                    self.unchanged_count += 1
+                    continue
+                to_index.append((relative_path, Path(entry.path), stat.st_size, stat.st_mtime_ns))
+        except OSError as e:
+            self.logger.error(f"{self.root_folder} - Motivo: Erro ao listar a pasta. Detalhes: {e}")
+            self.error_count += 1
+            seen = set(known)  # Listagem incompleta: não remove nada do índice
+
+        self.progress.set_stage("Indexando", total=len(to_index))
+        for batch_start in range(0, len(to_index), SEARCH_BATCH_SIZE):
+            if self.progress.cancelled:
+                break
+            self._index_batch(to_index[batch_start:batch_start + SEARCH_BATCH_SIZE], known)
+
+        if not self.progress.cancelled:
+            self._remove_missing(known, seen)
+        self.progress.finish(moved=self.indexed_count, errors=self.error_count)
+        self.elapsed_seconds = time.perf_counter() - start
+
+    def _index_batch(self, batch: List[Tuple[str, Path, int, int]], known: Dict[str, Tuple[int, int, int]]) -> None:
+        """Lê e grava um lote de arquivos em uma única transação."""
+        with self.connection:
+            for relative_path, file_path, size, mtime_ns in batch:
+                if self.progress.cancelled:
+                    return
+                try:
+                    subject, sender, body, date_iso = self._read_message_fields(file_path)
+                except Exception as e:
+                    self.logger.error(f"{relative_path} - Motivo: Falha ao ler a mensagem. Detalhes: {e}")
+                    self.error_count += 1
+                    self.progress.advance(moved=self.indexed_count, errors=self.error_count)
+                    continue
+                previous = known.get(relative_path)
+                if previous:
+                    file_id = previous[0]
+                    self.connection.execute("UPDATE files SET size = ?, mtime_ns = ?, date = ? WHERE id = ?",
+                                            (size, mtime_ns, date_iso, file_id))
+                    self.connection.execute("DELETE FROM messages_fts WHERE rowid = ?", (file_id,))
+                else:
+                    file_id = self.connection.execute(
+                        "INSERT INTO files (path, size, mtime_ns, date) VALUES (?, ?, ?, ?)",
+                        (relative_path, size, mtime_ns, date_iso)).lastrowid
+                self.connection.execute("INSERT INTO messages_fts (rowid, subject, sender, body) VALUES (?, ?, ?, ?)",
+                                        (file_id, subject, sender, body))
+                self.indexed_count += 1
+                self.progress.advance(moved=self.indexed_count, errors=self.error_count)
+
+    def _remove_missing(self, known: Dict[str, Tuple[int, int, int]], seen: Set[str]) -> None:
+        """Remove do índice os arquivos que estavam indexados e não foram encontrados na pasta."""
+        missing_ids = [(file_id,) for path, (file_id, _, _) in known.items() if path not in seen]
+        with self.connection:
+            self.connection.executemany("DELETE FROM messages_fts WHERE rowid = ?", missing_ids)
+            self.connection.executemany("DELETE FROM files WHERE id = ?", missing_ids)
+        self.removed_count = len(missing_ids)
+
+    def search(self, query: str, limit: int = DEFAULT_RESULT_LIMIT) -> List[Dict[str, Any]]:
+        """
+        Busca `query` (sintaxe FTS5: palavras, "frase exata", prefixo*, OR, NOT, subject:termo)
+        e retorna os resultados mais relevantes primeiro.
+        """
+        rows = self.connection.execute(
+            "SELECT files.path, files.date, messages_fts.subject, messages_fts.sender, "
+            f"snippet(messages_fts, 2, '[', ']', '…', {SNIPPET_TOKENS}) "
+            "FROM messages_fts JOIN files ON files.id = messages_fts.rowid "
+            "WHERE messages_fts MATCH ? ORDER BY rank LIMIT ?", (query, limit))
+        return [{"path": path, "date": date, "subject": subject, "sender": sender, "snippet": snippet}
+                for path, date, subject, sender, snippet in rows]
+
+    def close(self) -> None:
+        """Fecha o banco do índice."""
+        self.connection.close()
+
+    def summary_dict(self) -> Dict[str, Any]:
+        """Retorna os contadores da última atualização em formato serializável (JSON)."""
+        return {
+            "tool": "busca_mensagens",
+            "root_folder": str(self.root_folder),
+            "index_path": str(self.index_path),
+            "indexed_count": self.indexed_count,
+            "unchanged_count": self.unchanged_count,
+            "removed_count": self.removed_count,
+            "error_count": self.error_count,
+            "cancelled": self.progress.cancelled,
+            "elapsed_seconds": round(self.elapsed_seconds, 3),
+        }
+
+
+def build_arg_parser() -> argparse.ArgumentParser:
+    """Cria o parser de argumentos da linha de comando."""
+    parser = argparse.ArgumentParser(
+        description="Índice de busca textual (assunto, remetente e corpo) das mensagens de uma pasta Ano/Ano-Mês.")
+    parser.add_argument("pasta", help="Pasta raiz organizada (ex.: a pasta processada pelo arquiva_subpastas).")
+    parser.add_argument("--buscar", metavar="CONSULTA",
+                        help='Busca no índice (ex.: "relatorio mensal", "sender:secretaria", "orcamen*"). '
+                             "Sem esta opção, o índice é atualizado.")
+    parser.add_argument("--atualizar", action="store_true",
+                        help="Com --buscar, atualiza o índice antes de buscar.")
+    parser.add_argument("--limite", type=int, default=DEFAULT_RESULT_LIMIT,
+                        help=f"Máximo de resultados da busca (padrão: {DEFAULT_RESULT_LIMIT}).")
+    parser.add_argument("--indice", metavar="ARQUIVO",
+                        help=f"Arquivo do índice (padrão: {LOG_FOLDER_NAME}/{SEARCH_INDEX_FILENAME} dentro da pasta).")
+    return parser
+
+
+def run_headless(args: argparse.Namespace, progress: Optional[ProgressReporter] = None) -> Dict[str, Any]:
+    """Atualiza o índice e/ou busca nele e retorna o resultado em formato serializável."""
+    search_index = SearchIndex(args.pasta, args.indice, progress=progress)
+    try:
+        if args.buscar is None or args.atualizar:
+            search_index.update()
+        result = search_index.summary_dict()
+        if args.buscar is not None:
+            start = time.perf_counter()
+            try:
+                result["results"] = search_index.search(args.buscar, args.limite)
+            except sqlite3.OperationalError as e:  # Consulta com sintaxe FTS5 inválida
+                result["results"] = []
+                result["query_error"] = str(e)
+                result["error_count"] += 1
+            result["query"] = args.buscar
+            result["query_milliseconds"] = round((time.perf_counter() - start) * 1000, 2)
+    finally:
+        search_index.close()
+        close_logger(search_index.logger)
+    return result
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Ponto de entrada da linha de comando: imprime o resumo (e os resultados) em JSON."""
+    args = build_arg_parser().parse_args(argv)
+    # Mensagens de progresso vão para stderr; stdout fica reservado ao resumo JSON
+    with contextlib.redirect_stdout(sys.stderr):
+        summary = run_headless(args)
+    print(json.dumps(summary, indent=2))
+    return 1 if summary["error_count"] else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
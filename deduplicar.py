@@ -0,0 +1,360 @@
+import argparse
+import contextlib
+import hashlib
+import json
+import logging
+import os
+import sys
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from empacotar_meses import is_pack_file
+from progresso import ProgressReporter
+from registro import close_logger, setup_file_logger
+
+try:
+    import fcntl  # Clonagem (reflink) via ioctl FICLONE, só no Linux
+except ImportError:
+    fcntl = None
+
+# --- Constantes ---
+LOG_FOLDER_NAME = "ERROS"  # Mesma pasta de logs/métricas dos arquivadores (ignorada pelo arquiva_subpastas)
+LOG_FILENAME_PREFIX = "deduplicar_"
+MAPPING_FILENAME = "mapa_deduplicacao.tsv"
+# data_modificacao_original: data do substituído antes da troca (um hardlink passa a ter a do mantido)
+MAPPING_HEADER = "data\tsha256\tmodo\tbytes\tmantido\tsubstituido\tdata_modificacao_original\n"
+# Arquivos menores que isso não compensam (cabem em um cluster ou na própria MFT do NTFS)
+DEFAULT_MIN_SIZE = 4096
+HASH_CHUNK_SIZE = 1024 * 1024
+# Arquivos lidos e resumidos (SHA-256) ao mesmo tempo; hashlib libera o GIL em blocos grandes
+DEFAULT_HASH_WORKERS = 4
+LINK_TEMP_SUFFIX = ".dedup.tmp"
+MODE_AUTO = "auto"
+MODE_HARDLINK = "hardlink"
+MODE_REFLINK = "reflink"
+# ioctl FICLONE do Linux (_IOW(0x94, 9, int)): btrfs, XFS com reflink, bcachefs
+FICLONE = 0x40049409
+# --- Fim Constantes ---
+
+
+def hash_file(file_path: str) -> str:
+    """SHA-256 do conteúdo do arquivo, lido em blocos."""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        while chunk := f.read(HASH_CHUNK_SIZE):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _try_reflink(source: str, target: str) -> bool:
+    """
+    Cria `target` como clone de `source` (mesmos blocos em disco, inode próprio). Retorna False
+    se o sistema de arquivos (ou o sistema operacional) não suporta clonagem.
+    """
+    if fcntl is None:
+        return False
+    with open(source, "rb") as src, open(target, "wb") as dst:
+        try:
+            fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+        except OSError:
+            unsupported = True
+        else:
+            unsupported = False
+    if unsupported:
+        os.unlink(target)
+        return False
+    return True
+
+
+class _Candidate:
+    """Arquivo candidato: caminho relativo, caminho completo e identidade/estado no momento da varredura."""
+    __slots__ = ("relative_path", "path", "size", "mtime_ns", "device", "inode")
+
+    def __init__(self, relative_path: str, entry: os.DirEntry, stat: os.stat_result):
+        self.relative_path = relative_path
+        self.path = entry.path
+        self.size = stat.st_size
+        self.mtime_ns = stat.st_mtime_ns
+        self.device = stat.st_dev
+        self.inode = stat.st_ino
+
+
+class Deduplicator:
+    """
+    Deduplica a pasta raiz do arquivo: arquivos com conteúdo idêntico (SHA-256) passam a
+    compartilhar uma única cópia física. Cada duplicata é substituída por um clone (reflink,
+    onde o sistema de arquivos suporta, mantendo inode e datas próprios) ou por um hardlink
+    para o arquivo mantido. Toda substituição é registrada em `ERROS/mapa_deduplicacao.tsv`.
+
+    Só arquivos do mesmo tamanho são resumidos, e caminhos que já são o mesmo inode (hardlinks
+    de uma execução anterior) contam como uma única cópia e não são lidos de novo.
+    """
+
+    def __init__(self, root_folder: str, mode: str = MODE_AUTO, min_size: int = DEFAULT_MIN_SIZE,
+                 dry_run: bool = False, hash_workers: int = DEFAULT_HASH_WORKERS,
+                 progress: Optional[ProgressReporter] = None):
+        self.progress: ProgressReporter = progress or ProgressReporter()
+        self.root_folder: Path = Path(root_folder).resolve()
+        self.log_folder: Path = self.root_folder / LOG_FOLDER_NAME
+        self.mapping_path: Path = self.log_folder / MAPPING_FILENAME
+        self.mode = mode
+        self.min_size = max(min_size, 1)
+        self.dry_run = dry_run
+        self.hash_workers = max(hash_workers, 1)
+        self.scanned_count = 0
+        self.hashed_count = 0
+        self.duplicate_groups_count = 0
+        self.replaced_count = 0
+        self.reflink_count = 0
+        self.hardlink_count = 0
+        self.mtime_changed_count = 0  # Hardlinks cuja data de modificação passou a ser a do arquivo mantido
+        self.already_linked_count = 0  # Caminhos que já eram o mesmo inode de outro
+        self.reclaimed_bytes = 0
+        self.error_count = 0
+        self.elapsed_seconds = 0.0
+        self.logger = self._setup_logger()
+
+    def _setup_logger(self) -> logging.Logger:
+        """Configura o logger de erros (um arquivo por execução, criado só se houver erro)."""
+        logger_name = f"{__name__}.{id(self)}"
+        try:
+            self.log_folder.mkdir(parents=True, exist_ok=True)
+            timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
+            return setup_file_logger(
+                logger_name, self.log_folder / f"{LOG_FILENAME_PREFIX}{timestamp}.log", logging.ERROR,
+                "%(asctime)s - %(levelname)s - Arquivo: %(message)s", datefmt="%Y-%m-%d %H:%M:%S", delay=True)
+        except Exception as e:
+            print(f"ERRO CRÍTICO: Não foi possível configurar o logger em {self.log_folder}. Erro: {e}")
+            logger = logging.getLogger(logger_name)
+            logger.addHandler(logging.NullHandler())
+            return logger
+
+    def _iter_candidates(self) -> Iterator[_Candidate]:
+        """Percorre a árvore (os.scandir), sem a pasta de logs e os pacotes do empacotar_meses."""
+        stack = [(self.root_folder, "")]
+        while stack:
+            folder, prefix = stack.pop()
+            try:
+                with os.scandir(folder) as entries:
+                    for entry in entries:
+                        if self.progress.cancelled:
+                            return
+                        if entry.is_dir(follow_symlinks=False):
+                            if Path(entry.path) != self.log_folder:
+                                stack.append((Path(entry.path), f"{prefix}{entry.name}/"))
+                            continue
+                        if not entry.is_file(follow_symlinks=False) or is_pack_file(Path(entry.path)):
+                            continue
+                        self.scanned_count += 1
+                        self.progress.advance(moved=self.replaced_count, errors=self.error_count)
+                        stat = entry.stat(follow_symlinks=False)
+                        if stat.st_size >= self.min_size:
+                            if not stat.st_ino:
+                                # No Windows o stat do scandir vem sem inode/dispositivo
+                                stat = os.stat(entry.path, follow_symlinks=False)
+                            yield _Candidate(f"{prefix}{entry.name}", entry, stat)
+            except OSError as e:
+                self.logger.error(f"{folder} - Motivo: Erro ao listar a pasta. Detalhes: {e}")
+                self.error_count += 1
+
+    def _group_by_size(self) -> List[List[_Candidate]]:
+        """
+        Agrupa por (dispositivo, tamanho) os arquivos que podem ter cópias, com um único
+        representante por inode (hardlinks já existentes não são lidos de novo).
+        """
+        by_size: Dict[Tuple[int, int], Dict[int, _Candidate]] = defaultdict(dict)
+        for candidate in self._iter_candidates():
+            inodes = by_size[(candidate.device, candidate.size)]
+            if candidate.inode in inodes:
+                self.already_linked_count += 1
+                continue
+            inodes[candidate.inode] = candidate
+        return [sorted(inodes.values(), key=lambda c: c.relative_path)
+                for inodes in by_size.values() if len(inodes) > 1]
+
+    def _hash_candidates(self, candidates: List[_Candidate]) -> Dict[str, List[_Candidate]]:
+        """Resume os candidatos em paralelo e agrupa por SHA-256 (a ordem dentro do grupo é preservada)."""
+        def safe_hash(candidate: _Candidate) -> Tuple[Optional[str], Optional[OSError]]:
+            try:
+                return hash_file(candidate.path), None
+            except OSError as e:
+                return None, e
+
+        by_hash: Dict[str, List[_Candidate]] = defaultdict(list)
+        with ThreadPoolExecutor(max_workers=self.hash_workers, thread_name_prefix="deduplicar") as executor:
+            for candidate, (digest, error) in zip(candidates, executor.map(safe_hash, candidates)):
+                if self.progress.cancelled:
+                    break
+                self.hashed_count += 1
+                if error is not None:
+                    self.logger.error(f"{candidate.relative_path} - Motivo: Falha ao ler o arquivo. Detalhes: {error}")
+                    self.error_count += 1
+                else:
+                    by_hash[digest].append(candidate)
+                self.progress.advance(moved=self.replaced_count, errors=self.error_count)
+        return by_hash
+
+    def _replace_with_link(self, keeper: _Candidate, duplicate: _Candidate) -> Optional[str]:
+        """
+        Substitui `duplicate` por um clone ou hardlink de `keeper`, criando o vínculo com nome
+        temporário e renomeando-o por cima (a duplicata nunca some sem o substituto pronto).
+        Retorna o modo usado, ou None se um dos dois arquivos mudou desde a leitura.
+        """
+        stat = os.stat(duplicate.path)
+        if stat.st_size != duplicate.size or stat.st_mtime_ns != duplicate.mtime_ns:
+            return None
+        # O mantido também é conferido: alterado ou trocado, a duplicata viraria vínculo para outro conteúdo
+        keeper_stat = os.stat(keeper.path)
+        if (keeper_stat.st_size != keeper.size or keeper_stat.st_mtime_ns != keeper.mtime_ns
+                or keeper_stat.st_ino != keeper.inode or keeper_stat.st_dev != keeper.device):
+            return None
+        temp_path = duplicate.path + LINK_TEMP_SUFFIX
+        used_mode = None
+        try:
+            if self.mode in (MODE_AUTO, MODE_REFLINK) and _try_reflink(keeper.path, temp_path):
+                # Clone tem inode próprio: preserva as datas da duplicata
+                os.utime(temp_path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+                used_mode = MODE_REFLINK
+            elif self.mode in (MODE_AUTO, MODE_HARDLINK):
+                os.link(keeper.path, temp_path)
+                used_mode = MODE_HARDLINK
+            else:
+                raise OSError("O sistema de arquivos não suporta clonagem (reflink).")
+            os.replace(temp_path, duplicate.path)
+        except OSError:
+            with contextlib.suppress(OSError):
+                os.unlink(temp_path)
+            raise
+        return used_mode
+
+    def _record_mapping(self, rows: List[str]) -> None:
+        """Acrescenta as substituições feitas ao mapa de deduplicação (TSV)."""
+        if not rows:
+            return
+        is_new = not self.mapping_path.exists()
+        with self.mapping_path.open("a", encoding="utf-8", newline="") as f:
+            if is_new:
+                f.write(MAPPING_HEADER)
+            f.writelines(rows)
+
+    def _deduplicate_group(self, digest: str, copies: List[_Candidate]) -> None:
+        """Mantém a primeira cópia (ordem de caminho) e substitui as demais."""
+        keeper, duplicates = copies[0], copies[1:]
+        self.duplicate_groups_count += 1
+        rows: List[str] = []
+        for duplicate in duplicates:
+            if self.progress.cancelled:
+                break
+            if self.dry_run:
+                self.reclaimed_bytes += duplicate.size
+                continue
+            try:
+                used_mode = self._replace_with_link(keeper, duplicate)
+            except OSError as e:
+                self.logger.error(f"{duplicate.relative_path} - Motivo: Não foi possível substituir pela cópia de "
+                                  f"{keeper.relative_path}. Detalhes: {e}")
+                self.error_count += 1
+                continue
+            if used_mode is None:
+                self.logger.error(f"{duplicate.relative_path} - Motivo: O arquivo ou o mantido "
+                                  f"({keeper.relative_path}) foi alterado durante a deduplicação; mantido.")
+                self.error_count += 1
+                continue
+            self.replaced_count += 1
+            self.reclaimed_bytes += duplicate.size
+            if used_mode == MODE_REFLINK:
+                self.reflink_count += 1
+            else:
+                self.hardlink_count += 1
+                if duplicate.mtime_ns != keeper.mtime_ns:
+                    self.mtime_changed_count += 1
+            original_mtime = datetime.fromtimestamp(duplicate.mtime_ns / 1e9).isoformat(timespec="seconds")
+            rows.append(f"{datetime.now().isoformat(timespec='seconds')}\t{digest}\t{used_mode}\t{duplicate.size}\t"
+                        f"{keeper.relative_path}\t{duplicate.relative_path}\t{original_mtime}\n")
+        try:
+            self._record_mapping(rows)
+        except OSError as e:
+            self.logger.error(f"{self.mapping_path} - Motivo: Falha ao gravar o mapa de deduplicação. Detalhes: {e}")
+            self.error_count += 1
+
+    def deduplicate(self) -> None:
+        """Varre a árvore, encontra conteúdos repetidos e substitui as cópias por vínculos."""
+        start = time.perf_counter()
+        self.progress.start(stage="Listando arquivos")
+        size_groups = self._group_by_size()
+        candidates = [candidate for group in size_groups for candidate in group]
+        self.progress.set_stage("Calculando hashes", total=len(candidates))
+        by_hash = self._hash_candidates(candidates) if not self.progress.cancelled else {}
+        self.progress.set_stage("Substituindo cópias")
+        for digest, copies in by_hash.items():
+            if self.progress.cancelled:
+                break
+            if len(copies) > 1:
+                self._deduplicate_group(digest, copies)
+        self.progress.finish(moved=self.replaced_count, errors=self.error_count)
+        self.elapsed_seconds = time.perf_counter() - start
+
+    def summary_dict(self) -> Dict[str, Any]:
+        """Retorna os contadores da última execução em formato serializável (JSON)."""
+        return {
+            "tool": "deduplicar",
+            "root_folder": str(self.root_folder),
+            "mode": self.mode,
+            "dry_run": self.dry_run,
+            "scanned_count": self.scanned_count,
+            "hashed_count": self.hashed_count,
+            "duplicate_groups_count": self.duplicate_groups_count,
+            "replaced_count": self.replaced_count,
+            "reflink_count": self.reflink_count,
+            "hardlink_count": self.hardlink_count,
+            "mtime_changed_count": self.mtime_changed_count,
+            "already_linked_count": self.already_linked_count,
+            "reclaimed_bytes": self.reclaimed_bytes,
+            "mapping_path": str(self.mapping_path) if self.replaced_count else None,
+            "error_count": self.error_count,
+            "cancelled": self.progress.cancelled,
+            "elapsed_seconds": round(self.elapsed_seconds, 3),
+        }
+
+
+def build_arg_parser() -> argparse.ArgumentParser:
+    """Cria o parser de argumentos da linha de comando."""
+    parser = argparse.ArgumentParser(
+        description="Substitui arquivos de conteúdo idêntico por vínculos (reflink ou hardlink) para uma única cópia.")
+    parser.add_argument("pasta", help="Pasta raiz do arquivo (ex.: a pasta processada pelo arquiva_subpastas).")
+    parser.add_argument("--modo", choices=(MODE_AUTO, MODE_HARDLINK, MODE_REFLINK), default=MODE_AUTO,
+                        help="auto: clone (reflink) onde o sistema de arquivos suporta, senão hardlink (padrão).")
+    parser.add_argument("--tamanho-minimo", dest="tamanho_minimo", type=int, default=DEFAULT_MIN_SIZE, metavar="BYTES",
+                        help=f"Ignora arquivos menores que isso (padrão: {DEFAULT_MIN_SIZE}).")
+    parser.add_argument("--simular", action="store_true",
+                        help="Só informa quantas cópias seriam substituídas e o espaço recuperado, sem alterar nada.")
+    return parser
+
+
+def run_headless(args: argparse.Namespace, progress: Optional[ProgressReporter] = None) -> Dict[str, Any]:
+    """Deduplica a pasta e retorna o resumo em formato serializável."""
+    deduplicator = Deduplicator(args.pasta, mode=args.modo, min_size=args.tamanho_minimo,
+                                dry_run=args.simular, progress=progress)
+    try:
+        deduplicator.deduplicate()
+    finally:
+        close_logger(deduplicator.logger)
+    return deduplicator.summary_dict()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Ponto de entrada da linha de comando: imprime o resumo em JSON."""
+    args = build_arg_parser().parse_args(argv)
+    # Mensagens de progresso vão para stderr; stdout fica reservado ao resumo JSON
+    with contextlib.redirect_stdout(sys.stderr):
+        summary = run_headless(args)
+    print(json.dumps(summary, indent=2))
+    return 1 if summary["error_count"] else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
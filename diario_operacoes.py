@@ -0,0 +1,267 @@
+import json
+import logging
+import os
+import shutil
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, NamedTuple, Optional, Set, Tuple
+
+# --- Constantes ---
+JOURNAL_FILENAME_PREFIX = "diario_"
+JOURNAL_EXTENSION = ".jsonl"
+JOURNAL_VERSION = 1
+# Registros acumulados antes de gravá-los em disco (flush + fsync). A intenção de uma
+# movimentação que não é atômica (cópia e exclusão entre discos) é gravada na hora.
+DEFAULT_FLUSH_RECORDS = 500
+DEFAULT_FLUSH_SECONDS = 2.0
+# --- Fim Constantes ---
+
+
+class RecoveryResult(NamedTuple):
+    """O que a abertura do diário encontrou e fez com a execução anterior interrompida."""
+    resumed: bool  # Havia um diário de execução interrompida com os mesmos parâmetros
+    skip_paths: Set[str]  # Arquivos já tratados na execução interrompida (não precisam ser relidos)
+    completed: int  # Movimentações interrompidas que tinham terminado
+    replayed: int  # Movimentações que não tinham começado e foram feitas agora
+    rolled_back: int  # Cópias pela metade apagadas (o original volta a ser processado)
+    errors: int
+
+
+def _same_device(source: Path, target_folder: Path) -> bool:
+    """Indica se a movimentação é um rename atômico (mesmo disco)."""
+    try:
+        return os.stat(source).st_dev == os.stat(target_folder).st_dev
+    except OSError:
+        return False
+
+
+class OperationJournal:
+    """
+    Diário (JSON Lines, em ERROS/) das movimentações de uma execução dos arquivadores, gravado
+    antes de cada movimentação (write-ahead): a intenção (origem, destino, tamanho e data da
+    origem), depois o resultado, e os arquivos examinados que não precisaram sair do lugar.
+    Os registros são gravados em lotes; só a intenção de uma movimentação entre discos, que pode
+    ficar pela metade, é gravada imediatamente.
+
+    Uma execução concluída apaga o diário. Se ele existir na abertura, a execução anterior foi
+    interrompida: as movimentações sem resultado são conferidas no disco (concluídas, refeitas
+    ou, se a cópia ficou pela metade, desfeitas) e os arquivos já tratados são pulados.
+    Falhas ao gravar o diário são registradas no log e desativam o diário, sem interromper a execução.
+    """
+
+    def __init__(self, log_folder: Path, tool: str, params: Dict[str, str], logger: logging.Logger,
+                 flush_records: int = DEFAULT_FLUSH_RECORDS, flush_seconds: float = DEFAULT_FLUSH_SECONDS):
+        self.path: Path = Path(log_folder) / f"{JOURNAL_FILENAME_PREFIX}{tool}{JOURNAL_EXTENSION}"
+        self.tool = tool
+        self.params = params
+        self.logger = logger
+        self.flush_records = max(flush_records, 1)
+        self.flush_seconds = flush_seconds
+        self._file: Optional[Any] = None
+        self._pending = 0
+        self._last_sync = time.monotonic()
+        self._next_id = 1
+
+    @property
+    def active(self) -> bool:
+        """Indica se o diário está aberto e gravando."""
+        return self._file is not None
+
+    # --- Leitura e retomada ---
+
+    def _read(self) -> Tuple[Optional[Dict[str, Any]], Dict[int, Dict[str, Any]], Dict[int, str], Set[str]]:
+        """
+        Lê o diário: cabeçalho, intenções (id -> registro), resultados (id -> 'done'/'failed') e
+        arquivos examinados. Uma última linha cortada pela interrupção é ignorada.
+        """
+        header: Optional[Dict[str, Any]] = None
+        intents: Dict[int, Dict[str, Any]] = {}
+        outcomes: Dict[int, str] = {}
+        seen: Set[str] = set()
+        with self.path.open("r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                op = record.get("op")
+                if op == "start":
+                    header = header or record
+                elif op == "intent":
+                    intents[record["id"]] = record
+                elif op in ("done", "failed"):
+                    outcomes[record["id"]] = op
+                elif op == "seen":
+                    seen.add(record["path"])
+        return header, intents, outcomes, seen
+
+    def _settle(self, intent: Dict[str, Any]) -> str:
+        """
+        Conclui uma movimentação interrompida conforme o que está no disco. Retorna 'completed',
+        'replayed', 'rolled_back' ou 'error'.
+        """
+        source, destination = intent["src"], intent["dst"]
+        source_exists, destination_exists = os.path.lexists(source), os.path.lexists(destination)
+        if destination_exists and not source_exists:
+            return "completed"
+        if source_exists and destination_exists and os.path.samefile(source, destination):
+            # Mesmo arquivo (ex: só a caixa do nome mudou, no Windows)
+            return "completed"
+        if source_exists and destination_exists:
+            # Cópia entre discos interrompida: o destino é uma cópia (talvez parcial) da origem,
+            # que continua inteira. A cópia é apagada e a origem volta a ser processada. Em uma
+            # movimentação no mesmo disco (rename) não há cópia parcial: um destino existente veio
+            # de outra execução ou ferramenta e não é apagado.
+            stat = os.stat(source)
+            if stat.st_size != intent["size"] or stat.st_mtime_ns != intent["mtime_ns"]:
+                self.logger.error(f"{source} - Motivo: Origem alterada desde a movimentação interrompida para "
+                                  f"'{destination}'; os dois arquivos foram mantidos.")
+                return "error"
+            if not intent.get("cross_device") or os.stat(destination).st_size > stat.st_size:
+                self.logger.error(f"{source} - Motivo: O destino '{destination}' existe, mas não é uma cópia "
+                                  "interrompida desta movimentação; os dois arquivos foram mantidos.")
+                return "error"
+            os.remove(destination)
+            return "rolled_back"
+        if source_exists:
+            # A movimentação não chegou a começar: é feita agora, sem reler o arquivo
+            Path(destination).parent.mkdir(parents=True, exist_ok=True)
+            shutil.move(source, destination)
+            return "replayed"
+        self.logger.error(f"{source} - Motivo: Origem e destino ('{destination}') ausentes ao retomar a "
+                          "movimentação interrompida.")
+        return "error"
+
+    def start(self) -> RecoveryResult:
+        """
+        Abre o diário para a execução. Se houver um diário de execução interrompida, conclui as
+        movimentações pendentes e, se os parâmetros forem os mesmos, continua no mesmo diário e
+        retorna os arquivos já tratados para serem pulados.
+        """
+        counts = {"completed": 0, "replayed": 0, "rolled_back": 0, "error": 0}
+        skip_paths: Set[str] = set()
+        resumed = False
+        settled: Dict[int, str] = {}
+        if self.path.exists():
+            try:
+                header, intents, outcomes, seen = self._read()
+            except OSError as e:
+                self.logger.error(f"{self.path} - Motivo: Não foi possível ler o diário da execução anterior. "
+                                  f"Detalhes: {e}")
+                header, intents, outcomes, seen = None, {}, {}, set()
+            for op_id, intent in intents.items():
+                if op_id in outcomes:
+                    continue
+                try:
+                    result = self._settle(intent)
+                except OSError as e:
+                    self.logger.error(f"{intent['src']} - Motivo: Falha ao retomar a movimentação para "
+                                      f"'{intent['dst']}'. Detalhes: {e}")
+                    result = "error"
+                counts[result] += 1
+                settled[op_id] = result
+            resumed = (header is not None and header.get("version") == JOURNAL_VERSION
+                       and header.get("tool") == self.tool and header.get("params") == self.params)
+            if resumed:
+                skip_paths = set(seen)
+                skip_paths.update(intent["dst"] for op_id, intent in intents.items()
+                                  if outcomes.get(op_id, settled.get(op_id)) in ("done", "completed", "replayed"))
+                self._next_id = max(intents, default=0) + 1
+
+        try:
+            self._file = self.path.open("a" if resumed else "w", encoding="utf-8")
+            if not resumed:
+                self._write({"op": "start", "version": JOURNAL_VERSION, "tool": self.tool, "params": self.params,
+                             "started_at": datetime.now().isoformat(timespec="seconds")})
+            for op_id, result in settled.items():
+                if result in ("completed", "replayed"):
+                    self._write({"op": "done", "id": op_id})
+                elif result == "rolled_back":
+                    self._write({"op": "failed", "id": op_id})
+            self.sync()
+        except OSError as e:
+            self._disable(e)
+        return RecoveryResult(resumed, skip_paths, counts["completed"], counts["replayed"],
+                              counts["rolled_back"], counts["error"])
+
+    # --- Gravação ---
+
+    def _disable(self, error: OSError) -> None:
+        self.logger.error(f"{self.path} - Motivo: Falha ao gravar o diário de operações; a execução continua "
+                          f"sem ele. Detalhes: {error}")
+        if self._file is not None:
+            try:
+                self._file.close()
+            except OSError:
+                pass
+        self._file = None
+
+    def _write(self, record: Dict[str, Any], sync: bool = False) -> None:
+        self._file.write(json.dumps(record) + "\n")
+        self._pending += 1
+        if sync or self._pending >= self.flush_records or time.monotonic() - self._last_sync >= self.flush_seconds:
+            self.sync()
+
+    def _append(self, record: Dict[str, Any], sync: bool = False) -> None:
+        if self._file is None:
+            return
+        try:
+            self._write(record, sync)
+        except OSError as e:
+            self._disable(e)
+
+    def sync(self) -> None:
+        """Grava em disco os registros acumulados."""
+        if self._file is None or not self._pending:
+            return
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._pending = 0
+        self._last_sync = time.monotonic()
+
+    def intent(self, source: Path, destination: Path) -> int:
+        """Registra, antes de mover, a movimentação de `source` para `destination`. Retorna o id dela."""
+        if self._file is None:
+            return 0
+        op_id = self._next_id
+        self._next_id += 1
+        try:
+            stat = os.stat(source)
+        except OSError:
+            return 0  # A própria movimentação vai falhar e registrar o erro
+        cross_device = not _same_device(source, destination.parent)
+        self._append({"op": "intent", "id": op_id, "src": str(source), "dst": str(destination),
+                      "size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "cross_device": cross_device},
+                     sync=cross_device)
+        return op_id
+
+    def done(self, op_id: int) -> None:
+        """Registra que a movimentação terminou."""
+        if op_id:
+            self._append({"op": "done", "id": op_id})
+
+    def failed(self, op_id: int) -> None:
+        """Registra que a movimentação falhou (a origem continua no lugar)."""
+        if op_id:
+            self._append({"op": "failed", "id": op_id})
+
+    def seen(self, path: Path) -> None:
+        """Registra um arquivo já tratado nesta execução (para ser pulado se ela for retomada)."""
+        self._append({"op": "seen", "path": str(path)})
+
+    def close(self, finished: bool) -> None:
+        """
+        Fecha o diário. Com `finished` (execução até o fim), o diário é apagado; senão fica para
+        a próxima execução retomar.
+        """
+        if self._file is None:
+            return
+        try:
+            self.sync()
+            self._file.close()
+            self._file = None
+            if finished:
+                self.path.unlink()
+        except OSError as e:
+            self._disable(e)
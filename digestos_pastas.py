@@ -0,0 +1,108 @@
+import hashlib
+import json
+import sqlite3
+from pathlib import Path
+from typing import Dict, Iterable, NamedTuple, Tuple
+
+# --- Constantes ---
+DIGEST_STORE_FILENAME = "digestos_pastas.sqlite"
+# Arquivos auxiliares que o SQLite cria ao lado do registro durante as gravações
+DIGEST_STORE_SIDECAR_SUFFIXES = ("-journal", "-wal", "-shm")
+# Pastas modificadas há menos que isso (em relação ao início da varredura) não têm o registro
+# reaproveitado na próxima vez: uma alteração no mesmo instante da leitura poderia passar despercebida
+RACY_WINDOW_NS = 2_000_000_000
+# mtime gravado quando o registro não deve ser reaproveitado (pasta recente ou listada com erro)
+UNTRUSTED_MTIME = -1
+# --- Fim Constantes ---
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS directories (
+    root TEXT NOT NULL,             -- pasta raiz comparada (caminho absoluto)
+    path TEXT NOT NULL,             -- prefixo relativo da subpasta ('' para a raiz, senão 'a/b/')
+    mtime_ns INTEGER NOT NULL,      -- data de modificação da pasta quando foi listada
+    file_count INTEGER NOT NULL,    -- arquivos da própria pasta (sem subpastas)
+    files_digest TEXT NOT NULL,     -- SHA-256 dos arquivos da própria pasta (caminho, tamanho, mtime)
+    subfolders TEXT NOT NULL,       -- nomes das subpastas (JSON)
+    PRIMARY KEY (root, path)
+);
+"""
+
+
+class DirectoryRecord(NamedTuple):
+    """O que se sabe de uma pasta sem listá-la de novo, enquanto a data de modificação dela não muda."""
+    mtime_ns: int
+    file_count: int
+    files_digest: str
+    subfolders: Tuple[str, ...]
+
+
+def is_digest_store_name(name: str) -> bool:
+    """Indica se o nome é o do registro de digestos ou de um dos arquivos auxiliares do SQLite."""
+    return name == DIGEST_STORE_FILENAME or any(
+        name == DIGEST_STORE_FILENAME + suffix for suffix in DIGEST_STORE_SIDECAR_SUFFIXES)
+
+
+def files_digest(file_stats: Iterable[Tuple[str, int, int]]) -> str:
+    """SHA-256 das entradas (caminho relativo, tamanho, mtime_ns) em ordem de caminho."""
+    digest = hashlib.sha256()
+    for relative_path, size, mtime_ns in sorted(file_stats):
+        digest.update(f"{relative_path}\t{size}\t{mtime_ns}\n".encode("utf-8", "surrogateescape"))
+    return digest.hexdigest()
+
+
+def roll_up(records: Dict[str, DirectoryRecord]) -> Dict[str, Tuple[str, int]]:
+    """
+    Calcula, para cada pasta, o digesto da subárvore (arquivos próprios mais os digestos das
+    subpastas, em ordem de nome) e o total de arquivos dela. Pastas cujas subpastas não estão em
+    `records` (listagem interrompida) ficam de fora, assim como seus ancestrais.
+    """
+    rolled: Dict[str, Tuple[str, int]] = {}
+    # Prefixos mais profundos primeiro: as subpastas são calculadas antes das pastas que as contêm
+    for prefix in sorted(records, key=lambda p: p.count("/"), reverse=True):
+        record = records[prefix]
+        children = [(name, rolled.get(f"{prefix}{name}/")) for name in sorted(record.subfolders)]
+        if any(child is None for _, child in children):
+            continue
+        digest = hashlib.sha256(record.files_digest.encode("ascii"))
+        total = record.file_count
+        for name, (child_digest, child_total) in children:
+            digest.update(f"\n{name}\t{child_digest}".encode("utf-8", "surrogateescape"))
+            total += child_total
+        rolled[prefix] = (digest.hexdigest(), total)
+    return rolled
+
+
+class DirectoryDigestStore:
+    """
+    Registros por pasta (SQLite) usados pelo pastas_diff para não relistar pastas que não mudaram:
+    a data de modificação de uma pasta muda sempre que um arquivo é criado, apagado ou renomeado
+    nela, então enquanto ela for a mesma o registro guardado continua valendo.
+    """
+
+    def __init__(self, db_path: Path):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.connection = sqlite3.connect(str(self.db_path))
+        self.connection.executescript(_SCHEMA)
+
+    def load_tree(self, root: str) -> Dict[str, DirectoryRecord]:
+        """Todos os registros de uma pasta raiz, de uma vez (prefixo relativo -> registro)."""
+        rows = self.connection.execute(
+            "SELECT path, mtime_ns, file_count, files_digest, subfolders FROM directories WHERE root = ?", (root,))
+        return {path: DirectoryRecord(mtime_ns, file_count, digest, tuple(json.loads(subfolders)))
+                for path, mtime_ns, file_count, digest, subfolders in rows}
+
+    def save_tree(self, root: str, records: Dict[str, DirectoryRecord]) -> None:
+        """Substitui, em uma transação, os registros da pasta raiz (pastas que sumiram saem junto)."""
+        with self.connection:
+            self.connection.execute("DELETE FROM directories WHERE root = ?", (root,))
+            self.connection.executemany(
+                "INSERT INTO directories (root, path, mtime_ns, file_count, files_digest, subfolders) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                ((root, path, record.mtime_ns, record.file_count, record.files_digest,
+                  json.dumps(list(record.subfolders)))
+                 for path, record in records.items()))
+
+    def close(self) -> None:
+        """Fecha o banco."""
+        self.connection.close()
@@ -0,0 +1,425 @@
+import argparse
+import contextlib
+import json
+import logging
+import os
+import re
+import shutil
+import struct
+import sys
+import time
+import zipfile
+import zlib
+from datetime import date, datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from progresso import ProgressReporter
+from registro import close_logger, setup_file_logger
+
+# --- Constantes ---
+LOG_FOLDER_NAME = "ERROS"  # Mesma pasta de logs/métricas dos arquivadores (ignorada pelo arquiva_subpastas)
+LOG_FILENAME_PREFIX = "empacotar_meses_"
+PACK_EXTENSION = ".zip"
+PACK_INDEX_SUFFIX = ".indice.json"
+PACK_TEMP_SUFFIX = ".tmp"
+PACK_INDEX_VERSION = 1
+# Meses mais recentes que isso continuam como pastas (os arquivadores ainda gravam neles)
+DEFAULT_MIN_AGE_MONTHS = 24
+PACK_COMPRESSION_LEVEL = 6
+# Cabeçalho local de cada membro do zip: assinatura, versão, flags, método, hora, data, CRC,
+# tamanhos e comprimentos do nome e do campo extra (30 bytes)
+_LOCAL_HEADER = struct.Struct("<4sHHHHHIIIHH")
+_LOCAL_HEADER_SIGNATURE = b"PK\x03\x04"
+# --- Fim Constantes ---
+
+_YEAR_FOLDER_RE = re.compile(r"^\d{4}$")
+_MONTH_FOLDER_RE = re.compile(r"^(\d{4})-(\d{2})$")
+_PACK_FILE_RE = re.compile(r"^(\d{4})-\d{2}(\.zip|\.indice\.json)$", re.IGNORECASE)
+
+
+def pack_path_for(month_folder: Path) -> Path:
+    """Pacote de uma pasta Ano-Mês: `AAAA/AAAA-MM.zip`, ao lado da pasta."""
+    return month_folder.parent / f"{month_folder.name}{PACK_EXTENSION}"
+
+
+def index_path_for(pack_path: Path) -> Path:
+    """Índice lateral do pacote: `AAAA/AAAA-MM.indice.json`."""
+    return pack_path.parent / f"{pack_path.stem}{PACK_INDEX_SUFFIX}"
+
+
+def month_folder_for(pack_path: Path) -> Path:
+    """Pasta Ano-Mês cujos arquivos estão no pacote."""
+    return pack_path.parent / pack_path.stem
+
+
+def is_pack_name(file_name: str, folder_name: str) -> bool:
+    """Indica se `file_name`, dentro da pasta `folder_name`, é um pacote `AAAA-MM.zip` (ou seu índice) do ano `AAAA`."""
+    match = _PACK_FILE_RE.match(file_name)
+    return bool(match) and match.group(1) == folder_name
+
+
+def is_pack_file(path: Path) -> bool:
+    """Indica se `path` é um pacote `AAAA-MM.zip` (ou seu índice) dentro da pasta do ano `AAAA`."""
+    return is_pack_name(path.name, path.parent.name)
+
+
+def _index_from_zip(pack_path: Path) -> List[Dict[str, Any]]:
+    """Monta a lista de membros a partir do diretório central do zip (índice lateral ausente ou desatualizado)."""
+    with zipfile.ZipFile(pack_path) as archive:
+        return [{
+            "name": info.filename,
+            "size": info.file_size,
+            "compressed_size": info.compress_size,
+            "crc32": info.CRC,
+            "compress_type": info.compress_type,
+            "header_offset": info.header_offset,
+            "mtime_ns": int(time.mktime(info.date_time + (0, 0, -1)) * 1_000_000_000),
+        } for info in archive.infolist() if not info.is_dir()]
+
+
+def read_pack_index(pack_path: Path) -> List[Dict[str, Any]]:
+    """
+    Retorna os membros do pacote (nome, tamanhos, CRC, posição no zip e data de modificação
+    original). Usa o índice lateral, que é só um JSON pequeno; se ele faltar ou não
+    corresponder ao pacote (ex.: interrupção entre as duas gravações), lê o diretório central
+    do zip. Levanta OSError ou zipfile.BadZipFile se o pacote não puder ser lido.
+    """
+    try:
+        with index_path_for(pack_path).open("r", encoding="utf-8") as f:
+            index = json.load(f)
+        if index.get("version") == PACK_INDEX_VERSION and index.get("pack_size") == pack_path.stat().st_size:
+            return index["members"]
+    except (OSError, ValueError, KeyError, AttributeError):
+        pass
+    return _index_from_zip(pack_path)
+
+
+def packed_file_names(month_folder: Path) -> List[str]:
+    """
+    Nomes (relativos à pasta Ano-Mês, com '/') dos arquivos empacotados de `month_folder`, ou
+    lista vazia se o mês não tem pacote. É o que o relatorio_mensagens usa para
+    enxergar os arquivos do pacote como se ainda estivessem na pasta.
+    """
+    pack_path = pack_path_for(month_folder)
+    if not pack_path.is_file():
+        return []
+    return [member["name"] for member in read_pack_index(pack_path)]
+
+
+def read_packed_file(pack_path: Path, member: Dict[str, Any]) -> bytes:
+    """
+    Lê um único arquivo do pacote com acesso direto: vai à posição do membro registrada no
+    índice e descompacta só os seus bytes, sem percorrer o diretório central do zip.
+    """
+    with pack_path.open("rb") as f:
+        f.seek(member["header_offset"])
+        header = _LOCAL_HEADER.unpack(f.read(_LOCAL_HEADER.size))
+        if header[0] != _LOCAL_HEADER_SIGNATURE:
+            raise zipfile.BadZipFile(f"Cabeçalho local inválido para {member['name']} em {pack_path}")
+        name_length, extra_length = header[9], header[10]
+        f.seek(name_length + extra_length, os.SEEK_CUR)
+        raw = f.read(member["compressed_size"])
+    if member["compress_type"] == zipfile.ZIP_DEFLATED:
+        data = zlib.decompress(raw, -zlib.MAX_WBITS)
+    elif member["compress_type"] == zipfile.ZIP_STORED:
+        data = raw
+    else:
+        raise zipfile.BadZipFile(f"Método de compressão não suportado em {member['name']}: {member['compress_type']}")
+    if zlib.crc32(data) != member["crc32"]:
+        raise zipfile.BadZipFile(f"CRC incorreto em {member['name']} ({pack_path})")
+    return data
+
+
+class MonthPacker:
+    """
+    Empacota as pastas Ano-Mês antigas de uma árvore organizada pelo arquiva_subpastas: cada
+    `AAAA/AAAA-MM` vira um `AAAA/AAAA-MM.zip` com um índice lateral `AAAA-MM.indice.json`
+    (posição de cada mensagem no zip, para leitura direta). Milhões de .eml pequenos viram
+    poucas centenas de arquivos grandes, o que alivia o sistema de arquivos e o backup.
+
+    O pacote é gravado em um arquivo temporário, conferido (CRC de todos os membros) e só então
+    renomeado; os originais são apagados por último. Se a pasta de um mês já empacotado
+    reaparecer (ex.: mensagem antiga arquivada depois), os arquivos novos são acrescentados ao pacote.
+    """
+
+    def __init__(self, root_folder: str, min_age_months: int = DEFAULT_MIN_AGE_MONTHS,
+                 progress: Optional[ProgressReporter] = None, today: Optional[date] = None):
+        self.progress: ProgressReporter = progress or ProgressReporter()
+        self.root_folder: Path = Path(root_folder).resolve()
+        self.log_folder: Path = self.root_folder / LOG_FOLDER_NAME
+        self.min_age_months = min_age_months
+        self.today: date = today or date.today()
+        self.packed_months_count = 0
+        self.packed_files_count = 0
+        self.unpacked_months_count = 0
+        self.bytes_before = 0  # Tamanho dos arquivos originais empacotados nesta execução
+        self.bytes_after = 0   # Quanto os pacotes cresceram para recebê-los
+        self.error_count = 0
+        self.elapsed_seconds = 0.0
+        self.logger = self._setup_logger()
+
+    def _setup_logger(self) -> logging.Logger:
+        """Configura o logger de erros (um arquivo por execução, criado só se houver erro)."""
+        logger_name = f"{__name__}.{id(self)}"
+        try:
+            self.log_folder.mkdir(parents=True, exist_ok=True)
+            timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
+            return setup_file_logger(
+                logger_name, self.log_folder / f"{LOG_FILENAME_PREFIX}{timestamp}.log", logging.ERROR,
+                "%(asctime)s - %(levelname)s - Arquivo: %(message)s", datefmt="%Y-%m-%d %H:%M:%S", delay=True)
+        except Exception as e:
+            print(f"ERRO CRÍTICO: Não foi possível configurar o logger em {self.log_folder}. Erro: {e}")
+            logger = logging.getLogger(logger_name)
+            logger.addHandler(logging.NullHandler())
+            return logger
+
+    def _is_old_enough(self, year: int, month: int) -> bool:
+        """Indica se o mês tem pelo menos `min_age_months` meses completos em relação a hoje."""
+        age = (self.today.year * 12 + self.today.month) - (year * 12 + month)
+        return age >= self.min_age_months
+
+    def find_months_to_pack(self) -> List[Path]:
+        """Pastas `AAAA/AAAA-MM` antigas o bastante, em ordem cronológica."""
+        months: List[Path] = []
+        try:
+            year_folders = sorted(self.root_folder.iterdir())
+        except OSError as e:
+            self.logger.error(f"{self.root_folder} - Motivo: Erro ao listar a pasta raiz. Detalhes: {e}")
+            self.error_count += 1
+            return months
+        for year_folder in year_folders:
+            if not (_YEAR_FOLDER_RE.match(year_folder.name) and year_folder.is_dir()):
+                continue
+            try:
+                month_folders = sorted(year_folder.iterdir())
+            except OSError as e:
+                self.logger.error(f"{year_folder} - Motivo: Erro ao listar a pasta do ano. Detalhes: {e}")
+                self.error_count += 1
+                continue
+            for month_folder in month_folders:
+                match = _MONTH_FOLDER_RE.match(month_folder.name)
+                if (match and match.group(1) == year_folder.name and month_folder.is_dir()
+                        and 1 <= int(match.group(2)) <= 12
+                        and self._is_old_enough(int(match.group(1)), int(match.group(2)))):
+                    months.append(month_folder)
+        return months
+
+    def _list_month_files(self, month_folder: Path) -> List[Tuple[str, Path]]:
+        """(nome no pacote, caminho) de todos os arquivos da pasta do mês, incluindo subpastas."""
+        files: List[Tuple[str, Path]] = []
+        for current_root, dir_names, file_names in os.walk(month_folder):
+            dir_names.sort()
+            for file_name in sorted(file_names):
+                file_path = Path(current_root) / file_name
+                files.append((file_path.relative_to(month_folder).as_posix(), file_path))
+        return files
+
+    def pack_month(self, month_folder: Path) -> None:
+        """Empacota (ou acrescenta ao pacote existente) os arquivos de uma pasta Ano-Mês."""
+        pack_path = pack_path_for(month_folder)
+        index_path = index_path_for(pack_path)
+        temp_pack = pack_path.with_name(pack_path.name + PACK_TEMP_SUFFIX)
+        temp_index = index_path.with_name(index_path.name + PACK_TEMP_SUFFIX)
+
+        previous_members: Dict[str, Dict[str, Any]] = {}
+        previous_size = 0
+        to_pack: List[Tuple[str, Path, os.stat_result]] = []
+        try:
+            if pack_path.exists():
+                previous_members = {member["name"]: member for member in read_pack_index(pack_path)}
+                previous_size = pack_path.stat().st_size
+
+            for name, file_path in self._list_month_files(month_folder):
+                if name in previous_members:
+                    # Mesmo nome já empacotado: o arquivo fica na pasta para decisão manual
+                    self.logger.error(f"{file_path} - Motivo: Já existe um arquivo com este nome em {pack_path.name}; "
+                                      "mantido fora do pacote.")
+                    self.error_count += 1
+                    continue
+                to_pack.append((name, file_path, file_path.stat()))
+        except (OSError, zipfile.BadZipFile) as e:
+            # Pacote existente ilegível (ex.: zip corrompido) ou pasta inacessível: o mês fica como está
+            self.logger.error(f"{month_folder} - Motivo: Não foi possível ler o pacote {pack_path.name} ou os "
+                              f"arquivos do mês; mês mantido sem alteração. Detalhes: {e}")
+            self.error_count += 1
+            return
+        if not to_pack:
+            return
+
+        try:
+            if previous_members:
+                shutil.copy2(pack_path, temp_pack)
+            with zipfile.ZipFile(temp_pack, "a" if previous_members else "w", compression=zipfile.ZIP_DEFLATED,
+                                 compresslevel=PACK_COMPRESSION_LEVEL, strict_timestamps=False) as archive:
+                for name, file_path, _stat in to_pack:
+                    archive.write(file_path, arcname=name)
+            # Confere o CRC de todos os membros antes de qualquer original ser apagado
+            with zipfile.ZipFile(temp_pack) as archive:
+                bad_member = archive.testzip()
+            if bad_member is not None:
+                raise zipfile.BadZipFile(f"CRC incorreto em {bad_member} após a gravação")
+
+            mtimes = {name: member.get("mtime_ns") for name, member in previous_members.items()}
+            mtimes.update({name: stat.st_mtime_ns for name, _path, stat in to_pack})
+            members = _index_from_zip(temp_pack)
+            for member in members:
+                member["mtime_ns"] = mtimes.get(member["name"], member["mtime_ns"])
+            with temp_index.open("w", encoding="utf-8") as f:
+                json.dump({"version": PACK_INDEX_VERSION, "month": month_folder.name,
+                           "pack_size": temp_pack.stat().st_size,
+                           "updated_at": datetime.now().isoformat(timespec="seconds"),
+                           "members": members}, f, ensure_ascii=False)
+            os.replace(temp_pack, pack_path)
+            os.replace(temp_index, index_path)
+        except Exception as e:
+            self.logger.error(f"{month_folder} - Motivo: Falha ao empacotar; originais mantidos. Detalhes: {e}")
+            self.error_count += 1
+            for temp_path in (temp_pack, temp_index):
+                with contextlib.suppress(OSError):
+                    temp_path.unlink()
+            return
+
+        self.packed_months_count += 1
+        self.packed_files_count += len(to_pack)
+        self.bytes_before += sum(stat.st_size for _name, _path, stat in to_pack)
+        self.bytes_after += pack_path.stat().st_size - previous_size
+        for _name, file_path, _stat in to_pack:
+            try:
+                file_path.unlink()
+            except OSError as e:
+                self.logger.error(f"{file_path} - Motivo: Empacotado, mas não foi possível apagar o original. "
+                                  f"Detalhes: {e}")
+                self.error_count += 1
+        self._remove_empty_folders(month_folder)
+
+    def _remove_empty_folders(self, month_folder: Path) -> None:
+        """Remove a pasta do mês (e subpastas) se ficaram vazias após o empacotamento."""
+        for current_root, _dir_names, _file_names in os.walk(month_folder, topdown=False):
+            with contextlib.suppress(OSError):
+                os.rmdir(current_root)
+
+    def unpack_month(self, year_month: str) -> None:
+        """Devolve à pasta `AAAA/AAAA-MM` os arquivos do pacote do mês e apaga o pacote."""
+        month_folder = self.root_folder / year_month[:4] / year_month
+        pack_path = pack_path_for(month_folder)
+        if not _MONTH_FOLDER_RE.match(year_month) or not pack_path.is_file():
+            self.logger.error(f"{pack_path} - Motivo: Pacote não encontrado.")
+            self.error_count += 1
+            return
+
+        written: List[Path] = []  # Arquivos já devolvidos nesta tentativa (apagados se ela falhar)
+        temp_target: Optional[Path] = None
+        try:
+            members = read_pack_index(pack_path)
+            conflicts = [member["name"] for member in members if (month_folder / member["name"]).exists()]
+            if conflicts:
+                raise FileExistsError(f"{len(conflicts)} arquivo(s) já existem na pasta, ex.: {conflicts[0]}")
+            for member in members:
+                self.progress.advance(count=1)
+                target = month_folder / member["name"]
+                target.parent.mkdir(parents=True, exist_ok=True)
+                # Gravado com nome temporário: uma interrupção não deixa um arquivo truncado com o nome final
+                temp_target = target.with_name(target.name + PACK_TEMP_SUFFIX)
+                temp_target.write_bytes(read_packed_file(pack_path, member))
+                mtime_ns = member["mtime_ns"]
+                os.utime(temp_target, ns=(mtime_ns, mtime_ns))
+                os.replace(temp_target, target)
+                temp_target = None
+                written.append(target)
+        except Exception as e:
+            # Desfaz a tentativa: sem arquivos soltos ao lado do pacote, o mês pode ser desempacotado de novo
+            for path in written + ([temp_target] if temp_target is not None else []):
+                with contextlib.suppress(OSError):
+                    path.unlink()
+            self._remove_empty_folders(month_folder)
+            self.logger.error(f"{pack_path} - Motivo: Falha ao desempacotar; pacote mantido e arquivos já "
+                              f"extraídos removidos. Detalhes: {e}")
+            self.error_count += 1
+            return
+
+        pack_path.unlink()
+        with contextlib.suppress(FileNotFoundError):
+            index_path_for(pack_path).unlink()
+        self.unpacked_months_count += 1
+
+    def pack_old_months(self) -> None:
+        """Empacota todas as pastas Ano-Mês antigas da árvore."""
+        start = time.perf_counter()
+        months = self.find_months_to_pack()
+        self.progress.start(total=len(months), stage="Empacotando meses")
+        for month_folder in months:
+            if self.progress.cancelled:
+                break
+            print(f"Empacotando {month_folder.relative_to(self.root_folder)}...")
+            self.pack_month(month_folder)
+            self.progress.advance(moved=self.packed_months_count, errors=self.error_count)
+        self.progress.finish(moved=self.packed_months_count, errors=self.error_count)
+        self.elapsed_seconds = time.perf_counter() - start
+
+    def unpack_months(self, year_months: List[str]) -> None:
+        """Desempacota os meses informados (`AAAA-MM`)."""
+        start = time.perf_counter()
+        self.progress.start(stage="Desempacotando")
+        for year_month in year_months:
+            if self.progress.cancelled:
+                break
+            self.unpack_month(year_month)
+        self.progress.finish(moved=self.unpacked_months_count, errors=self.error_count)
+        self.elapsed_seconds = time.perf_counter() - start
+
+    def summary_dict(self) -> Dict[str, Any]:
+        """Retorna os contadores da última execução em formato serializável (JSON)."""
+        return {
+            "tool": "empacotar_meses",
+            "root_folder": str(self.root_folder),
+            "min_age_months": self.min_age_months,
+            "packed_months_count": self.packed_months_count,
+            "packed_files_count": self.packed_files_count,
+            "unpacked_months_count": self.unpacked_months_count,
+            "bytes_before": self.bytes_before,
+            "bytes_after": self.bytes_after,
+            "error_count": self.error_count,
+            "cancelled": self.progress.cancelled,
+            "elapsed_seconds": round(self.elapsed_seconds, 3),
+        }
+
+
+def build_arg_parser() -> argparse.ArgumentParser:
+    """Cria o parser de argumentos da linha de comando."""
+    parser = argparse.ArgumentParser(
+        description="Empacota em .zip (com índice para leitura direta) as pastas Ano-Mês antigas de uma árvore organizada.")
+    parser.add_argument("pasta", help="Pasta raiz organizada (ex.: a pasta processada pelo arquiva_subpastas).")
+    parser.add_argument("--meses-minimos", dest="meses_minimos", type=int, default=DEFAULT_MIN_AGE_MONTHS, metavar="N",
+                        help="Só empacota meses com pelo menos N meses de idade "
+                             f"(padrão: {DEFAULT_MIN_AGE_MONTHS}; mínimo 1, o mês corrente nunca é empacotado).")
+    parser.add_argument("--desempacotar", metavar="AAAA-MM", action="append",
+                        help="Em vez de empacotar, devolve à pasta os arquivos do pacote do mês (pode ser repetida).")
+    return parser
+
+
+def run_headless(args: argparse.Namespace, progress: Optional[ProgressReporter] = None) -> Dict[str, Any]:
+    """Empacota (ou desempacota) os meses e retorna o resumo em formato serializável."""
+    packer = MonthPacker(args.pasta, max(args.meses_minimos, 1), progress=progress)
+    try:
+        if args.desempacotar:
+            packer.unpack_months(args.desempacotar)
+        else:
+            packer.pack_old_months()
+    finally:
+        close_logger(packer.logger)
+    return packer.summary_dict()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Ponto de entrada da linha de comando: imprime o resumo em JSON."""
+    args = build_arg_parser().parse_args(argv)
+    # Mensagens de progresso vão para stderr; stdout fica reservado ao resumo JSON
+    with contextlib.redirect_stdout(sys.stderr):
+        summary = run_headless(args)
+    print(json.dumps(summary, indent=2))
+    return 1 if summary["error_count"] else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,152 @@
+import email.message
+import hashlib
+import sqlite3
+from datetime import datetime
+from email import policy
+from email.parser import BytesParser
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from leitura_cabecalhos import body_offset
+
+# --- Constantes ---
+INDEX_FILENAME = "indice_mensagens.sqlite"
+# Linhas acumuladas antes de cada gravação em lote (uma transação por lote)
+INDEX_BATCH_SIZE = 500
+INDEX_COLUMNS = ("path", "file_name", "date", "subject", "sender", "message_id", "size", "mtime_ns",
+                 "attachment_count", "body_sha256", "indexed_at")
+# --- Fim Constantes ---
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS messages (
+    path TEXT PRIMARY KEY,          -- caminho relativo à pasta indexada, com '/'
+    file_name TEXT NOT NULL,
+    date TEXT,                      -- ISO 8601 (data usada no nome do arquivo)
+    subject TEXT,
+    sender TEXT,
+    message_id TEXT,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    attachment_count INTEGER NOT NULL,
+    body_sha256 TEXT NOT NULL,      -- SHA-256 dos bytes do corpo (tudo após o cabeçalho)
+    indexed_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS messages_date ON messages (date);
+CREATE INDEX IF NOT EXISTS messages_message_id ON messages (message_id);
+CREATE INDEX IF NOT EXISTS messages_body_sha256 ON messages (body_sha256);
+"""
+
+
+def describe_eml_bytes(data: bytes) -> Tuple[int, str, Optional[str]]:
+    """
+    Retorna (quantidade de anexos, SHA-256 do corpo, Message-ID) de um .eml completo.
+    O hash cobre os bytes após o cabeçalho, então cópias da mesma mensagem coincidem
+    mesmo que o cabeçalho tenha sido reescrito por algum servidor.
+    """
+    msg = BytesParser(policy=policy.default).parsebytes(data)
+    attachment_count = sum(1 for part in msg.walk()
+                           if isinstance(part, email.message.EmailMessage) and part.is_attachment())
+    body_hash = hashlib.sha256(memoryview(data)[body_offset(data):]).hexdigest()
+    message_id = msg.get("Message-ID")
+    return attachment_count, body_hash, str(message_id).strip() if message_id else None
+
+
+class MessageIndex:
+    """
+    Índice SQLite das mensagens de uma pasta (data, assunto, remetente, Message-ID, tamanho,
+    anexos e hash do corpo), para buscas e auditorias sem reabrir cada .eml. É incremental:
+    arquivos com o mesmo tamanho e data de modificação já indexados não são relidos.
+    """
+
+    def __init__(self, db_path: Path, base_folder: Path):
+        self.db_path = Path(db_path)
+        self.base_folder = Path(base_folder)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        # As ferramentas podem gravar a partir de uma thread de trabalho (um arquivo por vez)
+        self.connection = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self.connection.executescript(_SCHEMA)
+        self._pending: List[Tuple[Any, ...]] = []
+        self._pending_deletes: List[str] = []
+        self.seen_paths: Set[str] = set()
+        self.indexed_count = 0   # Mensagens (re)lidas e gravadas nesta execução
+        self.unchanged_count = 0  # Mensagens que já estavam atualizadas no índice
+
+    def relative_key(self, file_path: Path) -> str:
+        """Chave do arquivo no índice: caminho relativo à pasta base, com '/'."""
+        return file_path.relative_to(self.base_folder).as_posix()
+
+    def is_current(self, file_path: Path, size: int, mtime_ns: int) -> bool:
+        """Indica se o arquivo já está no índice com o mesmo tamanho e data de modificação."""
+        row = self.connection.execute(
+            "SELECT size, mtime_ns FROM messages WHERE path = ?", (self.relative_key(file_path),)).fetchone()
+        return row is not None and row[0] == size and row[1] == mtime_ns
+
+    def record(self, file_path: Path, date: Optional[datetime], subject: str, sender: str) -> None:
+        """
+        Registra (ou atualiza) a mensagem em `file_path`. Só relê o arquivo inteiro (anexos e
+        hash do corpo) se ele mudou desde a última indexação.
+        """
+        key = self.relative_key(file_path)
+        self.seen_paths.add(key)
+        stat = file_path.stat()
+        if self.is_current(file_path, stat.st_size, stat.st_mtime_ns):
+            self.unchanged_count += 1
+            return
+
+        attachment_count, body_hash, message_id = describe_eml_bytes(file_path.read_bytes())
+        self._pending.append((
+            key, file_path.name, date.isoformat(timespec="minutes") if date else None, subject, sender,
+            message_id, stat.st_size, stat.st_mtime_ns, attachment_count, body_hash,
+            datetime.now().isoformat(timespec="seconds")))
+        self.indexed_count += 1
+        if len(self._pending) + len(self._pending_deletes) >= INDEX_BATCH_SIZE:
+            self.flush()
+
+    def forget(self, file_path: Path) -> None:
+        """Remove do índice um caminho que deixou de existir (ex.: arquivo renomeado)."""
+        key = self.relative_key(file_path)
+        self.seen_paths.discard(key)
+        self._pending = [row for row in self._pending if row[0] != key]
+        self._pending_deletes.append(key)
+
+    def flush(self) -> None:
+        """Grava em uma única transação as remoções e linhas acumuladas."""
+        if not self._pending and not self._pending_deletes:
+            return
+        placeholders = ", ".join("?" for _ in INDEX_COLUMNS)
+        with self.connection:
+            self.connection.executemany("DELETE FROM messages WHERE path = ?",
+                                        ((key,) for key in self._pending_deletes))
+            self.connection.executemany(
+                f"INSERT OR REPLACE INTO messages ({', '.join(INDEX_COLUMNS)}) VALUES ({placeholders})",
+                self._pending)
+        self._pending = []
+        self._pending_deletes = []
+
+    def prune_unseen(self) -> int:
+        """
+        Remove as linhas de arquivos não vistos nesta execução (apagados ou movidos para fora).
+        Só deve ser chamado após uma varredura completa da pasta. Retorna quantas foram removidas.
+        """
+        self.flush()
+        with self.connection:
+            self.connection.execute("CREATE TEMP TABLE IF NOT EXISTS seen_paths (path TEXT PRIMARY KEY)")
+            self.connection.execute("DELETE FROM seen_paths")
+            self.connection.executemany("INSERT OR IGNORE INTO seen_paths VALUES (?)",
+                                        ((path,) for path in self.seen_paths))
+            cursor = self.connection.execute(
+                "DELETE FROM messages WHERE path NOT IN (SELECT path FROM seen_paths)")
+        return cursor.rowcount
+
+    def close(self) -> None:
+        """Grava o que estiver pendente e fecha o banco."""
+        self.flush()
+        self.connection.close()
+
+    def stats(self) -> Dict[str, Any]:
+        """Contadores da execução, para o resumo das ferramentas."""
+        return {
+            "index_path": str(self.db_path),
+            "indexed_count": self.indexed_count,
+            "unchanged_count": self.unchanged_count,
+        }
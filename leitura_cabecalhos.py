@@ -0,0 +1,243 @@
+import argparse
+import asyncio
+import email.message
+import mmap
+import os
+import time
+from collections import deque
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from email import policy
+from email.parser import HeaderParser
+from typing import AsyncIterator, Callable, Iterable, Iterator, List, NamedTuple, Optional, Union
+
+from metricas import STAGE_HEADER_PARSE, RunMetrics
+
+# --- Constantes ---
+# Leituras de arquivo simultâneas padrão quando a leitura antecipada é ativada
+DEFAULT_READ_CONCURRENCY = 16
+# Quantos arquivos, por leitura simultânea, podem estar lidos à frente do processamento
+PREFETCH_WINDOW_FACTOR = 2
+# Tamanho de cada bloco lido enquanto se procura o fim do cabeçalho
+HEADER_CHUNK_SIZE = 64 * 1024
+# A partir deste tamanho o arquivo é mapeado em memória (mmap) em vez de lido em blocos
+MMAP_MIN_SIZE = 4 * 1024 * 1024
+# Linha em branco que separa cabeçalho e corpo (LF e CRLF)
+HEADER_BOUNDARIES = (b"\n\n", b"\r\n\r\n")
+# --- Fim Constantes ---
+
+# As ferramentas usam tanto Path quanto str (arquiva_email_gui)
+PathType = Union[str, os.PathLike]
+
+
+class HeaderRecord(NamedTuple):
+    """Cabeçalho lido antecipadamente. `headers` é None se a leitura ou a interpretação falhou."""
+    path: PathType
+    headers: Optional[email.message.Message]
+    error: Optional[Exception]
+
+
+# Leitores de cabeçalho recebem bytes ou uma memoryview (mmap), sem cópia
+BytesLike = Union[bytes, memoryview]
+
+
+def _find_header_end(data, start: int = 0, end: Optional[int] = None) -> int:
+    """
+    Retorna a posição logo após a primeira linha em branco de `data[start:end]` (bytes,
+    bytearray ou mmap), ou -1 se não houver.
+    """
+    end = len(data) if end is None else end
+    ends = [pos + len(boundary) for boundary in HEADER_BOUNDARIES
+            if (pos := data.find(boundary, start, end)) != -1]
+    return min(ends) if ends else -1
+
+
+def body_offset(data: BytesLike) -> int:
+    """Posição onde começa o corpo da mensagem em `data` (len(data) se não houver linha em branco)."""
+    header_end = _find_header_end(data)
+    return len(data) if header_end == -1 else header_end
+
+
+def _read_header_block_from(f) -> bytes:
+    """Lê `f` em blocos até a primeira linha em branco (inclusive) ou o fim do arquivo."""
+    buffer = bytearray()
+    while True:
+        chunk = f.read(HEADER_CHUNK_SIZE)
+        if not chunk:
+            return bytes(buffer)
+        # Recua alguns bytes para achar a linha em branco partida entre dois blocos
+        search_from = max(len(buffer) - 3, 0)
+        buffer += chunk
+        header_end = _find_header_end(buffer, search_from)
+        if header_end != -1:
+            return bytes(buffer[:header_end])
+
+
+def _find_header_end_mapped(mapped: mmap.mmap) -> int:
+    """
+    Procura a linha em branco em janelas crescentes a partir do início, para que um arquivo
+    grande sem CRLF (ou sem corpo) não seja varrido inteiro em busca do separador ausente.
+    """
+    size = len(mapped)
+    window_start, window_end = 0, min(HEADER_CHUNK_SIZE, size)
+    while True:
+        header_end = _find_header_end(mapped, window_start, window_end)
+        if header_end != -1:
+            return header_end
+        if window_end >= size:
+            return size
+        window_start = max(window_end - 3, 0)
+        window_end = min(window_end * 2, size)
+
+
+@contextmanager
+def open_header_block(path: PathType) -> Iterator[BytesLike]:
+    """
+    Fornece o bloco de cabeçalho de um .eml (até a primeira linha em branco, inclusive; sem
+    linha em branco, o arquivo inteiro). Arquivos a partir de MMAP_MIN_SIZE (ex.: exportações
+    com vídeos anexados) são mapeados em memória e o bloco é uma memoryview do mapeamento,
+    sem cópia; os menores são lidos em blocos. O bloco só é válido dentro do `with`.
+    """
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size < MMAP_MIN_SIZE:
+            yield _read_header_block_from(f)
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            view = memoryview(mapped)[:_find_header_end_mapped(mapped)]
+            try:
+                yield view
+            finally:
+                # Sem liberar a view o mmap não pode ser fechado
+                view.release()
+
+
+def read_header_block(path: PathType) -> bytes:
+    """Lê e retorna (como bytes) apenas o bloco de cabeçalho de um .eml."""
+    with open_header_block(path) as block:
+        return bytes(block)
+
+
+def parse_headers_compat(block: BytesLike) -> email.message.Message:
+    """
+    Interpreta o cabeçalho como os arquivadores: texto UTF-8 (ou Latin-1, se falhar), quebras
+    de linha normalizadas como na leitura em modo texto e política compat32.
+    """
+    try:
+        text = str(block, "utf-8")
+    except UnicodeDecodeError:
+        text = str(block, "latin-1")
+    return HeaderParser().parsestr(text.replace("\r\n", "\n").replace("\r", "\n"))
+
+
+def parse_headers_default(block: BytesLike) -> email.message.Message:
+    """
+    Interpreta o cabeçalho como o renomear_eml: bytes com a política `email.policy.default`
+    (mesma decodificação de `BytesHeaderParser.parsebytes`, mas aceitando memoryview).
+    """
+    return HeaderParser(policy=policy.default).parsestr(str(block, "ascii", "surrogateescape"))
+
+
+def read_headers(path: PathType,
+                 parse: Callable[[BytesLike], email.message.Message] = parse_headers_compat) -> email.message.Message:
+    """Lê e interpreta apenas o cabeçalho de um .eml (mmap para arquivos grandes)."""
+    with open_header_block(path) as block:
+        return parse(block)
+
+
+def read_header_record(path: PathType,
+                       parse: Callable[[BytesLike], email.message.Message] = parse_headers_compat) -> HeaderRecord:
+    """Lê e interpreta o cabeçalho de um arquivo, guardando o erro em vez de levantá-lo."""
+    try:
+        return HeaderRecord(path, read_headers(path, parse), None)
+    except Exception as e:
+        return HeaderRecord(path, None, e)
+
+
+async def prefetch_headers(paths: Iterable[PathType],
+                           parse: Callable[[BytesLike], email.message.Message] = parse_headers_compat,
+                           concurrency: int = DEFAULT_READ_CONCURRENCY) -> AsyncIterator[HeaderRecord]:
+    """
+    Iterador assíncrono dos cabeçalhos de `paths`, na mesma ordem. Em compartilhamentos de rede
+    (SMB/NFS) o tempo é dominado pela latência de cada abertura/leitura, então até `concurrency`
+    leituras ocorrem ao mesmo tempo em threads, limitadas por um semáforo, e no máximo
+    `concurrency * PREFETCH_WINDOW_FACTOR` arquivos ficam lidos à frente de quem consome.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def read_one(path: PathType) -> HeaderRecord:
+        async with semaphore:
+            return await asyncio.to_thread(read_header_record, path, parse)
+
+    path_iter = iter(paths)
+    pending: deque = deque()
+
+    def schedule_next() -> None:
+        next_path = next(path_iter, None)
+        if next_path is not None:
+            pending.append(asyncio.create_task(read_one(next_path)))
+
+    for _ in range(concurrency * PREFETCH_WINDOW_FACTOR):
+        schedule_next()
+    try:
+        while pending:
+            record = await pending.popleft()
+            schedule_next()
+            yield record
+    finally:
+        # Consumidor parou antes do fim (ex.: cancelamento): descarta as leituras pendentes
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+
+
+def add_read_concurrency_argument(parser: argparse.ArgumentParser) -> None:
+    """Adiciona a opção --leituras-simultaneas, comum às ferramentas que leem cabeçalhos de .eml."""
+    parser.add_argument(
+        "--leituras-simultaneas", dest="leituras_simultaneas", type=int, nargs="?", default=1,
+        const=DEFAULT_READ_CONCURRENCY, metavar="N",
+        help="Lê antecipadamente os cabeçalhos de até N arquivos .eml ao mesmo tempo (útil em "
+             f"compartilhamentos de rede; sem N, usa {DEFAULT_READ_CONCURRENCY}). Padrão: 1 (um arquivo por vez).")
+
+
+def is_eml_path(path: PathType) -> bool:
+    """Indica se o caminho é de um arquivo .eml (os únicos cujo cabeçalho é lido antecipadamente)."""
+    return os.fspath(path).lower().endswith(".eml")
+
+
+def process_with_prefetch(file_paths: List[PathType],
+                          handle_file: Callable[[PathType, Optional[email.message.Message]], None],
+                          concurrency: int = DEFAULT_READ_CONCURRENCY,
+                          parse: Callable[[BytesLike], email.message.Message] = parse_headers_compat,
+                          should_stop: Callable[[], bool] = lambda: False,
+                          metrics: Optional[RunMetrics] = None) -> None:
+    """
+    Chama `handle_file(caminho, cabeçalhos)` para cada arquivo, em ordem, enquanto os cabeçalhos
+    dos .eml seguintes são lidos em paralelo. `cabeçalhos` é None para arquivos que não são .eml
+    e para .eml cuja leitura antecipada falhou (a ferramenta então lê o arquivo do jeito habitual
+    e registra o erro como sempre). `handle_file` roda em uma thread, um arquivo por vez, para não
+    travar as leituras enquanto o arquivo anterior é movido.
+    """
+    eml_paths = [path for path in file_paths if is_eml_path(path)]
+
+    async def run() -> None:
+        # Uma thread por leitura simultânea, mais uma para o processamento
+        asyncio.get_running_loop().set_default_executor(
+            ThreadPoolExecutor(max_workers=concurrency + 1, thread_name_prefix="leitura_cabecalhos"))
+        records = prefetch_headers(eml_paths, parse, concurrency)
+        try:
+            for path in file_paths:
+                if should_stop():
+                    break
+                headers = None
+                if is_eml_path(path):
+                    # Tempo esperando a leitura antecipada (praticamente zero quando ela está à frente)
+                    started = time.perf_counter()
+                    record = await anext(records)
+                    if metrics is not None:
+                        metrics.add_stage_time(STAGE_HEADER_PARSE, time.perf_counter() - started)
+                    headers = record.headers
+                await asyncio.to_thread(handle_file, path, headers)
+        finally:
+            await records.aclose()
+
+    asyncio.run(run())
@@ -1,10 +1,18 @@
 import tkinter as tk
-from tkinter import ttk, messagebox
+from tkinter import ttk, messagebox, filedialog, simpledialog
+import importlib
+import importlib.util
+import json
+import queue
 import subprocess
 import sys
 import os
 import platform  # Para detectar o sistema operacional
+import threading
 import tkinter.font as tkFont # Para manipulação de fontes
+from typing import Dict
+
+from progresso import ProgressReporter, format_eta
 
 try:
     from ttkthemes import ThemedTk
@@ -19,6 +27,8 @@ SCRIPT_DIR = os.path.dirname(os.path.abspath(sys.argv[0] if getattr(sys, 'frozen
 ICON_PATH = os.path.join(SCRIPT_DIR, 'imagens', 'email.ico')
 # Diretório para arquivos de ajuda (PDFs), também no mesmo nível que main.exe
 HELP_DIR = os.path.join(SCRIPT_DIR, 'docs')
+# Intervalo (ms) de verificação da fila de resultados das ferramentas executadas no painel
+RESULT_POLL_INTERVAL_MS = 200
 
 # --- Funções para Lançar Executáveis ---
 def launch_executable(executable_name: str):
@@ -77,6 +87,90 @@ def open_help_pdf(pdf_filename: str):
         messagebox.showerror(
             "Erro de Ajuda", f"Ocorreu um erro inesperado ao tentar abrir o PDF '{pdf_filename}':\n{e}")
 
+# --- Execução das Ferramentas no Próprio Processo ---
+def is_tool_available_in_process(module_name: str) -> bool:
+    """Indica se o módulo da ferramenta pode ser importado (script ou incluído no pacote do painel)."""
+    try:
+        return importlib.util.find_spec(module_name) is not None
+    except (ImportError, ValueError):
+        return False
+
+def run_tool_in_process(module_name: str, argv: list, progress: ProgressReporter = None) -> dict:
+    """
+    Importa o módulo da ferramenta sob demanda e executa seu modo sem interface gráfica.
+    Deve ser chamado em uma thread de trabalho; retorna o resumo (dict) produzido pela ferramenta.
+    """
+    module = importlib.import_module(module_name)
+    args = module.build_arg_parser().parse_args(argv)
+    return module.run_headless(args, progress=progress)
+
+def format_tool_result(button_text: str, result: dict) -> str:
+    """Formata o resumo de uma ferramenta para exibição no painel de resultados."""
+    lines = [f"=== {button_text} ==="]
+    summary_text = result.get("summary")
+    for key, value in result.items():
+        if key in ("summary", "tool"):
+            continue
+        if isinstance(value, (list, dict)):
+            value = json.dumps(value, ensure_ascii=False)
+        lines.append(f"{key}: {value}")
+    if summary_text:
+        lines.append(summary_text.strip())
+    return "\n".join(lines) + "\n\n"
+
+# --- Execução em Segundo Plano ---
+class ToolJob:
+    """Uma execução de ferramenta em uma thread de trabalho, com progresso e cancelamento."""
+
+    def __init__(self, job_id: int, button_text: str, module_name: str, argv: list, event_queue: queue.Queue):
+        self.job_id = job_id
+        self.button_text = button_text
+        self.module_name = module_name
+        self.argv = argv
+        self.event_queue = event_queue
+        self.cancel_event = threading.Event()
+        self.progress = ProgressReporter(callback=self._on_progress, cancel_event=self.cancel_event)
+        self.thread = threading.Thread(target=self._run, daemon=True)
+
+    def _on_progress(self, snapshot: dict):
+        """Chamado na thread de trabalho: repassa o evento de progresso para a thread da GUI."""
+        self.event_queue.put(("progress", self.job_id, snapshot))
+
+    def _run(self):
+        """Corpo da thread de trabalho: executa a ferramenta e envia o resultado para a fila."""
+        try:
+            result = run_tool_in_process(self.module_name, self.argv, progress=self.progress)
+            status = "Cancelado" if self.cancel_event.is_set() else "Concluído"
+            self.event_queue.put(("done", self.job_id, status, format_tool_result(self.button_text, result)))
+        except SystemExit:  # argparse encerra com SystemExit em argumentos inválidos
+            self.event_queue.put(("done", self.job_id, "Erro",
+                                  f"=== {self.button_text} ===\nArgumentos inválidos: {self.argv}\n\n"))
+        except Exception as e:
+            self.event_queue.put(("done", self.job_id, "Erro", f"=== {self.button_text} ===\nERRO: {e}\n\n"))
+
+
+class JobRunner:
+    """Inicia e acompanha as execuções em segundo plano; os eventos são lidos pela thread da GUI."""
+
+    def __init__(self):
+        self.events: queue.Queue = queue.Queue()
+        self.jobs: Dict[int, ToolJob] = {}
+        self._next_job_id = 1
+
+    def submit(self, button_text: str, module_name: str, argv: list) -> ToolJob:
+        """Cria e inicia uma nova execução."""
+        job = ToolJob(self._next_job_id, button_text, module_name, argv, self.events)
+        self._next_job_id += 1
+        self.jobs[job.job_id] = job
+        job.thread.start()
+        return job
+
+    def cancel(self, job_id: int):
+        """Solicita o cancelamento de uma execução (atendido entre um arquivo e outro)."""
+        job = self.jobs.get(job_id)
+        if job:
+            job.cancel_event.set()
+
 # --- Configuração da GUI ---
 class MainApp:
     def __init__(self, root_window):
@@ -120,20 +214,20 @@ class MainApp:
         title_label = ttk.Label(main_frame, text="Ferramentas de Gerenciamento de Mensagens", style="Title.TLabel")
         title_label.grid(row=0, column=0, columnspan=2, pady=(0, 30), sticky=tk.N)
 
-        # Formato: (Texto do Botão, Nome do EXECUTÁVEL Filho, Nome do Arquivo PDF de Ajuda)
+        # Formato: (Texto do Botão, Nome do EXECUTÁVEL Filho, Nome do Arquivo PDF de Ajuda, Módulo da Ferramenta)
         scripts_to_launch = [
-            ("Arquivar E-mails (Pasta Padrão)", "arquiva_email.exe", "Leiame - Arquiva e-mail automático.pdf"),
-            ("Arquivar E-mails (GUI - Pasta Única)", "arquiva_email_gui.exe", "Leiame - Arquiva e-mail GUI.pdf"),
-            ("Centralizar Arquivos (Raiz)", "arquiva_raiz.exe", "Leiame - Arquivo raiz.pdf"),
-            ("Arquivar E-mails (Subpastas)", "arquiva_subpastas.exe", "Leiame - Arquiva e-mail Subpastas.pdf"),
-            ("Renomear Arquivos .eml", "renomear_eml.exe", "Leiame - Renomeando e-mails eml.pdf"),
-            ("Comparar Conteúdo de Pastas", "pastas_diff.exe", "Leiame - Diferenças entre as pastas.pdf"),
-            ("Relatório de Contagem de Mensagens", "relatorio_mensagens.exe", "Leiame - Relatório de Mensagens.pdf"),
+            ("Arquivar E-mails (Pasta Padrão)", "arquiva_email.exe", "Leiame - Arquiva e-mail automático.pdf", "arquiva_email"),
+            ("Arquivar E-mails (GUI - Pasta Única)", "arquiva_email_gui.exe", "Leiame - Arquiva e-mail GUI.pdf", "arquiva_email_gui"),
+            ("Centralizar Arquivos (Raiz)", "arquiva_raiz.exe", "Leiame - Arquivo raiz.pdf", "arquiva_raiz"),
+            ("Arquivar E-mails (Subpastas)", "arquiva_subpastas.exe", "Leiame - Arquiva e-mail Subpastas.pdf", "arquiva_subpastas"),
+            ("Renomear Arquivos .eml", "renomear_eml.exe", "Leiame - Renomeando e-mails eml.pdf", "renomear_eml"),
+            ("Comparar Conteúdo de Pastas", "pastas_diff.exe", "Leiame - Diferenças entre as pastas.pdf", "pastas_diff"),
+            ("Relatório de Contagem de Mensagens", "relatorio_mensagens.exe", "Leiame - Relatório de Mensagens.pdf", "relatorio_mensagens"),
         ]
 
-        for i, (button_text, exe_filename, help_pdf_filename) in enumerate(scripts_to_launch):
+        for i, (button_text, exe_filename, help_pdf_filename, module_name) in enumerate(scripts_to_launch):
             script_button = ttk.Button(main_frame, text=button_text,
-                                       command=lambda ex=exe_filename: launch_executable(ex),
+                                       command=lambda t=button_text, ex=exe_filename, mod=module_name: self.start_tool(t, ex, mod),
                                        width=40)
             script_button.grid(row=i + 1, column=0, pady=8, padx=(10, 5), sticky=tk.EW)
 
@@ -142,14 +236,142 @@ class MainApp:
                                      width=10)
             help_button.grid(row=i + 1, column=1, pady=8, padx=(5, 10), sticky=tk.EW)
 
+        next_row = len(scripts_to_launch) + 1
+
+        # Executa as ferramentas no próprio painel (threads de trabalho) em vez de abrir um .exe por ferramenta
+        self.in_process_var = tk.BooleanVar(value=True)
+        in_process_check = ttk.Checkbutton(main_frame, text="Executar as ferramentas no painel (sem abrir outro programa)",
+                                           variable=self.in_process_var)
+        in_process_check.grid(row=next_row, column=0, columnspan=2, sticky=tk.W, padx=10, pady=(10, 0))
+
+        # Painel de progresso das execuções em segundo plano
+        jobs_frame = ttk.Frame(main_frame)
+        jobs_frame.grid(row=next_row + 1, column=0, columnspan=2, sticky='nsew', padx=10, pady=(10, 0))
+        jobs_columns = ("tool", "status", "scanned", "moved", "errors", "rate", "eta")
+        self.jobs_tree = ttk.Treeview(jobs_frame, columns=jobs_columns, show="headings", height=4)
+        for column, heading, width in (("tool", "Ferramenta", 200), ("status", "Situação", 90),
+                                       ("scanned", "Verificados", 90), ("moved", "Movidos", 70),
+                                       ("errors", "Erros", 50), ("rate", "Arq./s", 60), ("eta", "Restante", 70)):
+            self.jobs_tree.heading(column, text=heading)
+            self.jobs_tree.column(column, width=width, anchor=tk.W if column == "tool" else tk.CENTER)
+        self.jobs_tree.pack(side=tk.TOP, fill=tk.X)
+        cancel_button = ttk.Button(jobs_frame, text="Cancelar Selecionado", style="Help.TButton",
+                                   command=self.cancel_selected_job)
+        cancel_button.pack(side=tk.TOP, anchor=tk.E, pady=(5, 0))
+
+        results_frame = ttk.Frame(main_frame)
+        results_frame.grid(row=next_row + 2, column=0, columnspan=2, sticky='nsew', padx=10, pady=(10, 0))
+        results_label = ttk.Label(results_frame, text="Resultados:")
+        results_label.pack(anchor=tk.W)
+        results_scrollbar = ttk.Scrollbar(results_frame)
+        results_scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.results_text = tk.Text(results_frame, height=12, width=70, wrap=tk.WORD,
+                                    yscrollcommand=results_scrollbar.set, state=tk.DISABLED)
+        self.results_text.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        results_scrollbar.config(command=self.results_text.yview)
+
         separator = ttk.Separator(main_frame, orient='horizontal')
-        separator.grid(row=len(scripts_to_launch) + 1, column=0, columnspan=2, sticky='ew', pady=20)
+        separator.grid(row=next_row + 3, column=0, columnspan=2, sticky='ew', pady=20)
 
         exit_button = ttk.Button(main_frame, text="Sair", command=root_window.quit, width=15)
-        exit_button.grid(row=len(scripts_to_launch) + 2, column=0, columnspan=2, pady=(20, 0))
+        exit_button.grid(row=next_row + 4, column=0, columnspan=2, pady=(20, 0))
+
+        # Eventos das threads de trabalho chegam pela fila do JobRunner e são exibidos pela thread da GUI
+        self.job_runner = JobRunner()
+        self.root.after(RESULT_POLL_INTERVAL_MS, self.poll_results)
 
         self.center_window()
 
+    def start_tool(self, button_text: str, exe_filename: str, module_name: str):
+        """Executa a ferramenta no painel (se possível e habilitado) ou lança o executável filho."""
+        if not self.in_process_var.get() or not is_tool_available_in_process(module_name):
+            launch_executable(exe_filename)
+            return
+
+        argv = self.ask_tool_arguments(module_name)
+        if argv is None:
+            return  # Usuário cancelou a seleção
+
+        job = self.job_runner.submit(button_text, module_name, argv)
+        self.jobs_tree.insert("", tk.END, iid=str(job.job_id),
+                              values=(button_text, "Executando", 0, 0, 0, "-", "-"))
+
+    def ask_tool_arguments(self, module_name: str):
+        """Solicita (na thread da GUI) as pastas e opções da ferramenta. Retorna a lista de argumentos ou None."""
+        if module_name == "arquiva_email":
+            watch_folder = importlib.import_module(module_name).WATCH_FOLDER_PATH_STR
+            if not messagebox.askokcancel("Arquivar E-mails (Pasta Padrão)",
+                                          f"Arquivar os arquivos da pasta padrão?\n{watch_folder}", parent=self.root):
+                return None
+            return [watch_folder]
+
+        if module_name == "pastas_diff":
+            folder1 = filedialog.askdirectory(title="Selecione a Primeira Pasta (Base para Logs e Relatório)", parent=self.root)
+            if not folder1:
+                return None
+            folder2 = filedialog.askdirectory(title="Selecione a Segunda Pasta", parent=self.root)
+            if not folder2:
+                return None
+            return [folder1, folder2]
+
+        folder = filedialog.askdirectory(title="Selecione a pasta", parent=self.root)
+        if not folder:
+            return None
+
+        if module_name == "relatorio_mensagens":
+            start = simpledialog.askinteger("Número Inicial", "Número inicial do intervalo:", parent=self.root)
+            if start is None:
+                return None
+            end = simpledialog.askinteger("Número Final", "Número final do intervalo:", parent=self.root)
+            if end is None:
+                return None
+            argv = [folder, "--inicio", str(start), "--fim", str(end)]
+            if messagebox.askyesno("Unificar Relatórios", "Unificar relatórios da pasta pai após verificação?", parent=self.root):
+                argv.append("--unificar")
+            return argv
+
+        return [folder]
+
+    def cancel_selected_job(self):
+        """Solicita o cancelamento das execuções selecionadas no painel de progresso."""
+        for item_id in self.jobs_tree.selection():
+            self.job_runner.cancel(int(item_id))
+            self.jobs_tree.set(item_id, "status", "Cancelando")
+
+    def poll_results(self):
+        """Aplica no painel os eventos de progresso e os resultados enviados pelas threads de trabalho."""
+        try:
+            while True:
+                event = self.job_runner.events.get_nowait()
+                kind, job_id = event[0], str(event[1])
+                if kind == "progress":
+                    self.update_job_row(job_id, event[2])
+                else:  # "done"
+                    self.jobs_tree.set(job_id, "status", event[2])
+                    self.append_result(event[3])
+        except queue.Empty:
+            pass
+        self.root.after(RESULT_POLL_INTERVAL_MS, self.poll_results)
+
+    def update_job_row(self, job_id: str, snapshot: dict):
+        """Atualiza a linha de uma execução com o último evento de progresso."""
+        scanned = snapshot["scanned"]
+        if snapshot["total"] is not None:
+            scanned = f"{scanned}/{snapshot['total']}"
+        status = snapshot["stage"] or "Executando"
+        if snapshot["cancelled"]:
+            status = "Cancelando"
+        self.jobs_tree.item(job_id, values=(
+            self.jobs_tree.set(job_id, "tool"), status, scanned, snapshot["moved"], snapshot["errors"],
+            f"{snapshot['files_per_second']:.1f}", format_eta(snapshot["eta_seconds"])))
+
+    def append_result(self, text: str):
+        """Acrescenta texto ao painel de resultados."""
+        self.results_text.config(state=tk.NORMAL)
+        self.results_text.insert(tk.END, text)
+        self.results_text.see(tk.END)
+        self.results_text.config(state=tk.DISABLED)
+
     def center_window(self):
         self.root.update_idletasks()
         window_width = self.root.winfo_width()
@@ -0,0 +1,125 @@
+import contextlib
+import gzip
+import json
+import os
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, NamedTuple, Optional, Union
+
+# --- Constantes ---
+MANIFEST_SUFFIX = ".manifesto.tsv.gz"
+MANIFEST_FORMAT = "#manifesto-pastas"
+MANIFEST_VERSION = 1
+MANIFEST_COMPRESSION_LEVEL = 6
+MANIFEST_TEMP_SUFFIX = ".tmp"
+# Nomes com bytes que não são UTF-8 (no POSIX chegam como surrogates) são gravados e lidos byte a byte
+MANIFEST_ENCODING_ERRORS = "surrogateescape"
+# --- Fim Constantes ---
+
+PathType = Union[str, os.PathLike]
+
+# Tabulação, quebra de linha e barra invertida em nomes de arquivo são escapadas no TSV
+_ESCAPES = {"\\": "\\\\", "\t": "\\t", "\n": "\\n", "\r": "\\r"}
+_UNESCAPES = {"\\": "\\", "t": "\t", "n": "\n", "r": "\r"}
+
+
+class ManifestEntry(NamedTuple):
+    """Um arquivo do manifesto: caminho relativo (com '/'), tamanho, data de modificação e SHA-256 opcional."""
+    path: str
+    size: int
+    mtime_ns: int
+    sha256: Optional[str]
+
+
+def _escape(text: str) -> str:
+    if not any(char in text for char in _ESCAPES):
+        return text
+    return "".join(_ESCAPES.get(char, char) for char in text)
+
+
+def _unescape(text: str) -> str:
+    if "\\" not in text:
+        return text
+    chars = []
+    iterator = iter(text)
+    for char in iterator:
+        chars.append(_UNESCAPES.get(next(iterator, ""), "") if char == "\\" else char)
+    return "".join(chars)
+
+
+def is_manifest_path(path: PathType) -> bool:
+    """Indica se `path` é um arquivo de manifesto (`*.manifesto.tsv.gz`)."""
+    return os.fspath(path).lower().endswith(MANIFEST_SUFFIX) and os.path.isfile(path)
+
+
+def write_manifest(manifest_path: PathType, source_folder: PathType, entries: Iterable[ManifestEntry]) -> int:
+    """
+    Grava o manifesto de uma pasta: TSV compactado com gzip, uma linha por arquivo, ordenado por
+    caminho. A primeira linha identifica o formato e traz os metadados em JSON. O arquivo é
+    gravado com nome temporário e renomeado no fim. Retorna quantos arquivos foram gravados.
+    """
+    sorted_entries = sorted(entries)
+    metadata: Dict[str, Any] = {
+        "source_folder": os.fspath(source_folder),
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "file_count": len(sorted_entries),
+        "hashed": any(entry.sha256 for entry in sorted_entries),
+    }
+    temp_path = os.fspath(manifest_path) + MANIFEST_TEMP_SUFFIX
+    try:
+        with gzip.open(temp_path, "wt", encoding="utf-8", errors=MANIFEST_ENCODING_ERRORS, newline="\n",
+                       compresslevel=MANIFEST_COMPRESSION_LEVEL) as f:
+            f.write(f"{MANIFEST_FORMAT}\t{MANIFEST_VERSION}\t{json.dumps(metadata, ensure_ascii=False)}\n")
+            for entry in sorted_entries:
+                f.write(f"{_escape(entry.path)}\t{entry.size}\t{entry.mtime_ns}\t{entry.sha256 or ''}\n")
+        os.replace(temp_path, manifest_path)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.remove(temp_path)
+        raise
+    return len(sorted_entries)
+
+
+def read_manifest_metadata(manifest_path: PathType) -> Dict[str, Any]:
+    """Lê só a linha de identificação do manifesto. Levanta ValueError se o formato não for reconhecido."""
+    with gzip.open(manifest_path, "rt", encoding="utf-8", errors=MANIFEST_ENCODING_ERRORS, newline="\n") as f:
+        return _parse_header(f.readline())
+
+
+def _parse_header(line: str) -> Dict[str, Any]:
+    parts = line.rstrip("\n").split("\t", 2)
+    if len(parts) != 3 or parts[0] != MANIFEST_FORMAT:
+        raise ValueError("Arquivo não é um manifesto de pastas.")
+    if parts[1] != str(MANIFEST_VERSION):
+        raise ValueError(f"Versão de manifesto não suportada: {parts[1]}")
+    return json.loads(parts[2])
+
+
+def read_manifest(manifest_path: PathType) -> Iterator[ManifestEntry]:
+    """
+    Percorre os arquivos do manifesto, em ordem de caminho, sem carregá-lo inteiro na memória.
+    Levanta ValueError se o formato não for reconhecido ou se uma linha estiver corrompida.
+    """
+    with gzip.open(manifest_path, "rt", encoding="utf-8", errors=MANIFEST_ENCODING_ERRORS, newline="\n") as f:
+        _parse_header(f.readline())
+        for line_number, line in enumerate(f, start=2):
+            parts = line.rstrip("\n").split("\t")
+            if len(parts) != 4:
+                raise ValueError(f"Linha {line_number} do manifesto inválida.")
+            yield ManifestEntry(_unescape(parts[0]), int(parts[1]), int(parts[2]), parts[3] or None)
+
+
+def manifest_display_name(manifest_path: PathType) -> str:
+    """Nome usado nos relatórios: o caminho do manifesto e a pasta de origem registrada nele."""
+    try:
+        source_folder = read_manifest_metadata(manifest_path).get("source_folder")
+    except (OSError, ValueError):
+        source_folder = None
+    name = os.fspath(manifest_path)
+    return f"{name} (manifesto de {source_folder})" if source_folder else name
+
+
+def default_manifest_path(folder: PathType) -> Path:
+    """Nome sugerido para o manifesto de uma pasta: `<pasta>_AAAAMMDD.manifesto.tsv.gz`, ao lado dela."""
+    folder_path = Path(folder).resolve()
+    return folder_path.parent / f"{folder_path.name}_{datetime.now().strftime('%Y%m%d')}{MANIFEST_SUFFIX}"
@@ -0,0 +1,130 @@
+import bisect
+import json
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, TypeVar
+
+# --- Constantes ---
+# Etapas medidas em cada execução dos arquivadores
+STAGE_LISTING = "listing"            # Listagem das pastas
+STAGE_HEADER_PARSE = "header_parse"  # Leitura e interpretação dos cabeçalhos do .eml
+STAGE_DATE_PARSE = "date_parse"      # Interpretação da data (cabeçalho Date ou data de modificação)
+STAGE_SANITIZE = "sanitize"          # Sanitização e truncamento do nome
+STAGE_CONFLICT = "conflict"          # Resolução de nomes duplicados no destino
+STAGE_MOVE = "move"                  # Movimentação/renomeação no disco
+# Limites superiores (em milissegundos) das faixas do histograma de latência por arquivo
+LATENCY_BUCKETS_MS = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000]
+METRICS_FILENAME_PREFIX = "metrics_"
+# --- Fim Constantes ---
+
+T = TypeVar("T")
+
+
+class RunMetrics:
+    """
+    Métricas estruturadas de uma execução: tempo acumulado por etapa, contadores de
+    arquivos e bytes e histograma da latência por arquivo.
+
+    Ao final da execução, `write_json` grava tudo em um arquivo JSON na pasta de logs,
+    para identificar onde o tempo é gasto nos compartilhamentos mais lentos.
+    """
+
+    def __init__(self, tool: str):
+        self.tool = tool
+        self.started_at = datetime.now()
+        self._start_time = time.perf_counter()
+        self.stage_seconds: Dict[str, float] = {}
+        self.stage_calls: Dict[str, int] = {}
+        self.counters: Dict[str, int] = {}
+        # Uma posição por faixa de LATENCY_BUCKETS_MS, mais a faixa "acima do último limite"
+        self.latency_histogram: List[int] = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        self.latency_total_seconds = 0.0
+        self.latency_max_seconds = 0.0
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """Mede o tempo gasto no bloco e o acumula na etapa `name`."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_stage_time(name, time.perf_counter() - start)
+
+    def add_stage_time(self, name: str, seconds: float) -> None:
+        """Acumula `seconds` na etapa `name`."""
+        self.stage_seconds[name] = self.stage_seconds.get(name, 0.0) + seconds
+        self.stage_calls[name] = self.stage_calls.get(name, 0) + 1
+
+    def timed_iter(self, iterable: Iterable[T], name: str = STAGE_LISTING) -> Iterator[T]:
+        """
+        Percorre `iterable` contabilizando na etapa `name` apenas o tempo gasto para obter
+        cada item (útil para iterdir/os.walk, cuja listagem acontece sob demanda).
+        """
+        iterator = iter(iterable)
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                self.add_stage_time(name, time.perf_counter() - start)
+                return
+            self.add_stage_time(name, time.perf_counter() - start)
+            yield item
+
+    def increment(self, counter: str, amount: int = 1) -> None:
+        """Incrementa um contador (ex.: 'files_scanned', 'bytes_moved')."""
+        self.counters[counter] = self.counters.get(counter, 0) + amount
+
+    @contextmanager
+    def measure_file(self) -> Iterator[None]:
+        """Mede a latência total do processamento de um arquivo e a registra no histograma."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record_file_latency(time.perf_counter() - start)
+
+    def record_file_latency(self, seconds: float) -> None:
+        """Registra a latência de um arquivo no histograma."""
+        self.latency_histogram[bisect.bisect_left(LATENCY_BUCKETS_MS, seconds * 1000)] += 1
+        self.latency_total_seconds += seconds
+        self.latency_max_seconds = max(self.latency_max_seconds, seconds)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Retorna as métricas em formato serializável (JSON)."""
+        files_measured = sum(self.latency_histogram)
+        histogram = {f"<={limit}ms": count for limit, count in zip(LATENCY_BUCKETS_MS, self.latency_histogram)}
+        histogram[f">{LATENCY_BUCKETS_MS[-1]}ms"] = self.latency_histogram[-1]
+        return {
+            "tool": self.tool,
+            "started_at": self.started_at.isoformat(timespec="seconds"),
+            "elapsed_seconds": time.perf_counter() - self._start_time,
+            "stages": {
+                name: {"seconds": seconds, "calls": self.stage_calls[name]}
+                for name, seconds in self.stage_seconds.items()
+            },
+            "counters": dict(self.counters),
+            "file_latency": {
+                "files": files_measured,
+                "mean_ms": self.latency_total_seconds * 1000 / files_measured if files_measured else 0.0,
+                "max_ms": self.latency_max_seconds * 1000,
+                "histogram": histogram,
+            },
+        }
+
+    def write_json(self, folder: Path) -> Optional[Path]:
+        """
+        Grava as métricas em `folder` (normalmente a pasta de logs) e retorna o caminho do arquivo.
+        Retorna None se a gravação falhar: as métricas nunca interrompem o processamento.
+        """
+        timestamp = self.started_at.strftime("%Y%m%d%H%M%S")
+        metrics_path = Path(folder) / f"{METRICS_FILENAME_PREFIX}{self.tool}_{timestamp}.json"
+        try:
+            metrics_path.parent.mkdir(parents=True, exist_ok=True)
+            with metrics_path.open("w", encoding="utf-8") as f:
+                json.dump(self.to_dict(), f, indent=2)
+        except OSError:
+            return None
+        return metrics_path
@@ -1,26 +1,311 @@
+import argparse
+import contextlib
+import hashlib
+import json
 import os
-import tkinter as tk_module # Alias para evitar conflitos
-from tkinter import filedialog, messagebox
+import queue
+import re
+import sqlite3
+import sys
+import time
 import logging
+from collections import defaultdict
+from concurrent.futures import Future, ThreadPoolExecutor
 from datetime import datetime
+from fnmatch import fnmatchcase
 from pathlib import Path
-from typing import Optional, Set, List
+from typing import Any, Dict, NamedTuple, Optional, Set, List, Tuple
+
+from digestos_pastas import (DIGEST_STORE_FILENAME, RACY_WINDOW_NS, UNTRUSTED_MTIME, DirectoryDigestStore,
+                             DirectoryRecord, files_digest, is_digest_store_name, roll_up)
+from empacotar_meses import PACK_EXTENSION, is_pack_name, pack_path_for, read_pack_index, read_packed_file
+from manifesto_pastas import (ManifestEntry, default_manifest_path, is_manifest_path, manifest_display_name,
+                              read_manifest, write_manifest)
+from progresso import ProgressReporter
+from registro import close_logger, setup_file_logger
 
 # --- Constantes ---
 LOG_FOLDER_NAME = "ERROS"
 LOG_FILENAME_PREFIX = "comparison_failures_"
+# Pastas listadas ao mesmo tempo (os.scandir em threads); em compartilhamentos de rede o tempo é
+# dominado pela latência de cada listagem, não pela CPU
+DEFAULT_WALK_WORKERS = 16
+# Bytes iniciais resumidos para descartar candidatos a "movido" antes de ler arquivos inteiros
+QUICK_HASH_SIZE = 64 * 1024
+HASH_CHUNK_SIZE = 1024 * 1024
 # --- Fim Constantes ---
 
+# Pastas de ano e de mês criadas pelos arquivadores (`AAAA/AAAA-MM`)
+_YEAR_FOLDER_RE = re.compile(r"^\d{4}$")
+_MONTH_FOLDER_RE = re.compile(r"^\d{4}-\d{2}$")
+
+# Arquivo de dentro de um pacote do empacotar_meses: (caminho do pacote, membro do índice)
+PackedMember = Tuple[str, Dict[str, Any]]
+
+
+def _could_contain(pattern_parts: List[str], folder_parts: List[str]) -> bool:
+    """
+    Indica se algum caminho dentro da pasta pode casar com o padrão, comparando parte a parte.
+    Uma parte com '*' pode abranger várias pastas, então daí em diante tudo é possível; se a pasta
+    já casa com o padrão inteiro, tudo dentro dela também entra.
+    """
+    for index, folder_part in enumerate(folder_parts):
+        if index >= len(pattern_parts) or "*" in pattern_parts[index]:
+            return True
+        if not fnmatchcase(folder_part, pattern_parts[index]):
+            return False
+    return True
+
+
+class ComparisonScope:
+    """
+    Restringe a comparação a parte das pastas: padrões de inclusão e de exclusão (glob sobre o
+    caminho relativo com '/', sem diferenciar maiúsculas; '*' também abrange '/'), uma janela de
+    meses no formato dos arquivadores (pastas `AAAA/AAAA-MM`) e uma profundidade máxima de subpastas.
+    As regras de pasta são aplicadas durante a listagem: uma subpasta fora do escopo nunca é listada.
+
+    Um arquivo entra se ele ou uma das pastas acima dele casar com um padrão de inclusão, e sai se
+    casar com um de exclusão (uma pasta excluída leva tudo o que contém). Com a janela de meses, só
+    entram arquivos de pastas `AAAA-MM` dentro dela; pastas `AAAA` e `AAAA-MM` fora dela não são listadas.
+    """
+    def __init__(self, include: Optional[List[str]] = None, exclude: Optional[List[str]] = None,
+                 first_month: Optional[str] = None, last_month: Optional[str] = None,
+                 max_depth: Optional[int] = None):
+        self.include = [pattern.strip("/").lower() for pattern in include or []]
+        self.exclude = [pattern.strip("/").lower() for pattern in exclude or []]
+        self.first_month = first_month  # "AAAA-MM" (comparação de texto basta nesse formato)
+        self.last_month = last_month
+        self.max_depth = max_depth
+        self._include_parts = [pattern.split("/") for pattern in self.include]
+
+    @property
+    def active(self) -> bool:
+        """Indica se alguma restrição foi definida."""
+        return bool(self.include or self.exclude or self._has_month_window or self.max_depth is not None)
+
+    @property
+    def _has_month_window(self) -> bool:
+        return self.first_month is not None or self.last_month is not None
+
+    def _in_month_window(self, year_month: str) -> bool:
+        return ((self.first_month is None or year_month >= self.first_month)
+                and (self.last_month is None or year_month <= self.last_month))
+
+    def _in_year_window(self, year: str) -> bool:
+        return ((self.first_month is None or year >= self.first_month[:4])
+                and (self.last_month is None or year <= self.last_month[:4]))
+
+    def allows_folder(self, folder_prefix: str) -> bool:
+        """Indica se a subpasta (prefixo relativo terminado em '/') deve ser listada."""
+        folder_parts = folder_prefix[:-1].lower().split("/")
+        if self.max_depth is not None and len(folder_parts) > self.max_depth:
+            return False
+        name = folder_parts[-1]
+        if self._has_month_window:
+            if _YEAR_FOLDER_RE.match(name) and not self._in_year_window(name):
+                return False
+            if _MONTH_FOLDER_RE.match(name) and not self._in_month_window(name):
+                return False
+        folder_path = "/".join(folder_parts)
+        if any(fnmatchcase(folder_path, pattern) for pattern in self.exclude):
+            return False
+        return not self._include_parts or any(
+            _could_contain(pattern_parts, folder_parts) for pattern_parts in self._include_parts)
+
+    def allows_file(self, relative_path: str) -> bool:
+        """Indica se o arquivo entra na comparação (as pastas acima dele já passaram por allows_folder)."""
+        path = relative_path.lower()
+        parts = path.split("/")
+        if self.max_depth is not None and len(parts) - 1 > self.max_depth:
+            return False
+        if self._has_month_window and not any(
+                _MONTH_FOLDER_RE.match(part) and self._in_month_window(part) for part in parts[:-1]):
+            return False
+        if any(fnmatchcase(path, pattern) for pattern in self.exclude):
+            return False
+        return not self.include or any(
+            fnmatchcase("/".join(parts[:length]), pattern)
+            for length in range(1, len(parts) + 1) for pattern in self.include)
+
+    def includes(self, relative_path: str) -> bool:
+        """Verificação completa (pastas acima e arquivo), para os caminhos de um manifesto, que não é percorrido."""
+        parts = relative_path.split("/")
+        return (all(self.allows_folder("/".join(parts[:length]) + "/") for length in range(1, len(parts)))
+                and self.allows_file(relative_path))
+
+    def describe(self) -> str:
+        """Descrição do escopo para o relatório."""
+        rules: List[str] = []
+        if self.include:
+            rules.append(f"incluir {', '.join(self.include)}")
+        if self.exclude:
+            rules.append(f"excluir {', '.join(self.exclude)}")
+        if self._has_month_window:
+            rules.append(f"meses {self.first_month or 'início'} a {self.last_month or 'fim'}")
+        if self.max_depth is not None:
+            rules.append(f"profundidade máxima {self.max_depth}")
+        return "; ".join(rules) if rules else "pastas inteiras"
+
+
+class _DirectoryListing(NamedTuple):
+    """Resultado da listagem de uma pasta: arquivos (caminhos relativos), subpastas e erros."""
+    files: List[str]
+    subfolders: List[Tuple[str, str]]  # (caminho completo, prefixo relativo terminado em '/')
+    errors: List[str]
+    packed: Dict[str, PackedMember]  # Caminho relativo -> membro, para os arquivos empacotados
+    stats: Dict[str, Tuple[int, int]]  # Caminho relativo -> (tamanho, mtime_ns), só se pedido
+
+
+def _list_directory(folder_path: str, prefix: str, with_stats: bool = False,
+                    scope: Optional[ComparisonScope] = None) -> _DirectoryListing:
+    """
+    Lista uma pasta com os.scandir. Os caminhos relativos são montados concatenando o prefixo
+    da pasta (sem os.path.relpath). Como no os.walk, links simbólicos para pastas não são
+    percorridos. Os pacotes do empacotar_meses são expandidos nos arquivos que contêm.
+    Com `with_stats`, guarda também tamanho e data de modificação de cada arquivo. Com `scope`,
+    subpastas, pacotes e arquivos fora do escopo ficam de fora.
+    """
+    files: List[str] = []
+    subfolders: List[Tuple[str, str]] = []
+    errors: List[str] = []
+    packed: Dict[str, PackedMember] = {}
+    stats: Dict[str, Tuple[int, int]] = {}
+    folder_name = os.path.basename(folder_path)
+    try:
+        with os.scandir(folder_path) as entries:
+            for entry in entries:
+                name = entry.name
+                try:
+                    is_dir = entry.is_dir()
+                except OSError:
+                    is_dir = False
+                if is_dir:
+                    subfolder_prefix = f"{prefix}{name}/"
+                    if not entry.is_symlink() and (scope is None or scope.allows_folder(subfolder_prefix)):
+                        subfolders.append((entry.path, subfolder_prefix))
+                    continue
+                if name.lower() == ".ffs_db":  # Exclusão específica
+                    continue
+                if prefix == f"{LOG_FOLDER_NAME}/" and is_digest_store_name(name):
+                    continue  # Registro de digestos do próprio pastas_diff (fica na pasta 1)
+                if is_pack_name(name, folder_name):
+                    # Mês empacotado (empacotar_meses): lista os arquivos de dentro do pacote.
+                    # O índice lateral não é listado; um pacote ilegível aparece como arquivo comum.
+                    if not name.lower().endswith(PACK_EXTENSION):
+                        continue
+                    if scope is not None and not scope.allows_folder(f"{prefix}{name[:-len(PACK_EXTENSION)]}/"):
+                        continue  # Mês fora do escopo: o pacote nem é aberto
+                    if _list_packed_files(entry.path, prefix, files, errors, packed, scope):
+                        continue
+                relative_path = f"{prefix}{name}"
+                if scope is not None and not scope.allows_file(relative_path):
+                    continue
+                files.append(relative_path)
+                if with_stats:
+                    try:
+                        stat = entry.stat()
+                    except OSError:  # Link simbólico quebrado: usa os dados do próprio link
+                        stat = entry.stat(follow_symlinks=False)
+                    stats[relative_path] = (stat.st_size, stat.st_mtime_ns)
+    except OSError as e:
+        errors.append(f"Erro ao listar arquivos em {folder_path}: {e}")
+    if with_stats:
+        stats.update({relative_path: (member["size"], member["mtime_ns"])
+                      for relative_path, (_pack_path, member) in packed.items()})
+    return _DirectoryListing(files, subfolders, errors, packed, stats)
+
+
+def _list_packed_files(pack_path: str, prefix: str, files: List[str], errors: List[str],
+                       packed: Dict[str, PackedMember], scope: Optional[ComparisonScope] = None) -> bool:
+    """
+    Acrescenta os arquivos de um pacote `AAAA/AAAA-MM.zip` como se ainda estivessem na pasta
+    `AAAA/AAAA-MM`, para que uma árvore empacotada e outra não se comparem normalmente.
+    Retorna False (registrando o erro) se o pacote não puder ser lido.
+    """
+    month_name = os.path.basename(pack_path)[:-len(PACK_EXTENSION)]
+    try:
+        members = read_pack_index(pack_path_for(Path(pack_path).parent / month_name))
+    except Exception as e_pack:
+        errors.append(f"Erro ao ler o pacote {pack_path}: {e_pack}")
+        return False
+    for member in members:
+        relative_path = f"{prefix}{month_name}/{member['name']}"
+        if scope is not None and not scope.allows_file(relative_path):
+            continue
+        files.append(relative_path)
+        packed[relative_path] = (pack_path, member)
+    return True
+
+
+def _digest_directory(folder_path: str, prefix: str, cached: Optional[DirectoryRecord],
+                      racy_limit_ns: int) -> Tuple[DirectoryRecord, Optional[_DirectoryListing]]:
+    """
+    Retorna o registro da pasta: o guardado, se a data de modificação da pasta não mudou (um
+    único stat, sem listar), ou um novo, listando a pasta (a listagem volta junto para ser
+    reaproveitada). Pastas modificadas há pouco ou listadas com erro não têm o registro confiável.
+    """
+    mtime_ns = os.stat(folder_path).st_mtime_ns
+    if cached is not None and cached.mtime_ns == mtime_ns:
+        return cached, None
+    listing = _list_directory(folder_path, prefix, with_stats=True)
+    trusted = not listing.errors and mtime_ns < racy_limit_ns
+    record = DirectoryRecord(
+        mtime_ns if trusted else UNTRUSTED_MTIME, len(listing.files),
+        files_digest((relative_path, *listing.stats[relative_path])
+                     for relative_path in listing.files if relative_path in listing.stats),
+        tuple(subfolder_prefix[len(prefix):-1] for _, subfolder_prefix in listing.subfolders))
+    return record, listing
+
+
+def _digest_file(file_path: str, limit: Optional[int] = None) -> str:
+    """SHA-256 do arquivo inteiro ou só dos primeiros `limit` bytes."""
+    digest = hashlib.sha256()
+    remaining = limit
+    with open(file_path, "rb") as f:
+        while remaining is None or remaining > 0:
+            chunk = f.read(HASH_CHUNK_SIZE if remaining is None else min(HASH_CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            digest.update(chunk)
+            if remaining is not None:
+                remaining -= len(chunk)
+    return digest.hexdigest()
+
 class FolderComparer:
     """
     Compara o conteúdo de duas pastas (incluindo subpastas) e gera um relatório
-    listando os arquivos exclusivos de cada uma.
+    listando os arquivos exclusivos de cada uma. Qualquer uma das pastas pode ser
+    substituída por um manifesto (`*.manifesto.tsv.gz`) exportado antes por `export_manifest`.
     """
-    def __init__(self):
+    def __init__(self, progress: Optional[ProgressReporter] = None, walk_workers: int = DEFAULT_WALK_WORKERS,
+                 detect_moved: bool = True, use_digests: bool = True, scope: Optional[ComparisonScope] = None):
+        self.progress: ProgressReporter = progress or ProgressReporter()
+        self.walk_workers = max(walk_workers, 1)
+        self.detect_moved = detect_moved
+        self.use_digests = use_digests
+        # Parte das pastas a comparar (None: pastas inteiras)
+        self.scope: Optional[ComparisonScope] = scope if scope is not None and scope.active else None
         self.folder1: Optional[Path] = None
         self.folder2: Optional[Path] = None
         self.log_file_path: Optional[Path] = None # Caminho completo do arquivo de log
         self.logger: logging.Logger = self._setup_initial_logger()
+        # Resultado da última comparação (preenchido por compare_folders)
+        self.only_in_folder1: List[str] = []
+        self.only_in_folder2: List[str] = []
+        self.moved_files: List[Tuple[str, str]] = []  # (caminho na pasta 1, caminho na pasta 2), mesmo conteúdo
+        self.common_files_count: int = 0
+        # Subpastas idênticas nos dois lados (mesmo digesto), não listadas, e quantos arquivos têm
+        self.pruned_folders_count: int = 0
+        self.pruned_files_count: int = 0
+        # Arquivos empacotados de cada pasta listada (para ler tamanho e conteúdo de dentro do pacote)
+        self._packed_members: List[Dict[str, PackedMember]] = []
+        # Entradas de cada lado que é um manifesto (None para pastas)
+        self._manifest_entries: List[Optional[Dict[str, ManifestEntry]]] = []
+        # Tamanho e mtime_ns de cada arquivo, quando a listagem os pede (exportação de manifesto)
+        self._file_stats: List[Dict[str, Tuple[int, int]]] = []
+        self.manifest_path: Optional[Path] = None
+        self.manifest_file_count: int = 0
+        self.report_path: Optional[Path] = None
 
     def _setup_initial_logger(self) -> logging.Logger:
         """Configura o logger inicialmente sem um file handler."""
@@ -40,27 +325,20 @@ class FolderComparer:
             print("ERRO INTERNO: Tentativa de configurar log de arquivo sem a primeira pasta definida.")
             return
 
-        log_dir = self.folder1 / LOG_FOLDER_NAME
+        log_dir = self._output_folder() / LOG_FOLDER_NAME
         try:
             log_dir.mkdir(parents=True, exist_ok=True)
         except OSError as e:
             print(f"AVISO: Não foi possível criar a pasta de log '{log_dir}': {e}. Logs de erro não serão salvos em arquivo.")
             return # Não configura o file handler se a pasta não puder ser criada
 
-        # Remove handlers anteriores (especialmente o NullHandler)
-        for handler in self.logger.handlers[:]:
-            self.logger.removeHandler(handler)
-            if hasattr(handler, 'close'): # Fecha o handler se possível
-                handler.close()
-
         timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
         self.log_file_path = log_dir / f"{LOG_FILENAME_PREFIX}{timestamp}.log"
 
         try:
-            file_handler = logging.FileHandler(str(self.log_file_path), encoding='utf-8')
-            formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
-            file_handler.setFormatter(formatter)
-            self.logger.addHandler(file_handler)
+            # Substitui os handlers anteriores (especialmente o NullHandler); gravação em segundo plano
+            self.logger = setup_file_logger(self.logger.name, self.log_file_path, logging.ERROR,
+                                            '%(asctime)s - %(levelname)s - %(message)s')
         except Exception as e: # Captura qualquer exceção durante a configuração do handler
             print(f"AVISO: Não foi possível configurar o logger para o arquivo '{self.log_file_path}': {e}. "
                   "Logs de erro podem não ser salvos.")
@@ -68,8 +346,30 @@ class FolderComparer:
             if not self.logger.hasHandlers():
                 self.logger.addHandler(logging.NullHandler())
 
+    @staticmethod
+    def _describe(folder_path: Path) -> str:
+        """Como a pasta aparece no relatório (um manifesto mostra também a pasta de origem)."""
+        return manifest_display_name(folder_path) if is_manifest_path(folder_path) else str(folder_path)
+
+    def _output_folder(self) -> Path:
+        """Onde ficam relatório e logs: a primeira pasta ou, se ela for um manifesto, a pasta do manifesto."""
+        assert self.folder1 is not None
+        return self.folder1.parent if is_manifest_path(self.folder1) else self.folder1
+
+    def set_folders(self, folder1_str: str, folder2_str: Optional[str]) -> None:
+        """
+        Define as duas pastas (ou manifestos) a comparar, sem interface gráfica, e configura o log
+        de arquivo. Para exportar um manifesto basta a primeira.
+        """
+        self.folder1 = Path(folder1_str)
+        self._configure_file_logging()
+        self.folder2 = Path(folder2_str) if folder2_str else None
+
     def select_folders(self) -> bool:
         """Solicita ao usuário selecionar duas pastas via interface gráfica."""
+        import tkinter as tk_module # Importado apenas no modo gráfico
+        from tkinter import filedialog, messagebox
+
         root = tk_module.Tk()
         root.withdraw()
 
@@ -95,30 +395,300 @@ class FolderComparer:
 
     def _get_files_in_folder(self, folder_path: Path) -> Set[str]:
         """Obtém um conjunto de caminhos de arquivo relativos em uma pasta e suas subpastas."""
-        relative_files: Set[str] = set()
-        if not folder_path.is_dir(): # Verifica se o caminho é um diretório válido
-            self.logger.error(f"A pasta fornecida não existe ou não é um diretório: {folder_path}")
-            return relative_files
+        return self._get_files_in_folders([folder_path])[0]
 
+    def _get_files_in_folders(self, folder_paths: List[Path], with_stats: bool = False,
+                              skip_prefixes: Optional[Set[str]] = None,
+                              prelisted: Optional[List[Dict[str, _DirectoryListing]]] = None) -> List[Set[str]]:
+        """
+        Obtém, para cada pasta, o conjunto de caminhos relativos dos seus arquivos (com '/').
+        Todas as pastas são percorridas ao mesmo tempo: cada subpasta encontrada vira uma
+        listagem no pool de threads, e os resultados são reunidos nesta thread (progresso e log).
+        Um manifesto no lugar de uma pasta é lido em vez de percorrido. Subpastas em
+        `skip_prefixes` não são percorridas, e as já listadas em `prelisted` não são relistadas.
+        Fora do escopo (`self.scope`), subpastas não são listadas e arquivos não entram.
+        """
+        results: List[Set[str]] = [set() for _ in folder_paths]
+        self._packed_members = [{} for _ in folder_paths]
+        self._manifest_entries = [None for _ in folder_paths]
+        self._file_stats = [{} for _ in folder_paths]
+        completed: "queue.SimpleQueue[Tuple[int, Future]]" = queue.SimpleQueue()
+        outstanding = 0
+
+        with ThreadPoolExecutor(max_workers=self.walk_workers, thread_name_prefix="pastas_diff") as executor:
+            def submit(tree_index: int, folder_path: str, prefix: str) -> None:
+                nonlocal outstanding
+                if skip_prefixes and prefix in skip_prefixes:
+                    return
+                listing = prelisted[tree_index].get(prefix) if prelisted else None
+                if listing is not None:
+                    future: Future = Future()
+                    future.set_result(listing)
+                else:
+                    future = executor.submit(_list_directory, folder_path, prefix, with_stats, self.scope)
+                future.add_done_callback(lambda done: completed.put((tree_index, done)))
+                outstanding += 1
+
+            for tree_index, folder_path in enumerate(folder_paths):
+                if is_manifest_path(folder_path):
+                    results[tree_index] = self._load_manifest(tree_index, folder_path)
+                    continue
+                if not folder_path.is_dir(): # Verifica se o caminho é um diretório válido
+                    self.logger.error(f"A pasta fornecida não existe ou não é um diretório: {folder_path}")
+                    continue
+                submit(tree_index, str(folder_path), "")
+
+            while outstanding:
+                tree_index, future = completed.get()
+                outstanding -= 1
+                if self.progress.cancelled:
+                    continue  # Só espera as listagens em andamento terminarem
+                try:
+                    listing = future.result()
+                except Exception as e_walk:
+                    self.logger.error(f"Erro ao listar arquivos em {folder_paths[tree_index]}: {e_walk}")
+                    continue
+                results[tree_index].update(listing.files)
+                self._packed_members[tree_index].update(listing.packed)
+                self._file_stats[tree_index].update(listing.stats)
+                for error_msg in listing.errors:
+                    self.logger.error(error_msg)
+                self.progress.advance(count=len(listing.files))
+                for subfolder_path, subfolder_prefix in listing.subfolders:
+                    submit(tree_index, subfolder_path, subfolder_prefix)
+
+        return results
+
+    def _prune_identical_subtrees(self, folder_paths: List[Path]) -> Tuple[Set[str], List[Dict[str, _DirectoryListing]]]:
+        """
+        Descobre as subpastas idênticas nas duas pastas sem listá-las: cada pasta tem um registro
+        guardado (arquivos, tamanhos e datas resumidos em um digesto, e as subpastas) que vale
+        enquanto a data de modificação dela não muda, então só pastas alteradas são listadas.
+        Os digestos são combinados de baixo para cima (árvore de Merkle) e as duas árvores são
+        descidas juntas a partir da raiz: onde os digestos coincidem, a subárvore inteira é igual.
+
+        Retorna os prefixos das subárvores idênticas (a não percorrer) e as listagens feitas
+        aqui, para a listagem final não as repetir.
+        """
+        roots = [str(folder_path.resolve()) for folder_path in folder_paths]
+        records: List[Dict[str, DirectoryRecord]] = [{} for _ in folder_paths]
+        listings: List[Dict[str, _DirectoryListing]] = [{} for _ in folder_paths]
+        store = DirectoryDigestStore(self._output_folder() / LOG_FOLDER_NAME / DIGEST_STORE_FILENAME)
         try:
-            # os.walk é mantido pela sua robustez e conveniência com os.path.relpath
-            for root, _, filenames in os.walk(str(folder_path)):
-                for filename in filenames:
-                    if filename.lower() == ".ffs_db": # Exclusão específica
+            cached = [store.load_tree(root) for root in roots]
+            racy_limit_ns = time.time_ns() - RACY_WINDOW_NS
+            completed: "queue.SimpleQueue[Tuple[int, str, str, Future]]" = queue.SimpleQueue()
+            outstanding = 0
+
+            with ThreadPoolExecutor(max_workers=self.walk_workers, thread_name_prefix="pastas_diff") as executor:
+                def submit(tree_index: int, folder_path: str, prefix: str) -> None:
+                    nonlocal outstanding
+                    future = executor.submit(_digest_directory, folder_path, prefix,
+                                             cached[tree_index].get(prefix), racy_limit_ns)
+                    future.add_done_callback(lambda done: completed.put((tree_index, folder_path, prefix, done)))
+                    outstanding += 1
+
+                for tree_index, root in enumerate(roots):
+                    submit(tree_index, root, "")
+                while outstanding:
+                    tree_index, folder_path, prefix, future = completed.get()
+                    outstanding -= 1
+                    if self.progress.cancelled:
                         continue
-                    
-                    full_path_str = os.path.join(root, filename)
                     try:
-                        # os.path.relpath para obter o caminho relativo
-                        rel_path_str = os.path.relpath(full_path_str, str(folder_path))
-                        # Normaliza separadores para consistência entre OS
-                        relative_files.add(rel_path_str.replace(os.sep, '/'))
-                    except ValueError as e_relpath: # Caso raro, mas possível
-                        self.logger.error(f"Erro ao calcular caminho relativo para {full_path_str} a partir de {folder_path}: {e_relpath}")
-        except Exception as e_walk: # Captura erros durante o próprio os.walk
-            self.logger.error(f"Erro ao listar arquivos em {folder_path}: {e_walk}")
-        
-        return relative_files
+                        record, listing = future.result()
+                    except Exception as e_digest:
+                        self.logger.error(f"Erro ao verificar a pasta {folder_path}: {e_digest}")
+                        continue
+                    records[tree_index][prefix] = record
+                    if listing is not None:
+                        listings[tree_index][prefix] = listing
+                    self.progress.advance(count=record.file_count)
+                    for name in record.subfolders:
+                        submit(tree_index, os.path.join(folder_path, name), f"{prefix}{name}/")
+
+            if not self.progress.cancelled:
+                for root, tree_records in zip(roots, records):
+                    store.save_tree(root, tree_records)
+        except sqlite3.Error as e_store:
+            # Sem o registro das pastas, a comparação apenas lista tudo
+            self.logger.error(f"Erro no registro de digestos das pastas: {e_store}")
+        finally:
+            store.close()
+
+        rolled1, rolled2 = roll_up(records[0]), roll_up(records[1])
+        pruned: Set[str] = set()
+        pending = [""]
+        while pending:
+            prefix = pending.pop()
+            digest1, digest2 = rolled1.get(prefix), rolled2.get(prefix)
+            if digest1 is not None and digest1 == digest2:
+                pruned.add(prefix)
+                self.pruned_files_count += digest1[1]
+                continue
+            if prefix in records[0] and prefix in records[1]:
+                common_subfolders = set(records[0][prefix].subfolders) & set(records[1][prefix].subfolders)
+                pending.extend(f"{prefix}{name}/" for name in common_subfolders)
+        self.pruned_folders_count = len(pruned)
+        return pruned, listings
+
+    def _load_manifest(self, tree_index: int, manifest_path: Path) -> Set[str]:
+        """Lê um manifesto no lugar de uma pasta (caminhos, tamanhos e hashes registrados nele), só o que está no escopo."""
+        entries: Dict[str, ManifestEntry] = {}
+        try:
+            for entry in read_manifest(manifest_path):
+                if self.scope is None or self.scope.includes(entry.path):
+                    entries[entry.path] = entry
+        except (OSError, ValueError) as e:
+            # Manifesto ilegível: a comparação não pode prosseguir como se o lado estivesse vazio
+            raise RuntimeError(f"Não foi possível ler o manifesto {manifest_path}: {e}") from e
+        self._manifest_entries[tree_index] = entries
+        self.progress.advance(count=len(entries))
+        return set(entries)
+
+    def _file_size(self, tree_index: int, root: Path, relative_path: str) -> Optional[int]:
+        """Tamanho do arquivo (ou do membro do pacote, ou o registrado no manifesto); None se não puder ser lido."""
+        manifest_entries = self._manifest_entries[tree_index]
+        if manifest_entries is not None:
+            return manifest_entries[relative_path].size
+        packed = self._packed_members[tree_index].get(relative_path)
+        if packed is not None:
+            return packed[1]["size"]
+        try:
+            return os.stat(os.path.join(root, relative_path)).st_size
+        except OSError:
+            return None
+
+    def _file_digest(self, tree_index: int, root: Path, relative_path: str,
+                     limit: Optional[int] = None) -> Tuple[Optional[str], Optional[str]]:
+        """
+        Retorna (SHA-256, None) do arquivo ou dos seus primeiros `limit` bytes, ou (None, mensagem
+        de erro). De um manifesto só há o hash do arquivo inteiro, e só se ele foi exportado com
+        hashes; sem ele, retorna (None, None).
+        """
+        manifest_entries = self._manifest_entries[tree_index]
+        if manifest_entries is not None:
+            return (manifest_entries[relative_path].sha256 if limit is None else None), None
+        packed = self._packed_members[tree_index].get(relative_path)
+        try:
+            if packed is not None:
+                data = read_packed_file(Path(packed[0]), packed[1])
+                return hashlib.sha256(data if limit is None else data[:limit]).hexdigest(), None
+            return _digest_file(os.path.join(root, relative_path), limit), None
+        except Exception as e:
+            return None, f"Erro ao ler {relative_path} em {root}: {e}"
+
+    def _pair_moved_files(self, only_in_folder1: List[str], only_in_folder2: List[str]) -> List[Tuple[str, str]]:
+        """
+        Forma pares (pasta 1, pasta 2) de arquivos exclusivos com o mesmo conteúdo: o mesmo
+        arquivo em outro caminho (movido pelos arquivadores ou renomeado pelo renomear_eml).
+        Só arquivos com um tamanho que aparece dos dois lados são lidos; destes, primeiro os
+        QUICK_HASH_SIZE bytes iniciais e, só se coincidirem, o arquivo inteiro (em paralelo).
+        Arquivos vazios não são pareados. Cada arquivo entra em no máximo um par. Com um
+        manifesto, só o hash completo existe (e só se foi exportado com hashes), então os
+        candidatos são resumidos inteiros direto.
+        """
+        assert self.folder1 is not None and self.folder2 is not None
+        roots = [self.folder1, self.folder2]
+        sides = [only_in_folder1, only_in_folder2]
+
+        def digest_all(keys: List[Tuple[int, str]], limit: Optional[int]) -> Dict[Tuple[int, str], str]:
+            """Resume os arquivos em paralelo; falhas são registradas no log e o arquivo fica sem par."""
+            digests: Dict[Tuple[int, str], str] = {}
+            results = executor.map(lambda key: self._file_digest(key[0], roots[key[0]], key[1], limit), keys)
+            for key, (digest, error_msg) in zip(keys, results):
+                if self.progress.cancelled:
+                    break
+                self.progress.advance(count=1)
+                if error_msg is not None:
+                    self.logger.error(error_msg)
+                else:
+                    digests[key] = digest
+            return digests
+
+        def matched_on_both_sides(groups: Dict[Any, List[Tuple[int, str]]]) -> List[Tuple[int, str]]:
+            return [key for group in groups.values() if {side for side, _ in group} == {0, 1} for key in group]
+
+        with ThreadPoolExecutor(max_workers=self.walk_workers, thread_name_prefix="pastas_diff") as executor:
+            by_size: Dict[int, List[Tuple[int, str]]] = defaultdict(list)
+            for side_index, side in enumerate(sides):
+                sizes = executor.map(lambda rel, i=side_index: self._file_size(i, roots[i], rel), side)
+                for relative_path, size in zip(side, sizes):
+                    if size:  # Ignora vazios e ilegíveis
+                        by_size[size].append((side_index, relative_path))
+            sizes_by_key = {key: size for size, group in by_size.items() for key in group}
+
+            candidates = matched_on_both_sides(by_size)
+            self.progress.set_stage("Procurando arquivos movidos", total=len(candidates))
+            uses_manifest = any(entries is not None for entries in self._manifest_entries)
+            quick_digests: Dict[Tuple[int, str], str] = {}
+            if uses_manifest:
+                confirmed = candidates
+            else:
+                quick_digests = digest_all(candidates, QUICK_HASH_SIZE)
+                by_quick: Dict[Tuple[int, str], List[Tuple[int, str]]] = defaultdict(list)
+                for key, digest in quick_digests.items():
+                    by_quick[(sizes_by_key[key], digest)].append(key)
+                confirmed = matched_on_both_sides(by_quick)
+
+            # Arquivos pequenos já foram lidos inteiros no resumo inicial
+            to_confirm = [key for key in confirmed if uses_manifest or sizes_by_key[key] > QUICK_HASH_SIZE]
+            full_digests = digest_all(to_confirm, None)
+
+        by_content: Dict[Tuple[int, str], List[Tuple[int, str]]] = defaultdict(list)
+        for key in confirmed:
+            digest = full_digests.get(key) if key in full_digests else quick_digests.get(key)
+            if digest is not None:
+                by_content[(sizes_by_key[key], digest)].append(key)
+
+        pairs: List[Tuple[str, str]] = []
+        for group in by_content.values():
+            side1 = sorted(relative_path for side, relative_path in group if side == 0)
+            side2 = sorted(relative_path for side, relative_path in group if side == 1)
+            pairs.extend(zip(side1, side2))
+        return sorted(pairs)
+
+    def export_manifest(self, folder_path: Path, manifest_path: Optional[Path] = None,
+                        with_hash: bool = False) -> Optional[Path]:
+        """
+        Grava o manifesto de `folder_path` (caminho relativo, tamanho, data de modificação e,
+        com `with_hash`, SHA-256 de cada arquivo), para compará-lo depois sem a pasta montada.
+        Retorna o caminho do manifesto, ou None se a exportação foi cancelada ou falhou.
+        """
+        manifest_path = Path(manifest_path) if manifest_path else default_manifest_path(folder_path)
+        self.progress.start(stage="Listando pasta")
+        files = self._get_files_in_folders([folder_path], with_stats=True)[0]
+        stats = self._file_stats[0]
+        hashes: Dict[str, str] = {}
+        if with_hash and not self.progress.cancelled:
+            relative_paths = sorted(files)
+            self.progress.set_stage("Calculando hashes", total=len(relative_paths))
+            with ThreadPoolExecutor(max_workers=self.walk_workers, thread_name_prefix="pastas_diff") as executor:
+                results = executor.map(lambda rel: self._file_digest(0, folder_path, rel), relative_paths)
+                for relative_path, (digest, error_msg) in zip(relative_paths, results):
+                    if self.progress.cancelled:
+                        break
+                    self.progress.advance(count=1)
+                    if error_msg is not None:
+                        self.logger.error(error_msg)
+                    elif digest is not None:
+                        hashes[relative_path] = digest
+        self.progress.finish()
+        if self.progress.cancelled:
+            return None
+
+        try:
+            self.manifest_file_count = write_manifest(
+                manifest_path, folder_path.resolve(),
+                (ManifestEntry(rel, *stats[rel], hashes.get(rel)) for rel in files if rel in stats))
+        except (OSError, UnicodeError) as e:
+            # UnicodeError: nome de arquivo que nem o surrogateescape representa (ex.: surrogate isolado no NTFS)
+            self.logger.error(f"Erro ao gravar o manifesto {manifest_path}: {e}")
+            print(f"ERRO: Não foi possível gravar o manifesto '{manifest_path}': {e}")
+            return None
+        print(f"Manifesto salvo em: {manifest_path}")
+        self.manifest_path = manifest_path
+        return manifest_path
 
     def compare_folders(self) -> str:
         """Compara os arquivos entre as duas pastas e gera uma string de relatório."""
@@ -126,23 +696,55 @@ class FolderComparer:
             # Esta verificação deve ser feita pelo método chamador (run)
             return "ERRO: As duas pastas não foram selecionadas."
             
-        print(f"Comparando pastas:\nPasta 1: {self.folder1}\nPasta 2: {self.folder2}")
+        print(f"Comparando pastas:\nPasta 1: {self._describe(self.folder1)}\nPasta 2: {self._describe(self.folder2)}")
         
         try:
-            files1 = self._get_files_in_folder(self.folder1)
-            files2 = self._get_files_in_folder(self.folder2)
+            self.pruned_folders_count = self.pruned_files_count = 0
+            skip_prefixes: Optional[Set[str]] = None
+            prelisted: Optional[List[Dict[str, _DirectoryListing]]] = None
+            # Os digestos valem para pastas inteiras; com escopo, a listagem já é restrita
+            if self.use_digests and self.scope is None and not is_manifest_path(self.folder1) and not is_manifest_path(self.folder2) \
+                    and self.folder1.is_dir() and self.folder2.is_dir():
+                self.progress.start(stage="Verificando pastas")
+                skip_prefixes, prelisted = self._prune_identical_subtrees([self.folder1, self.folder2])
+                self.progress.set_stage("Listando pastas")
+            else:
+                self.progress.start(stage="Listando pastas")
+            files1, files2 = self._get_files_in_folders([self.folder1, self.folder2],
+                                                        skip_prefixes=skip_prefixes, prelisted=prelisted)
+            if self.progress.cancelled:
+                self.progress.finish()
+                return "ERRO NA COMPARAÇÃO: Comparação cancelada pelo usuário."
             
             only_in_folder1 = sorted(list(files1 - files2)) # Ordena para saída consistente
             only_in_folder2 = sorted(list(files2 - files1)) # Ordena
             common_files = files1.intersection(files2)
+
+            moved_files: List[Tuple[str, str]] = []
+            if self.detect_moved and only_in_folder1 and only_in_folder2:
+                moved_files = self._pair_moved_files(only_in_folder1, only_in_folder2)
+                moved1 = {path1 for path1, _ in moved_files}
+                moved2 = {path2 for _, path2 in moved_files}
+                only_in_folder1 = [path for path in only_in_folder1 if path not in moved1]
+                only_in_folder2 = [path for path in only_in_folder2 if path not in moved2]
+            self.progress.finish()
+            if self.progress.cancelled:
+                return "ERRO NA COMPARAÇÃO: Comparação cancelada pelo usuário."
+
+            self.only_in_folder1 = only_in_folder1
+            self.only_in_folder2 = only_in_folder2
+            self.moved_files = moved_files
+            # Arquivos das subpastas idênticas não listadas contam como comuns
+            self.common_files_count = len(common_files) + self.pruned_files_count
             
             timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
             report_lines: List[str] = [
                 f"RELATÓRIO DE COMPARAÇÃO DE PASTAS - {timestamp}",
-                f"\nPasta 1: {self.folder1}",
-                f"Pasta 2: {self.folder2}",
-                f"\nTotal de arquivos na Pasta 1 (considerados): {len(files1)}",
-                f"Total de arquivos na Pasta 2 (considerados): {len(files2)}",
+                f"\nPasta 1: {self._describe(self.folder1)}",
+                f"Pasta 2: {self._describe(self.folder2)}",
+                f"Escopo: {self.scope.describe() if self.scope else 'pastas inteiras'}",
+                f"\nTotal de arquivos na Pasta 1 (considerados): {len(files1) + self.pruned_files_count}",
+                f"Total de arquivos na Pasta 2 (considerados): {len(files2) + self.pruned_files_count}",
                 f"\n{'=' * 80}",
                 f"\nARQUIVOS EXCLUSIVOS DA PASTA 1 ({len(only_in_folder1)} arquivos):",
                 f"{'=' * 80}"
@@ -163,13 +765,25 @@ class FolderComparer:
                 report_lines.extend(only_in_folder2)
             else:
                 report_lines.append("Nenhum arquivo exclusivo encontrado.")
+
+            if self.detect_moved:
+                report_lines.extend([
+                    f"\n{'=' * 80}",
+                    f"\nARQUIVOS MOVIDOS OU RENOMEADOS - MESMO CONTEÚDO ({len(moved_files)} arquivos):",
+                    f"{'=' * 80}"
+                ])
+                if moved_files:
+                    report_lines.extend(f"{path1}  ->  {path2}" for path1, path2 in moved_files)
+                else:
+                    report_lines.append("Nenhum arquivo movido ou renomeado encontrado.")
                 
             report_lines.extend([
                 f"\n{'=' * 80}",
                 f"\nRESUMO:",
-                f"Arquivos em comum: {len(common_files)}",
+                f"Arquivos em comum: {self.common_files_count}",
                 f"Arquivos exclusivos da Pasta 1: {len(only_in_folder1)}",
                 f"Arquivos exclusivos da Pasta 2: {len(only_in_folder2)}",
+                f"Arquivos movidos ou renomeados: {len(moved_files)}",
                 f"{'=' * 80}"
             ])
             
@@ -189,12 +803,14 @@ class FolderComparer:
             
         timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
         # O relatório é salvo diretamente na folder1, não na subpasta de logs
-        report_file_path = self.folder1 / f"comparacao_pastas_{timestamp}.txt"
+        report_file_path = self._output_folder() / f"comparacao_pastas_{timestamp}.txt"
         
         try:
-            with report_file_path.open('w', encoding='utf-8') as f:
+            # Nomes com bytes que não são UTF-8 saem no relatório com os bytes originais, como no manifesto
+            with report_file_path.open('w', encoding='utf-8', errors='surrogateescape') as f:
                 f.write(report_content)
             print(f"Relatório salvo em: {report_file_path}")
+            self.report_path = report_file_path
             return report_file_path
         except (IOError, OSError) as e: # Captura exceções de I/O
             error_msg = f"Erro ao salvar o relatório em '{report_file_path}': {e}"
@@ -202,8 +818,28 @@ class FolderComparer:
             print(f"ERRO: {error_msg}") # Feedback imediato
             return None
 
+    def summary_dict(self) -> Dict[str, Any]:
+        """Retorna o resultado da última comparação em formato serializável (JSON)."""
+        return {
+            "tool": "pastas_diff",
+            "folder1": str(self.folder1) if self.folder1 else None,
+            "folder2": str(self.folder2) if self.folder2 else None,
+            "common_files_count": self.common_files_count,
+            "only_in_folder1_count": len(self.only_in_folder1),
+            "only_in_folder2_count": len(self.only_in_folder2),
+            "moved_count": len(self.moved_files),
+            "pruned_folders_count": self.pruned_folders_count,
+            "pruned_files_count": self.pruned_files_count,
+            "scope": self.scope.describe() if self.scope else None,
+            "report_path": str(self.report_path) if self.report_path else None,
+            "log_file_path": str(self.log_file_path) if self.log_file_path else None,
+            "cancelled": self.progress.cancelled,
+        }
+
     def run(self) -> None:
         """Executa o fluxo completo de seleção de pastas, comparação e salvamento do relatório."""
+        from tkinter import messagebox # Importado apenas no modo gráfico
+
         print("Iniciando comparação de pastas...")
         
         if not self.select_folders():
@@ -234,6 +870,113 @@ class FolderComparer:
             if self.log_file_path: # Informa sobre o log de erros se o salvamento do relatório falhou
                  messagebox.showinfo("Log de Erros", f"Detalhes do erro de salvamento podem estar no arquivo de log: {self.log_file_path}")
 
+def _year_month(value: str) -> str:
+    """Valida um mês no formato das pastas dos arquivadores (AAAA-MM)."""
+    try:
+        return datetime.strptime(value, "%Y-%m").strftime("%Y-%m")
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"mês inválido (use AAAA-MM): {value}")
+
+def build_arg_parser() -> argparse.ArgumentParser:
+    """Cria o parser de argumentos da linha de comando."""
+    parser = argparse.ArgumentParser(
+        description="Compara o conteúdo de duas pastas (incluindo subpastas) e gera um relatório. "
+                    "Qualquer uma das pastas pode ser um manifesto (*.manifesto.tsv.gz) exportado antes.")
+    parser.add_argument("pasta1", nargs="?",
+                        help="Primeira pasta ou manifesto (base para logs e relatório). Se omitida, abre a interface gráfica.")
+    parser.add_argument("pasta2", nargs="?", help="Segunda pasta ou manifesto.")
+    parser.add_argument("--exportar-manifesto", dest="exportar_manifesto", nargs="?", const="", metavar="ARQUIVO",
+                        help="Em vez de comparar, grava o manifesto da primeira pasta (sem ARQUIVO: "
+                             "<pasta>_AAAAMMDD.manifesto.tsv.gz, ao lado da pasta).")
+    parser.add_argument("--hash", action="store_true",
+                        help="Com --exportar-manifesto, inclui o SHA-256 de cada arquivo (permite achar "
+                             "arquivos movidos ao comparar com o manifesto).")
+    parser.add_argument("--sem-movidos", dest="sem_movidos", action="store_true",
+                        help="Não procura arquivos movidos ou renomeados (mesmo conteúdo em outro caminho); "
+                             "todos os arquivos sem correspondente por caminho são listados como exclusivos.")
+    parser.add_argument("--sem-digestos", dest="sem_digestos", action="store_true",
+                        help="Lista as duas pastas inteiras, sem usar o registro de digestos para pular "
+                             "subpastas idênticas.")
+    scope_group = parser.add_argument_group(
+        "escopo", "Restringem a comparação (e a exportação do manifesto) a parte das pastas; "
+                  "subpastas fora do escopo não são listadas.")
+    scope_group.add_argument("--incluir", action="append", default=[], metavar="GLOB",
+                             help="Compara só arquivos cujo caminho relativo (ou uma pasta acima dele) casa com "
+                                  "o padrão, ex: '2024/2024-0*' ou '*.eml'. Pode ser repetido.")
+    scope_group.add_argument("--excluir", action="append", default=[], metavar="GLOB",
+                             help="Ignora arquivos e pastas cujo caminho relativo casa com o padrão, ex: 'ERROS'. "
+                                  "Pode ser repetido.")
+    scope_group.add_argument("--mes-inicial", dest="mes_inicial", type=_year_month, metavar="AAAA-MM",
+                             help="Compara só as pastas AAAA/AAAA-MM a partir deste mês.")
+    scope_group.add_argument("--mes-final", dest="mes_final", type=_year_month, metavar="AAAA-MM",
+                             help="Compara só as pastas AAAA/AAAA-MM até este mês.")
+    scope_group.add_argument("--profundidade", type=int, metavar="N",
+                             help="Desce no máximo N níveis de subpastas (0: só os arquivos da própria pasta).")
+    return parser
+
+def run_headless(args: argparse.Namespace, progress: Optional[ProgressReporter] = None) -> Dict[str, Any]:
+    """Executa a comparação (ou a exportação do manifesto) sem interface gráfica e retorna o resumo em formato serializável."""
+    scope = ComparisonScope(args.incluir, args.excluir, args.mes_inicial, args.mes_final, args.profundidade)
+    comparer = FolderComparer(progress=progress, detect_moved=not args.sem_movidos,
+                              use_digests=not args.sem_digestos, scope=scope)
+    try:
+        if args.exportar_manifesto is not None:
+            return _export_manifest_headless(comparer, args)
+        comparer.set_folders(args.pasta1, args.pasta2)
+        report_content = comparer.compare_folders()
+        result = comparer.summary_dict()
+        if report_content.startswith("ERRO NA COMPARAÇÃO:"):
+            result["error"] = report_content
+            return result
+        comparer.save_report(report_content)
+        result = comparer.summary_dict()
+        if not comparer.report_path:
+            result["error"] = "Não foi possível salvar o relatório."
+        return result
+    finally:
+        close_logger(comparer.logger)
+
+def _export_manifest_headless(comparer: FolderComparer, args: argparse.Namespace) -> Dict[str, Any]:
+    """Exporta o manifesto da primeira pasta e retorna o resumo."""
+    result: Dict[str, Any] = {"tool": "pastas_diff", "folder1": args.pasta1}
+    if is_manifest_path(args.pasta1) or not Path(args.pasta1).is_dir():
+        result["error"] = f"A pasta a exportar não existe ou não é um diretório: {args.pasta1}"
+        return result
+    comparer.set_folders(args.pasta1, None)
+    manifest_path = comparer.export_manifest(
+        Path(args.pasta1), Path(args.exportar_manifesto) if args.exportar_manifesto else None, with_hash=args.hash)
+    result.update({
+        "manifest_path": str(manifest_path) if manifest_path else None,
+        "manifest_file_count": comparer.manifest_file_count,
+        "hashed": args.hash,
+        "scope": comparer.scope.describe() if comparer.scope else None,
+        "log_file_path": str(comparer.log_file_path) if comparer.log_file_path else None,
+        "cancelled": comparer.progress.cancelled,
+    })
+    if manifest_path is None and not comparer.progress.cancelled:
+        result["error"] = "Não foi possível gravar o manifesto."
+    return result
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Ponto de entrada: modo linha de comando se as pastas forem informadas, senão modo gráfico."""
+    parser = build_arg_parser()
+    args = parser.parse_args(argv)
+    if args.pasta1 is None:
+        comparer = FolderComparer()
+        comparer.run()
+        return 0
+    if args.pasta2 is None and args.exportar_manifesto is None:
+        parser.error("informe as duas pastas para comparar no modo linha de comando.")
+    if args.mes_inicial and args.mes_final and args.mes_inicial > args.mes_final:
+        parser.error("--mes-inicial deve ser anterior ou igual a --mes-final.")
+    if args.profundidade is not None and args.profundidade < 0:
+        parser.error("--profundidade deve ser 0 ou maior.")
+
+    # Mensagens de progresso vão para stderr; stdout fica reservado ao resumo JSON
+    with contextlib.redirect_stdout(sys.stderr):
+        summary = run_headless(args)
+    print(json.dumps(summary, indent=2))
+    return 1 if "error" in summary else 0
+
 if __name__ == "__main__":
-    comparer = FolderComparer()
-    comparer.run()
+    raise SystemExit(main())
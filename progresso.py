@@ -0,0 +1,114 @@
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+# --- Constantes ---
+# Intervalo mínimo (segundos) entre dois eventos de progresso enviados ao callback
+DEFAULT_MIN_EMIT_INTERVAL = 0.5
+# --- Fim Constantes ---
+
+
+class ProgressReporter:
+    """
+    Acompanha o andamento de uma execução (arquivos verificados, movidos, erros)
+    e envia eventos de progresso, com vazão e tempo restante estimado, para um callback.
+
+    Sem callback, funciona apenas como contador (custo desprezível), o que permite que as
+    ferramentas sempre usem um ProgressReporter, mesmo quando executadas sem o painel.
+    O cancelamento é cooperativo: as ferramentas consultam `cancelled` entre um arquivo e outro.
+    """
+
+    def __init__(self, callback: Optional[Callable[[Dict[str, Any]], None]] = None,
+                 cancel_event: Optional[threading.Event] = None,
+                 min_emit_interval: float = DEFAULT_MIN_EMIT_INTERVAL):
+        self.callback = callback
+        self.cancel_event: threading.Event = cancel_event or threading.Event()
+        self.min_emit_interval = min_emit_interval
+
+        self.total: Optional[int] = None
+        self.scanned_count = 0
+        self.moved_count = 0
+        self.error_count = 0
+        self.stage = ""
+        self._start_time = time.monotonic()
+        self._last_emit_time = 0.0
+
+    @property
+    def cancelled(self) -> bool:
+        """Indica se o cancelamento da execução foi solicitado."""
+        return self.cancel_event.is_set()
+
+    def cancel(self) -> None:
+        """Solicita o cancelamento da execução."""
+        self.cancel_event.set()
+
+    def start(self, total: Optional[int] = None, stage: str = "") -> None:
+        """Reinicia a contagem de tempo. `total` é o número de arquivos previsto, se conhecido."""
+        self.total = total
+        self.stage = stage
+        self._start_time = time.monotonic()
+        self._emit(force=True)
+
+    def set_stage(self, stage: str, total: Optional[int] = None) -> None:
+        """Muda a etapa exibida (ex.: 'Listando', 'Arquivando') e, opcionalmente, o total previsto."""
+        self.stage = stage
+        if total is not None:
+            self.total = total
+        self._emit(force=True)
+
+    def advance(self, moved: Optional[int] = None, errors: Optional[int] = None, count: int = 1) -> None:
+        """Registra `count` arquivo(s) verificado(s) e atualiza os totais de movidos e de erros."""
+        self.scanned_count += count
+        if moved is not None:
+            self.moved_count = moved
+        if errors is not None:
+            self.error_count = errors
+        self._emit()
+
+    def finish(self, moved: Optional[int] = None, errors: Optional[int] = None) -> None:
+        """Envia o evento final da execução."""
+        if moved is not None:
+            self.moved_count = moved
+        if errors is not None:
+            self.error_count = errors
+        self._emit(force=True, finished=True)
+
+    def snapshot(self, finished: bool = False) -> Dict[str, Any]:
+        """Retorna o estado atual, incluindo vazão (arquivos/s) e tempo restante estimado (s)."""
+        elapsed = time.monotonic() - self._start_time
+        files_per_second = self.scanned_count / elapsed if elapsed > 0 else 0.0
+        eta_seconds: Optional[float] = None
+        if self.total is not None and files_per_second > 0:
+            eta_seconds = max(self.total - self.scanned_count, 0) / files_per_second
+        return {
+            "stage": self.stage,
+            "scanned": self.scanned_count,
+            "total": self.total,
+            "moved": self.moved_count,
+            "errors": self.error_count,
+            "elapsed_seconds": elapsed,
+            "files_per_second": files_per_second,
+            "eta_seconds": eta_seconds,
+            "cancelled": self.cancelled,
+            "finished": finished,
+        }
+
+    def _emit(self, force: bool = False, finished: bool = False) -> None:
+        """Chama o callback, limitando a frequência dos eventos a um a cada `min_emit_interval`."""
+        if self.callback is None:
+            return
+        now = time.monotonic()
+        if not force and now - self._last_emit_time < self.min_emit_interval:
+            return
+        self._last_emit_time = now
+        self.callback(self.snapshot(finished=finished))
+
+
+def format_eta(eta_seconds: Optional[float]) -> str:
+    """Formata o tempo restante estimado como H:MM:SS (ou '-' se desconhecido)."""
+    if eta_seconds is None:
+        return "-"
+    total_seconds = int(eta_seconds)
+    hours, remainder = divmod(total_seconds, 3600)
+    minutes, seconds = divmod(remainder, 60)
+    return f"{hours}:{minutes:02d}:{seconds:02d}"
@@ -0,0 +1,159 @@
+import atexit
+import logging
+import queue
+import threading
+from logging.handlers import QueueHandler, QueueListener
+from pathlib import Path
+from typing import Dict, Optional, Tuple, Union
+
+# --- Constantes ---
+DEFAULT_LOG_FORMAT = "%(asctime)s - %(levelname)s - %(message)s"
+# Registros aguardando gravação; com a fila cheia, quem registra espera (nenhum registro é perdido)
+LOG_QUEUE_SIZE = 10_000
+# O arquivo de log é esvaziado em disco a cada tantos registros ou após esse tempo sem registros novos
+LOG_FLUSH_RECORDS = 256
+LOG_FLUSH_SECONDS = 1.0
+# Ocorrências de uma mesma mensagem agregada registradas por extenso antes de só serem contadas
+DEFAULT_DETAIL_LIMIT = 3
+# --- Fim Constantes ---
+
+PathType = Union[str, Path]
+
+
+class BatchingFileHandler(logging.FileHandler):
+    """FileHandler que não esvazia o arquivo a cada registro, só a cada `flush_records` (e no fechamento)."""
+
+    def __init__(self, filename: PathType, encoding: str = "utf-8", delay: bool = False,
+                 flush_records: int = LOG_FLUSH_RECORDS):
+        super().__init__(str(filename), mode="a", encoding=encoding, delay=delay)
+        self.flush_records = max(flush_records, 1)
+        self._pending = 0
+
+    def emit(self, record: logging.LogRecord) -> None:
+        try:
+            if self.stream is None:
+                self.stream = self._open()
+            self.stream.write(self.format(record) + self.terminator)
+            self._pending += 1
+            if self._pending >= self.flush_records:
+                self.flush()
+        except RecursionError:
+            raise
+        except Exception:
+            self.handleError(record)
+
+    def flush(self) -> None:
+        super().flush()
+        self._pending = 0
+
+
+class _BlockingQueueHandler(QueueHandler):
+    """Com a fila limitada cheia, espera uma vaga em vez de descartar o registro."""
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        self.queue.put(record)
+
+
+class _BatchingListener(QueueListener):
+    """QueueListener que, sem registros novos por LOG_FLUSH_SECONDS, esvazia os arquivos em disco."""
+
+    def dequeue(self, block: bool) -> logging.LogRecord:
+        while True:
+            try:
+                return self.queue.get(block, timeout=LOG_FLUSH_SECONDS)
+            except queue.Empty:
+                for handler in self.handlers:
+                    handler.flush()
+
+    def enqueue_sentinel(self) -> None:
+        self.queue.put(self._sentinel)
+
+
+_listeners: Dict[str, _BatchingListener] = {}
+_listeners_lock = threading.Lock()
+
+
+def setup_file_logger(name: str, log_file: PathType, level: int = logging.ERROR,
+                      fmt: str = DEFAULT_LOG_FORMAT, datefmt: Optional[str] = None,
+                      delay: bool = False) -> logging.Logger:
+    """
+    Configura o logger `name` para gravar em `log_file` sem bloquear quem registra: os registros
+    vão para uma fila limitada (QueueHandler) e uma thread (QueueListener) os grava no arquivo em
+    lotes. Um logger já configurado com o mesmo nome é fechado antes. Levanta OSError se o arquivo
+    não puder ser criado (com `delay`, ele só é criado no primeiro registro).
+    """
+    close_logger(logging.getLogger(name))
+    logger = logging.getLogger(name)
+    file_handler = BatchingFileHandler(log_file, delay=delay)
+    file_handler.setLevel(level)
+    file_handler.setFormatter(logging.Formatter(fmt, datefmt))
+    log_queue: "queue.Queue[logging.LogRecord]" = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+    listener = _BatchingListener(log_queue, file_handler, respect_handler_level=True)
+
+    logger.setLevel(level)  # Registros abaixo do nível nem entram na fila
+    logger.propagate = False
+    logger.handlers.clear()
+    logger.addHandler(_BlockingQueueHandler(log_queue))
+    with _listeners_lock:
+        _listeners[name] = listener
+    listener.start()
+    return logger
+
+
+def close_logger(logger: logging.Logger) -> None:
+    """
+    Grava o que falta na fila, fecha o arquivo e libera o logger (os nomes únicos por instância
+    não ficam acumulados no módulo logging). Registros posteriores são descartados.
+    """
+    with _listeners_lock:
+        listener = _listeners.pop(logger.name, None)
+    if listener is not None:
+        listener.stop()
+        for handler in listener.handlers:
+            handler.close()
+    if listener is None and not logger.handlers:
+        return
+    for handler in logger.handlers[:]:
+        logger.removeHandler(handler)
+        handler.close()
+    logger.addHandler(logging.NullHandler())
+    logging.Logger.manager.loggerDict.pop(logger.name, None)
+
+
+def close_all_loggers() -> None:
+    """Fecha todos os loggers configurados por setup_file_logger (também chamado na saída do programa)."""
+    with _listeners_lock:
+        names = list(_listeners)
+    for name in names:
+        close_logger(logging.getLogger(name))
+
+
+atexit.register(close_all_loggers)
+
+
+class LogAggregator:
+    """
+    Agrega mensagens repetitivas: as primeiras `detail_limit` ocorrências de cada (tipo, grupo)
+    são registradas por extenso e as demais só contadas; `flush` registra uma linha de resumo por
+    grupo que passou do limite, ex: "537 conflitos de nome em 2024-03 (534 sem detalhe)".
+    """
+
+    def __init__(self, logger: logging.Logger, detail_limit: int = DEFAULT_DETAIL_LIMIT):
+        self.logger = logger
+        self.detail_limit = detail_limit
+        self._counts: Dict[Tuple[str, str], Tuple[int, int]] = {}  # (tipo, grupo) -> (ocorrências, maior nível)
+
+    def log(self, level: int, kind: str, group: str, message: str) -> None:
+        """Registra `message` ou, passado o limite do grupo, só a conta."""
+        count, max_level = self._counts.get((kind, group), (0, level))
+        count += 1
+        self._counts[(kind, group)] = (count, max(level, max_level))
+        if count <= self.detail_limit:
+            self.logger.log(level, message)
+
+    def flush(self) -> None:
+        """Registra os resumos dos grupos que passaram do limite e zera as contas."""
+        for (kind, group), (count, level) in sorted(self._counts.items()):
+            if count > self.detail_limit:
+                self.logger.log(level, f"{count} {kind} em {group} ({count - self.detail_limit} sem detalhe)")
+        self._counts.clear()
@@ -1,12 +1,19 @@
+import argparse
+import contextlib
+import json
 import re
-import tkinter as tk
-from tkinter import filedialog, messagebox
+import sys
+import zipfile
+from collections import Counter
 from pathlib import Path
-from typing import Optional, Tuple, List, Set
+from typing import Any, Optional, Tuple, List, Dict
 import logging
 from datetime import datetime
 import markdown  # Necessário para ReportCombiner
 
+from empacotar_meses import pack_path_for, packed_file_names
+from registro import close_logger, setup_file_logger
+
 # --- Constantes ---
 ICON_PATH = 'imagens/email.ico'
 REPORT_FILENAME_TEMPLATE = "relatorio_verificacao_{}.txt"
@@ -27,6 +34,9 @@ HTML_STYLE = """
 
 def selecionar_pasta() -> None:
     """Abre um diálogo para selecionar uma pasta e atualiza o campo de entrada."""
+    import tkinter as tk  # Importado apenas no modo gráfico
+    from tkinter import filedialog
+
     pasta_selecionada = filedialog.askdirectory(title="Selecione a pasta")
     if pasta_selecionada:
         entry_pasta.delete(0, tk.END)
@@ -51,12 +61,6 @@ class ReportCombiner:
         """Configura o logger para o processo de combinação."""
         logger_name = f"{__name__}.ReportCombiner.{id(self)}"
         logger = logging.getLogger(logger_name)
-        logger.setLevel(logging.INFO)
-        logger.propagate = False
-
-        if logger.hasHandlers():
-            logger.handlers.clear()
-
         log_file_configured = False
         try:
             self.log_folder_path.mkdir(parents=True, exist_ok=True)
@@ -65,12 +69,8 @@ class ReportCombiner:
                 f"{LOG_FILENAME_PREFIX}{timestamp}.log"
 
             try:
-                file_handler = logging.FileHandler(
-                    str(log_file), encoding='utf-8')
-                formatter = logging.Formatter(
-                    '%(asctime)s - %(levelname)s - %(message)s')
-                file_handler.setFormatter(formatter)
-                logger.addHandler(file_handler)
+                logger = setup_file_logger(logger_name, log_file, logging.INFO,
+                                           '%(asctime)s - %(levelname)s - %(message)s')
                 log_file_configured = True
             except Exception as e_fh:
                 print(f"ERRO: Não foi possível configurar o logger para o arquivo '{log_file}': {e_fh}. "
@@ -80,6 +80,8 @@ class ReportCombiner:
                   "Logs de arquivo não estarão disponíveis.")
 
         if not log_file_configured and not logger.hasHandlers():
+            logger.setLevel(logging.INFO)
+            logger.propagate = False
             console_handler = logging.StreamHandler()
             console_handler.setFormatter(logging.Formatter(
                 '%(asctime)s - %(levelname)s - %(message)s'))
@@ -189,28 +191,27 @@ class ReportCombiner:
                 f"Erro ao salvar o arquivo HTML '{self.output_html_path}': {e}")
             return False
 
-    def run(self) -> None:
-        """Executa o fluxo completo de combinação e geração de relatório HTML."""
+    def combine(self) -> Tuple[bool, str, str]:
+        """
+        Executa a combinação e a geração do relatório HTML sem interface gráfica.
+
+        Returns:
+            Uma tupla (sucesso, título, mensagem) descrevendo o resultado para o usuário.
+        """
         self.logger.info(
             f"Iniciando combinação de relatórios para a pasta: {self.folder_path}")
         if not self.folder_path.is_dir():
             self.logger.error(
                 f"O caminho fornecido não é uma pasta válida: {self.folder_path}")
-            messagebox.showerror(
-                "Erro de Pasta", f"A pasta selecionada não existe ou não é acessível:\n{self.folder_path}")
-            return
+            return False, "Erro de Pasta", f"A pasta selecionada não existe ou não é acessível:\n{self.folder_path}"
         try:
             combined_markdown, txt_files = self.combine_txt_to_html_content()
             if combined_markdown is None:
-                messagebox.showerror(
-                    "Erro de Processamento", f"Não foi possível processar os arquivos na pasta '{self.folder_path}'. Verifique os logs.")
-                return
+                return False, "Erro de Processamento", f"Não foi possível processar os arquivos na pasta '{self.folder_path}'. Verifique os logs."
             if not txt_files:
                 self.logger.info(
                     "Nenhum arquivo .txt encontrado na pasta selecionada para unificação.")
-                messagebox.showinfo(
-                    "Unificação: Nenhum Arquivo", "Nenhum arquivo .txt encontrado na pasta para unificação.")
-                return
+                return True, "Unificação: Nenhum Arquivo", "Nenhum arquivo .txt encontrado na pasta para unificação."
             full_html = self.generate_html_report(combined_markdown)
             if self.save_html_report(full_html) and self.output_html_path:
                 # Excluir os arquivos .txt originais
@@ -232,20 +233,29 @@ class ReportCombiner:
                 if deletion_errors:
                     success_msg += f"\n\nFalha ao excluir os seguintes arquivos .txt: {', '.join(deletion_errors)}. Verifique os logs."
                 self.logger.info(success_msg)
-                messagebox.showinfo("Unificação Concluída", success_msg)
-            else:
-                error_msg = f"Falha ao salvar o relatório HTML unificado. Verifique os logs em '{self.log_folder_path}'."
-                self.logger.error(error_msg)
-                messagebox.showerror("Unificação: Erro ao Salvar", error_msg)
+                return True, "Unificação Concluída", success_msg
+            error_msg = f"Falha ao salvar o relatório HTML unificado. Verifique os logs em '{self.log_folder_path}'."
+            self.logger.error(error_msg)
+            return False, "Unificação: Erro ao Salvar", error_msg
         except ImportError:
             error_msg = "Erro: A biblioteca 'markdown' não está instalada.\nPor favor, instale-a executando: pip install markdown"
             self.logger.critical(error_msg)
             print(error_msg)
-            messagebox.showerror("Unificação: Dependência Faltando", error_msg)
+            return False, "Unificação: Dependência Faltando", error_msg
         except Exception as e:
             error_msg = f"Ocorreu um erro inesperado durante a unificação: {e}"
             self.logger.exception(error_msg)
-            messagebox.showerror("Unificação: Erro Inesperado", error_msg)
+            return False, "Unificação: Erro Inesperado", error_msg
+
+    def run(self) -> None:
+        """Executa o fluxo completo de combinação e exibe o resultado em uma caixa de mensagem."""
+        from tkinter import messagebox  # Importado apenas no modo gráfico
+
+        sucesso, titulo, mensagem = self.combine()
+        if sucesso:
+            messagebox.showinfo(titulo, mensagem)
+        else:
+            messagebox.showerror(titulo, mensagem)
 
 # --- Funções do contador_mensagens ---
 
@@ -256,7 +266,8 @@ def _validar_entradas(pasta_str: str, inicio_str: str, fim_str: str) -> Tuple[Op
         return None, None, None, "O caminho da pasta não pode estar vazio."
 
     pasta_path = Path(pasta_str)
-    if not pasta_path.is_dir():
+    # Um mês empacotado pelo empacotar_meses (só o AAAA-MM.zip, sem a pasta) também é aceito
+    if not pasta_path.is_dir() and not pack_path_for(pasta_path).is_file():
         return None, None, None, f"A pasta selecionada não existe: {pasta_str}"
 
     try:
@@ -279,28 +290,64 @@ def _extrair_numero_inicial(nome_arquivo: str) -> Optional[int]:
     return None
 
 
-def _processar_arquivos_da_pasta(pasta: Path, inicio: int, fim: int) -> Tuple[Set[int], List[str], List[int]]:
-    """Processa os arquivos na pasta para encontrar números e categorizá-los."""
-    numeros_encontrados: Set[int] = set()
+def _listar_nomes_arquivos(pasta: Path) -> Tuple[List[str], Optional[str]]:
+    """
+    Nomes dos arquivos da pasta, incluindo os que estão no pacote do mês (empacotar_meses),
+    como se ainda estivessem na pasta. Arquivos de subpastas do pacote são ignorados, como na pasta.
+    Se o pacote não puder ser lido (ex.: zip corrompido), retorna só os da pasta e a descrição do problema.
+    """
+    nomes = [item_path.name for item_path in pasta.iterdir() if item_path.is_file()] if pasta.is_dir() else []
+    try:
+        nomes.extend(nome for nome in packed_file_names(pasta) if '/' not in nome)
+    except (OSError, zipfile.BadZipFile) as e:
+        return nomes, f"{pack_path_for(pasta)}: {e}"
+    return nomes, None
+
+
+def _processar_arquivos_da_pasta(pasta: Path, inicio: int, fim: int
+                                 ) -> Tuple[Counter, List[str], List[int], Dict[int, List[str]], Optional[str]]:
+    """
+    Processa os arquivos na pasta para encontrar números e categorizá-los. O último item é a
+    descrição do problema se o pacote do mês não pôde ser lido (seus arquivos não são contados).
+
+    As ocorrências de cada número são contadas em um Counter (número -> quantidade),
+    sem guardar os nomes dos arquivos. Só quando algum número aparece mais de uma vez
+    a pasta é relida para listar os arquivos que compartilham aquele número.
+    """
+    numeros_encontrados: Counter = Counter()
     arquivos_sem_numero: List[str] = []
-    numeros_fora_intervalo: List[int] = []
 
-    for item_path in pasta.iterdir():
-        if item_path.is_file():
-            nome_arquivo = item_path.name
-            numero = _extrair_numero_inicial(nome_arquivo)
+    nomes_arquivos, pacote_ilegivel = _listar_nomes_arquivos(pasta)
+    for nome_arquivo in nomes_arquivos:
+        numero = _extrair_numero_inicial(nome_arquivo)
+
+        if numero is not None:
+            numeros_encontrados[numero] += 1
+        else:
+            arquivos_sem_numero.append(nome_arquivo)
 
-            if numero is not None:
-                numeros_encontrados.add(numero)
-                if not (inicio <= numero <= fim):
-                    numeros_fora_intervalo.append(numero)
-            else:
-                arquivos_sem_numero.append(nome_arquivo)
+    # Cada número uma vez; as repetições aparecem na seção de duplicados
+    numeros_fora_intervalo = sorted(numero for numero in numeros_encontrados if not (inicio <= numero <= fim))
+    arquivos_duplicados = _listar_arquivos_duplicados(pasta, numeros_encontrados)
+    return numeros_encontrados, arquivos_sem_numero, numeros_fora_intervalo, arquivos_duplicados, pacote_ilegivel
 
-    return numeros_encontrados, arquivos_sem_numero, sorted(numeros_fora_intervalo)
 
+def _listar_arquivos_duplicados(pasta: Path, numeros_encontrados: Counter) -> Dict[int, List[str]]:
+    """Lista, para cada número com mais de uma ocorrência, os arquivos que começam com ele."""
+    numeros_duplicados = {numero for numero, quantidade in numeros_encontrados.items() if quantidade > 1}
+    arquivos_duplicados: Dict[int, List[str]] = {}
+    if not numeros_duplicados:
+        return arquivos_duplicados
 
-def _identificar_numeros_faltantes(inicio: int, fim: int, numeros_encontrados: Set[int]) -> List[int]:
+    for nome_arquivo in _listar_nomes_arquivos(pasta)[0]:
+        numero = _extrair_numero_inicial(nome_arquivo)
+        if numero in numeros_duplicados:
+            arquivos_duplicados.setdefault(numero, []).append(nome_arquivo)
+
+    return {numero: sorted(arquivos_duplicados[numero]) for numero in sorted(arquivos_duplicados)}
+
+
+def _identificar_numeros_faltantes(inicio: int, fim: int, numeros_encontrados: Counter) -> List[int]:
     """Identifica os números faltantes no intervalo especificado."""
     return [num for num in range(inicio, fim + 1) if num not in numeros_encontrados]
 
@@ -324,7 +371,9 @@ def _gerar_conteudo_relatorio(
     fim: int,
     numeros_faltantes: List[int],
     numeros_fora_intervalo: List[int],
-    arquivos_sem_numero: List[str]
+    arquivos_sem_numero: List[str],
+    arquivos_duplicados: Dict[int, List[str]],
+    pacote_ilegivel: Optional[str] = None
 ) -> str:
     """Gera o conteúdo textual do relatório."""
     relatorio = [
@@ -332,6 +381,8 @@ def _gerar_conteudo_relatorio(
         f"Pasta analisada: {pasta}",
         f"Intervalo verificado: {inicio} a {fim}",
     ]
+    if pacote_ilegivel:
+        relatorio.append(f"ATENÇÃO: pacote do mês ilegível, arquivos empacotados não verificados ({pacote_ilegivel})")
 
     relatorio.extend(_formatar_lista_para_relatorio(
         "Números faltantes no intervalo",
@@ -343,6 +394,12 @@ def _gerar_conteudo_relatorio(
         numeros_fora_intervalo,
         "Nenhum número encontrado fora do intervalo."
     ))
+    relatorio.extend(_formatar_lista_para_relatorio(
+        "Números duplicados (mais de um arquivo com o mesmo número)",
+        [f"{numero} ({len(nomes)} arquivos): {' | '.join(nomes)}"
+         for numero, nomes in arquivos_duplicados.items()],
+        "Nenhum número duplicado encontrado."
+    ))
     relatorio.extend(_formatar_lista_para_relatorio(
         "Arquivos que não começam com números",
         arquivos_sem_numero,
@@ -352,24 +409,56 @@ def _gerar_conteudo_relatorio(
     return "\n".join(relatorio)
 
 
-def _salvar_relatorio(pasta_base: Path, nome_pasta_analisada: str, conteudo_relatorio: str) -> Optional[Path]:
-    """Salva o relatório em um arquivo .txt na pasta analisada."""
+def _salvar_relatorio(pasta_base: Path, nome_pasta_analisada: str, conteudo_relatorio: str) -> Path:
+    """Salva o relatório em um arquivo .txt na pasta pai da analisada. Levanta OSError em caso de falha."""
+    nome_arquivo_relatorio = REPORT_FILENAME_TEMPLATE.format(
+        nome_pasta_analisada)  # Mantém o nome da pasta analisada no nome do arquivo
+    caminho_relatorio = pasta_base.parent / \
+        nome_arquivo_relatorio  # Salva na pasta pai
+    with open(caminho_relatorio, 'w', encoding='utf-8') as f:
+        f.write(conteudo_relatorio)
+    return caminho_relatorio
+
+
+def verificar_pasta(pasta: Path, inicio: int, fim: int) -> Dict[str, Any]:
+    """
+    Verifica a sequência numérica dos arquivos da pasta, salva o relatório .txt
+    e retorna o resultado em formato serializável (JSON).
+    """
+    (numeros_encontrados, arquivos_sem_numero, numeros_fora_intervalo, arquivos_duplicados,
+     pacote_ilegivel) = _processar_arquivos_da_pasta(pasta, inicio, fim)
+    numeros_faltantes = _identificar_numeros_faltantes(
+        inicio, fim, numeros_encontrados)
+
+    conteudo_relatorio = _gerar_conteudo_relatorio(
+        pasta, inicio, fim, numeros_faltantes, numeros_fora_intervalo, arquivos_sem_numero,
+        arquivos_duplicados, pacote_ilegivel
+    )
+
+    resultado: Dict[str, Any] = {
+        "tool": "relatorio_mensagens",
+        "folder": str(pasta),
+        "start": inicio,
+        "end": fim,
+        "found_count": len(numeros_encontrados),
+        "missing": numeros_faltantes,
+        "out_of_range": numeros_fora_intervalo,
+        "duplicated": {str(numero): nomes for numero, nomes in arquivos_duplicados.items()},
+        "files_without_number": arquivos_sem_numero,
+        "unreadable_pack": pacote_ilegivel,
+        "report_path": None,
+    }
     try:
-        nome_arquivo_relatorio = REPORT_FILENAME_TEMPLATE.format(
-            nome_pasta_analisada)  # Mantém o nome da pasta analisada no nome do arquivo
-        caminho_relatorio = pasta_base.parent / \
-            nome_arquivo_relatorio  # Salva na pasta pai
-        with open(caminho_relatorio, 'w', encoding='utf-8') as f:
-            f.write(conteudo_relatorio)
-        return caminho_relatorio
-    except IOError as e:
-        messagebox.showerror(
-            "Erro ao Salvar", f"Não foi possível salvar o relatório:\n{e}")
-        return None
+        resultado["report_path"] = str(_salvar_relatorio(pasta, pasta.name, conteudo_relatorio))
+    except OSError as e:
+        resultado["error"] = f"Não foi possível salvar o relatório: {e}"
+    return resultado
 
 
 def verificar_arquivos() -> None:
     """Função principal para verificar arquivos, chamada pelo botão da GUI."""
+    from tkinter import messagebox  # Importado apenas no modo gráfico
+
     pasta_str = entry_pasta.get()
     inicio_str = entry_inicio.get()
     fim_str = entry_fim.get()
@@ -386,73 +475,130 @@ def verificar_arquivos() -> None:
     assert inicio is not None
     assert fim is not None
 
-    numeros_encontrados, arquivos_sem_numero, numeros_fora_intervalo = _processar_arquivos_da_pasta(
-        pasta, inicio, fim)
-    numeros_faltantes = _identificar_numeros_faltantes(
-        inicio, fim, numeros_encontrados)
+    resultado = verificar_pasta(pasta, inicio, fim)
+    if "error" in resultado:
+        messagebox.showerror("Erro ao Salvar", resultado["error"])
+        return
 
-    conteudo_relatorio = _gerar_conteudo_relatorio(
-        pasta, inicio, fim, numeros_faltantes, numeros_fora_intervalo, arquivos_sem_numero
-    )
+    caminho_relatorio_salvo = Path(resultado["report_path"])
+    if resultado["unreadable_pack"]:
+        messagebox.showwarning(
+            "Pacote Ilegível", f"Os arquivos empacotados não foram verificados:\n{resultado['unreadable_pack']}")
+    messagebox.showinfo(
+        "Concluído", f"Verificação finalizada. Relatório salvo em:\n{caminho_relatorio_salvo}")
+
+    if var_unificar_relatorios.get():  # Verifica o estado do checkbutton
+        pasta_para_unificar = caminho_relatorio_salvo.parent
+        print(
+            f"INFO: Iniciando unificação de relatórios na pasta: {pasta_para_unificar}")
+        # Não é necessário um messagebox aqui, pois o ReportCombiner.run() já informa o usuário.
+        try:
+            combiner = ReportCombiner(str(pasta_para_unificar))
+            combiner.run()  # Este método já lida com seus próprios pop-ups e logging
+        except Exception as e:
+            # Captura erros na instanciação de ReportCombiner ou outros não tratados por run()
+            messagebox.showerror("Erro na Unificação",
+                                 f"Ocorreu um erro inesperado ao iniciar o processo de unificação:\n{e}")
+            if hasattr(combiner, 'logger'):  # Se o logger foi inicializado
+                combiner.logger.exception(
+                    "Erro crítico ao tentar unificar relatórios.")
 
-    caminho_relatorio_salvo = _salvar_relatorio(
-        pasta, pasta.name, conteudo_relatorio)
 
-    if caminho_relatorio_salvo:
-        messagebox.showinfo(
-            "Concluído", f"Verificação finalizada. Relatório salvo em:\n{caminho_relatorio_salvo}")
+def main_gui() -> None:
+    """Monta a janela principal do verificador e inicia o loop da interface gráfica."""
+    import tkinter as tk  # Importado apenas no modo gráfico
 
-        if var_unificar_relatorios.get():  # Verifica o estado do checkbutton
-            pasta_para_unificar = caminho_relatorio_salvo.parent
-            print(
-                f"INFO: Iniciando unificação de relatórios na pasta: {pasta_para_unificar}")
-            # Não é necessário um messagebox aqui, pois o ReportCombiner.run() já informa o usuário.
-            try:
-                combiner = ReportCombiner(str(pasta_para_unificar))
-                combiner.run()  # Este método já lida com seus próprios pop-ups e logging
-            except Exception as e:
-                # Captura erros na instanciação de ReportCombiner ou outros não tratados por run()
-                messagebox.showerror("Erro na Unificação",
-                                     f"Ocorreu um erro inesperado ao iniciar o processo de unificação:\n{e}")
-                if hasattr(combiner, 'logger'):  # Se o logger foi inicializado
-                    combiner.logger.exception(
-                        "Erro crítico ao tentar unificar relatórios.")
-
-
-# Configuração da janela principal
-root = tk.Tk()
-try:
-    root.iconbitmap(ICON_PATH)
-except tk.TclError:
-    print(f"Aviso: Ícone '{ICON_PATH}' não encontrado ou formato inválido.")
-root.title("Verificador de Mensagens")
-
-# Frame principal
-frame = tk.Frame(root, padx=10, pady=10)
-frame.pack()
-
-# Widgets
-tk.Label(frame, text="Pasta:").grid(row=0, column=0, sticky="w")
-entry_pasta = tk.Entry(frame, width=50)
-entry_pasta.grid(row=0, column=1, padx=5)
-tk.Button(frame, text="Selecionar",
-          command=selecionar_pasta).grid(row=0, column=2)
-
-tk.Label(frame, text="Número Inicial:").grid(row=1, column=0, sticky="w")
-entry_inicio = tk.Entry(frame, width=10)
-entry_inicio.grid(row=1, column=1, sticky="w", padx=5)
-
-tk.Label(frame, text="Número Final:").grid(row=2, column=0, sticky="w")
-entry_fim = tk.Entry(frame, width=10)
-entry_fim.grid(row=2, column=1, sticky="w", padx=5)
-
-# Checkbutton para unificar relatórios
-var_unificar_relatorios = tk.BooleanVar()
-check_unificar = tk.Checkbutton(frame, text="Unificar relatórios da pasta pai após verificação",
-                                variable=var_unificar_relatorios)
-check_unificar.grid(row=3, column=0, columnspan=3, sticky="w", pady=(5, 0))
-
-tk.Button(frame, text="Verificar Arquivos", command=verificar_arquivos).grid(
-    row=4, column=0, columnspan=3, pady=10)
-
-root.mainloop()
+    global entry_pasta, entry_inicio, entry_fim, var_unificar_relatorios
+
+    # Configuração da janela principal
+    root = tk.Tk()
+    try:
+        root.iconbitmap(ICON_PATH)
+    except tk.TclError:
+        print(f"Aviso: Ícone '{ICON_PATH}' não encontrado ou formato inválido.")
+    root.title("Verificador de Mensagens")
+
+    # Frame principal
+    frame = tk.Frame(root, padx=10, pady=10)
+    frame.pack()
+
+    # Widgets
+    tk.Label(frame, text="Pasta:").grid(row=0, column=0, sticky="w")
+    entry_pasta = tk.Entry(frame, width=50)
+    entry_pasta.grid(row=0, column=1, padx=5)
+    tk.Button(frame, text="Selecionar",
+              command=selecionar_pasta).grid(row=0, column=2)
+
+    tk.Label(frame, text="Número Inicial:").grid(row=1, column=0, sticky="w")
+    entry_inicio = tk.Entry(frame, width=10)
+    entry_inicio.grid(row=1, column=1, sticky="w", padx=5)
+
+    tk.Label(frame, text="Número Final:").grid(row=2, column=0, sticky="w")
+    entry_fim = tk.Entry(frame, width=10)
+    entry_fim.grid(row=2, column=1, sticky="w", padx=5)
+
+    # Checkbutton para unificar relatórios
+    var_unificar_relatorios = tk.BooleanVar()
+    check_unificar = tk.Checkbutton(frame, text="Unificar relatórios da pasta pai após verificação",
+                                    variable=var_unificar_relatorios)
+    check_unificar.grid(row=3, column=0, columnspan=3, sticky="w", pady=(5, 0))
+
+    tk.Button(frame, text="Verificar Arquivos", command=verificar_arquivos).grid(
+        row=4, column=0, columnspan=3, pady=10)
+
+    root.mainloop()
+
+
+def build_arg_parser() -> argparse.ArgumentParser:
+    """Cria o parser de argumentos da linha de comando."""
+    parser = argparse.ArgumentParser(
+        description="Verifica a sequência numérica dos arquivos de uma pasta e gera um relatório.")
+    parser.add_argument("pasta", nargs="?",
+                        help="Pasta a ser verificada. Se omitida, abre a interface gráfica.")
+    parser.add_argument("--inicio", help="Número inicial do intervalo.")
+    parser.add_argument("--fim", help="Número final do intervalo.")
+    parser.add_argument("--unificar", action="store_true",
+                        help="Unifica os relatórios .txt da pasta pai em um HTML após a verificação.")
+    return parser
+
+
+def run_headless(args: argparse.Namespace, progress: Optional[Any] = None) -> Dict[str, Any]:
+    """
+    Executa a verificação sem interface gráfica e retorna o resultado em formato serializável.
+    A verificação é rápida (uma listagem de pasta); `progress` é aceito apenas por uniformidade.
+    """
+    pasta, inicio, fim, erro_validacao = _validar_entradas(
+        args.pasta, args.inicio or "", args.fim or "")
+    if erro_validacao:
+        return {"tool": "relatorio_mensagens", "folder": args.pasta, "error": erro_validacao}
+
+    assert pasta is not None and inicio is not None and fim is not None
+    resultado = verificar_pasta(pasta, inicio, fim)
+    if args.unificar and resultado.get("report_path"):
+        combiner = ReportCombiner(str(Path(resultado["report_path"]).parent))
+        try:
+            sucesso, _titulo, mensagem = combiner.combine()
+        finally:
+            close_logger(combiner.logger)
+        resultado["combined_html_path"] = str(combiner.output_html_path) if combiner.output_html_path else None
+        if not sucesso:
+            resultado["error"] = mensagem
+    return resultado
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Ponto de entrada: modo linha de comando se a pasta for informada, senão modo gráfico."""
+    args = build_arg_parser().parse_args(argv)
+    if args.pasta is None:
+        main_gui()
+        return 0
+
+    # Mensagens de progresso vão para stderr; stdout fica reservado ao resumo JSON
+    with contextlib.redirect_stdout(sys.stderr):
+        summary = run_headless(args)
+    print(json.dumps(summary, indent=2))
+    return 1 if "error" in summary or summary.get("unreadable_pack") else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,167 @@
+import argparse
+import contextlib
+import email
+import json
+import logging
+import sys
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import arquiva_subpastas
+from leitura_cabecalhos import add_read_concurrency_argument, parse_headers_default
+from metricas import STAGE_DATE_PARSE, STAGE_HEADER_PARSE
+from progresso import ProgressReporter
+from registro import close_logger
+from renomear_eml import (LOG_FOLDER_NAME as RENAMER_LOG_FOLDER_NAME, MAX_SENDER_LEN, MAX_SUBJECT_LEN,
+                          MAX_SUFFIX_ATTEMPTS, PROBLEMS_SUBFOLDER, EmlRenamer)
+
+# --- Constantes ---
+TOOL_NAME = "renomear_arquivar"
+# --- Fim Constantes ---
+
+
+class RenameArchivePipeline(arquiva_subpastas.FileArchiver):
+    """
+    renomear_eml seguido de arquiva_subpastas em uma só passada: cada .eml da pasta principal
+    tem o cabeçalho lido uma vez, recebe o nome do EmlRenamer ('AAAA MM DD HHMM - Assunto -
+    Remetente') e é movido direto para Ano/Ano-Mês, sem a renomeação intermediária no lugar.
+    O mês de destino segue a regra do arquiva_subpastas (cabeçalho Date), como nas duas
+    ferramentas em sequência; o sufixo de duplicata ('a', 'b', ...) é escolhido contra a pasta
+    de destino. Os demais arquivos (subpastas e não .eml) são arquivados como no arquiva_subpastas.
+    Problemas de leitura vão para a pasta Problemas, que (com os logs do renomeador) não é arquivada.
+    """
+
+    tool_name = TOOL_NAME
+    parse_headers = staticmethod(parse_headers_default)  # Interpretação do renomear_eml
+
+    def __init__(self, folder: str, archive_root: Optional[str] = None,
+                 progress: Optional[ProgressReporter] = None, read_concurrency: int = 1):
+        super().__init__(folder, archive_root or folder, progress=progress, read_concurrency=read_concurrency)
+        # Usado só pelas funções de nome, data e pasta Problemas (e pelo log de renomeações)
+        self.renamer = EmlRenamer(folder, progress=self.progress)
+        self.excluded_folders_lower += [PROBLEMS_SUBFOLDER.lower(), RENAMER_LOG_FOLDER_NAME.lower()]
+
+    def run(self) -> None:
+        """Renomeia e arquiva a pasta."""
+        self.process_files_recursively()
+        self.renamer.log_aggregator.flush()
+
+    def close_loggers(self) -> None:
+        """Grava o que falta dos dois logs (arquivamento e renomeações)."""
+        close_logger(self.logger)
+        close_logger(self.renamer.logger)
+
+    def _run_error_count(self) -> int:
+        """Erros do arquivamento e da renomeação registrados até agora."""
+        return self.error_count + self.renamer.error_count
+
+    def process_eml_file(self, eml_path: Path, headers: Optional[email.message.Message] = None) -> None:
+        """Renomeia e arquiva de uma vez um .eml da pasta principal; os das subpastas só são arquivados."""
+        if eml_path.parent != self.watch_folder:
+            super().process_eml_file(eml_path, headers)
+            return
+
+        renamer = self.renamer
+        try:
+            with self.metrics.stage(STAGE_HEADER_PARSE):
+                msg, formatted_date, subject_str, from_str = renamer._read_name_fields(eml_path, headers)
+        except Exception as e:
+            renamer._handle_problematic_file(eml_path, str(e))
+            return
+
+        with self.metrics.stage(STAGE_DATE_PARSE):
+            date_obj = self._parse_date(msg.get("Date"), eml_path)
+        target_archive_folder = self.archive_root / date_obj.strftime("%Y") / date_obj.strftime("%Y-%m")
+
+        new_filename = self._free_renamed_filename(
+            target_archive_folder, eml_path, formatted_date,
+            renamer._sanitize_filename_part(subject_str, MAX_SUBJECT_LEN),
+            renamer._sanitize_filename_part(from_str, MAX_SENDER_LEN))
+        if new_filename is None:
+            renamer._handle_problematic_file(
+                eml_path, f"Excesso de duplicatas (limite de sufixo "
+                          f"'{renamer._get_alphabetic_suffix(MAX_SUFFIX_ATTEMPTS - 1)}' atingido)")
+            return
+
+        moved_before = self.moved_files_count
+        try:
+            self.move_file_to_archive(eml_path, target_archive_folder, target_filename=new_filename)
+        except Exception as e:
+            self.logger.error(
+                f"{eml_path.name} - Motivo: Erro ao determinar pasta de destino ou iniciar movimentação. Detalhes: {e}")
+            self.error_count += 1
+            return
+        if self.moved_files_count > moved_before:
+            renamer.renamed_count += 1
+            renamer.logger.info(f"Renomeado '{eml_path.name}' para "
+                                f"'{target_archive_folder.relative_to(self.archive_root) / new_filename}'")
+
+    def _free_renamed_filename(self, target_folder: Path, eml_path: Path, formatted_date: str,
+                               sanitized_subject: str, sanitized_sender: str) -> Optional[str]:
+        """
+        Primeiro nome do EmlRenamer (sem sufixo, depois 'a', 'b', ..., 'zz') ainda livre na pasta
+        de destino, já como o arquivador o gravaria. None se todos os sufixos estiverem em uso.
+        """
+        renamer = self.renamer
+        max_allowed_path = arquiva_subpastas.EFFECTIVE_MAX_PATH - arquiva_subpastas.SAFE_PATH_MARGIN
+        for attempt_number in range(MAX_SUFFIX_ATTEMPTS):
+            suffix_letter = renamer._get_alphabetic_suffix(attempt_number)
+            filename = renamer._build_base_name(formatted_date, suffix_letter, sanitized_subject,
+                                                sanitized_sender, eml_path) + eml_path.suffix
+            stored_name = self._truncate_filename(target_folder, self._sanitize_filename(filename), max_allowed_path)
+            if not (target_folder / stored_name).exists():
+                return filename
+            renamer.log_aggregator.log(
+                logging.INFO, "nomes já existentes", target_folder.name,
+                f"Nome '{stored_name}' (sufixo '{suffix_letter}') já existe em '{target_folder}'. "
+                f"Tentando próximo sufixo para '{eml_path.name}'.")
+        return None
+
+    def summary_dict(self) -> Dict[str, Any]:
+        """Resumo do arquivamento com os contadores da renomeação (JSON)."""
+        summary = super().summary_dict()
+        summary.update({
+            "renamed_count": self.renamer.renamed_count,
+            "moved_to_problems_count": self.renamer.moved_to_problems_count,
+            "rename_log_folder": str(self.renamer.log_folder_path),
+            "error_count": self.error_count + self.renamer.error_count,
+        })
+        return summary
+
+
+def build_arg_parser() -> argparse.ArgumentParser:
+    """Cria o parser de argumentos da linha de comando."""
+    parser = argparse.ArgumentParser(
+        description="Renomeia os .eml como o renomear_eml e os arquiva em Ano/Ano-Mês como o arquiva_subpastas, "
+                    "lendo cada mensagem uma única vez.")
+    parser.add_argument("pasta", help="Pasta com os .eml a renomear e organizar (e suas subpastas).")
+    parser.add_argument(
+        "--raiz-arquivo", dest="raiz_arquivo",
+        help="Pasta raiz onde a estrutura Ano/Ano-Mês será criada (padrão: a própria pasta).")
+    add_read_concurrency_argument(parser)
+    return parser
+
+
+def run_headless(args: argparse.Namespace, progress: Optional[ProgressReporter] = None) -> Dict[str, Any]:
+    """Renomeia e arquiva a pasta e retorna o resumo em formato serializável."""
+    pipeline = RenameArchivePipeline(args.pasta, args.raiz_arquivo, progress=progress,
+                                     read_concurrency=args.leituras_simultaneas)
+    try:
+        pipeline.run()
+    finally:
+        pipeline.close_loggers()
+    return pipeline.summary_dict()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Ponto de entrada da linha de comando: imprime o resumo em JSON."""
+    args = build_arg_parser().parse_args(argv)
+    # Mensagens de progresso vão para stderr; stdout fica reservado ao resumo JSON
+    with contextlib.redirect_stdout(sys.stderr):
+        summary = run_headless(args)
+    print(json.dumps(summary, indent=2))
+    return 1 if summary["error_count"] else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
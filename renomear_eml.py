@@ -1,22 +1,29 @@
-import tkinter as tk_module # Alias para evitar conflitos
-from tkinter import filedialog, messagebox
+import argparse
+import contextlib
 import email
+import json
 from email import policy
 from email.header import decode_header, make_header
 from email.utils import parsedate_to_datetime
+from functools import lru_cache
 from datetime import datetime, timezone # Import datetime from datetime
 import re
+import sys
 import shutil
 import logging
 from pathlib import Path
-from typing import Optional, Tuple
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from indice_mensagens import INDEX_FILENAME, MessageIndex
+from leitura_cabecalhos import add_read_concurrency_argument, parse_headers_default, process_with_prefetch, read_headers
+from progresso import ProgressReporter
+from registro import LogAggregator, close_logger, setup_file_logger
+from sanitizacao import sanitize_filename_part
 
 # --- Constantes ---
 PROBLEMS_SUBFOLDER = "Problemas" # Nova pasta para erros de leitura
 LOG_FOLDER_NAME = "LOGS_RENOMEAR_EML" # Pasta para logs específicos deste script
 LOG_FILENAME_PREFIX = "renomear_eml_log_"
-# Caracteres inválidos para nomes de arquivo no Windows/Unix
-INVALID_FILENAME_CHARS = r'[<>:"/\\|?*\x00-\x1f\r\n]' # Adicionado \r\n
 MAX_SUBJECT_LEN = 149       # Limite para o assunto (ajustado para caber em MAX_ALLOWED_FILENAME_BASE_LEN)
 MAX_SENDER_LEN = 30         # Limite para o remetente
 DEFAULT_MAX_PART_LEN = 60   # Limite padrão para outras partes do nome
@@ -26,8 +33,85 @@ FALLBACK_INVALID_PART_NAME = "Invalido"
 FALLBACK_HEADER_DECODE_ERROR = "Cabecalho_Indecifravel"
 # Para sufixos de duplicatas: "" (sem sufixo), "a"-"z" (26), "aa"-"zz" (26*26=676). Total = 1+26+676 = 703 tentativas.
 MAX_SUFFIX_ATTEMPTS = 1 + 26 + (26 * 26)
+# Valores distintos lembrados por cada cache de cabeçalhos/partes de nome (remetentes se repetem muito)
+HEADER_CACHE_SIZE = 4096
 # --- Fim Constantes ---
 
+
+@lru_cache(maxsize=HEADER_CACHE_SIZE)
+def _fetch_header_value(name: str, raw_value: str) -> str:
+    """
+    Valor bruto de um cabeçalho (como o parser o guarda, sem interpretar, no estilo compat32)
+    convertido no que msg.get(name) retornaria com email.policy.default.
+    """
+    return str(policy.default.header_fetch_parse(name, raw_value))
+
+
+@lru_cache(maxsize=HEADER_CACHE_SIZE)
+def _decode_rfc2047(header_string: str) -> str:
+    """Decodifica as palavras codificadas (RFC 2047) do cabeçalho. Falhas levantam e não ficam em cache."""
+    return str(make_header(decode_header(header_string)))
+
+
+@lru_cache(maxsize=HEADER_CACHE_SIZE)
+def _sanitize_name_part(text: str, max_len: int) -> str:
+    """sanitize_filename_part com o fallback de parte inválida, em cache."""
+    return sanitize_filename_part(text, max_len) or FALLBACK_INVALID_PART_NAME
+
+
+def get_email_body_content(msg: email.message.Message, logger: Optional[logging.Logger] = None) -> str:
+    """
+    Extrai o conteúdo de texto simples (partes text/plain que não são anexos) do corpo do e-mail.
+    Usada pelo EmlRenamer (data no corpo) e pelo índice de busca (busca_mensagens.py).
+    """
+    logger = logger or logging.getLogger(__name__)
+    body_parts = []
+    if msg.is_multipart():
+        for part in msg.walk():
+            content_type = part.get_content_type()
+            content_disposition = str(part.get("Content-Disposition", "")).lower()
+
+            if content_type == "text/plain" and "attachment" not in content_disposition:
+                payload = part.get_payload(decode=True)
+                if payload:
+                    charset = part.get_content_charset()
+                    decoded_payload_str = None
+                    if charset:
+                        try:
+                            decoded_payload_str = payload.decode(charset, errors='replace')
+                        except (UnicodeDecodeError, LookupError):
+                            logger.debug(f"Falha ao decodificar payload com charset '{charset}', tentando fallbacks.")
+                    # Se charset falhou, não foi especificado, ou payload ainda é None
+                    if decoded_payload_str is None:
+                        try:
+                            decoded_payload_str = payload.decode('utf-8', errors='replace')
+                        except UnicodeDecodeError:
+                            try:
+                                decoded_payload_str = payload.decode('latin-1', errors='replace')
+                            except UnicodeDecodeError:
+                                logger.warning(f"Não foi possível decodificar parte do corpo (text/plain) com utf-8 nem latin-1.")
+                                decoded_payload_str = "" # Evita adicionar None
+                    if decoded_payload_str: # Adiciona apenas se houver conteúdo
+                        body_parts.append(decoded_payload_str)
+    else: # Não é multipart
+        payload = msg.get_payload(decode=True)
+        if payload:
+            charset = msg.get_content_charset() or 'utf-8' # Default para utf-8
+            decoded_payload_str = None
+            try:
+                decoded_payload_str = payload.decode(charset, errors='replace')
+            except (UnicodeDecodeError, LookupError):
+                logger.debug(f"Falha ao decodificar payload (não multipart) com charset '{charset}', tentando latin-1.")
+                try:
+                    decoded_payload_str = payload.decode('latin-1', errors='replace')
+                except UnicodeDecodeError:
+                    logger.warning(f"Não foi possível decodificar payload (não multipart) com charset '{charset}' nem latin-1.")
+            if decoded_payload_str:
+                body_parts.append(decoded_payload_str)
+
+    return "\n".join(filter(None, body_parts))
+
+
 class EmlRenamer:
     """
     Processa arquivos .eml em uma pasta, renomeando-os com base em seus cabeçalhos
@@ -35,12 +119,22 @@ class EmlRenamer:
     para subpastas designadas.
     """
 
-    def __init__(self, base_folder_path: str):
+    def __init__(self, base_folder_path: str, progress: Optional[ProgressReporter] = None,
+                 read_concurrency: int = 1, index_path: Optional[str] = None):
+        self.progress: ProgressReporter = progress or ProgressReporter()
+        # Acima de 1, os cabeçalhos são lidos antecipadamente em paralelo (compartilhamentos de rede)
+        self.read_concurrency = read_concurrency
+        # Se informado, data/assunto/remetente (e mais) de cada mensagem são gravados neste índice SQLite
+        self.index_path: Optional[Path] = Path(index_path) if index_path else None
+        self.message_index: Optional[MessageIndex] = None
+        self.index_stats: Dict[str, Any] = {}
         self.base_folder: Path = Path(base_folder_path).resolve()
         self.problems_path: Path = self.base_folder / PROBLEMS_SUBFOLDER
         self.log_folder_path: Path = self.base_folder / LOG_FOLDER_NAME
         
         self.logger: logging.Logger = self._setup_logger()
+        # As tentativas de data e de sufixo repetidas viram uma linha de resumo no fim da execução
+        self.log_aggregator = LogAggregator(self.logger)
 
         # Contadores
         self.renamed_count: int = 0
@@ -54,54 +148,31 @@ class EmlRenamer:
         timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
         log_file = self.log_folder_path / f"{LOG_FILENAME_PREFIX}{timestamp}.log"
 
-        logger = logging.getLogger(f"{__name__}.EmlRenamer.{id(self)}")
-        logger.setLevel(logging.INFO) # Captura INFO, WARNING, ERROR
-        logger.propagate = False
-
-        if logger.hasHandlers():
-            logger.handlers.clear()
-
+        logger_name = f"{__name__}.EmlRenamer.{id(self)}"
         try:
-            file_handler = logging.FileHandler(str(log_file), encoding='utf-8')
-            formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
-            file_handler.setFormatter(formatter)
-            logger.addHandler(file_handler)
+            # Captura INFO, WARNING, ERROR; gravado em segundo plano (registro.py)
+            return setup_file_logger(logger_name, log_file, logging.INFO, '%(asctime)s - %(levelname)s - %(message)s')
         except Exception as e:
             print(f"ERRO CRÍTICO: Não foi possível configurar o logger em {log_file}. Erro: {e}")
             # Adiciona um NullHandler para evitar que o programa falhe se o logger for usado
+            logger = logging.getLogger(logger_name)
+            logger.propagate = False
             logger.addHandler(logging.NullHandler())
-        return logger
+            return logger
 
     def _sanitize_filename_part(self, text: Optional[str], max_len: int) -> str:
         """Limpa uma string para ser usada em nomes de arquivo."""
         if not text:
             return FALLBACK_PART_NAME
-        
-        sanitized = re.sub(INVALID_FILENAME_CHARS, '_', text)
-        sanitized = re.sub(r'[\s_.-]+', '_', sanitized) # Múltiplos espaços/underscores/pontos/hífens para um único underscore
-        sanitized = sanitized.strip('_') # Remove underscores no início/fim
-        
-        if len(sanitized) > max_len:
-            base_part = sanitized[:max_len]
-            # Tenta cortar em um underscore antes do limite para manter palavras
-            if '_' in base_part:
-                # Garante que não corte para uma string vazia se o primeiro underscore for o último char permitido
-                cut_part = base_part.rsplit('_', 1)[0]
-                sanitized = cut_part if cut_part else base_part
-            else: # Se não houver underscore, corta diretamente
-                 sanitized = base_part
-        if not sanitized: # Se tudo foi removido
-            return FALLBACK_INVALID_PART_NAME
-        return sanitized
+        # Se tudo foi removido, usa o fallback de parte inválida
+        return _sanitize_name_part(text, max_len)
 
     def _decode_email_header(self, header_string: Optional[str]) -> str:
         """Decodifica um cabeçalho de e-mail (Subject, From, To)."""
         if header_string is None:
             return ""
         try:
-            decoded_parts = decode_header(header_string)
-            header = make_header(decoded_parts)
-            return str(header)
+            return _decode_rfc2047(header_string)
         except Exception as e:
             self.logger.warning(f"Falha ao decodificar cabeçalho: '{header_string}'. Erro: {e}")
             # Tenta uma decodificação forçada como fallback
@@ -116,53 +187,22 @@ class EmlRenamer:
             except Exception:
                 return FALLBACK_HEADER_DECODE_ERROR
 
+    def _header_text(self, msg: email.message.Message, name: str) -> str:
+        """
+        Cabeçalho `name` (minúsculo) decodificado como _decode_email_header(msg.get(name)), mas a
+        partir do valor bruto guardado pelo parser: interpretação e decodificação ficam em cache
+        por valor bruto, então um remetente repetido não é interpretado de novo.
+        """
+        for key, raw_value in msg.raw_items():
+            if key.lower() == name:
+                if isinstance(raw_value, str):
+                    return self._decode_email_header(_fetch_header_value(name, raw_value))
+                break  # Valor já interpretado (atribuído em código): caminho normal
+        return self._decode_email_header(msg.get(name))
+
     def _get_email_body_content(self, msg: email.message.Message) -> str:
         """Extrai o conteúdo de texto simples do corpo do e-mail."""
-        body_parts = []
-        if msg.is_multipart():
-            for part in msg.walk():
-                content_type = part.get_content_type()
-                content_disposition = str(part.get("Content-Disposition", "")).lower()
-
-                if content_type == "text/plain" and "attachment" not in content_disposition:
-                    payload = part.get_payload(decode=True)
-                    if payload:
-                        charset = part.get_content_charset()
-                        decoded_payload_str = None
-                        if charset:
-                            try:
-                                decoded_payload_str = payload.decode(charset, errors='replace')
-                            except (UnicodeDecodeError, LookupError):
-                                self.logger.debug(f"Falha ao decodificar payload com charset '{charset}', tentando fallbacks.")
-                        # Se charset falhou, não foi especificado, ou payload ainda é None
-                        if decoded_payload_str is None:
-                            try:
-                                decoded_payload_str = payload.decode('utf-8', errors='replace')
-                            except UnicodeDecodeError:
-                                try:
-                                    decoded_payload_str = payload.decode('latin-1', errors='replace')
-                                except UnicodeDecodeError:
-                                    self.logger.warning(f"Não foi possível decodificar parte do corpo (text/plain) com utf-8 nem latin-1.")
-                                    decoded_payload_str = "" # Evita adicionar None
-                        if decoded_payload_str: # Adiciona apenas se houver conteúdo
-                            body_parts.append(decoded_payload_str)
-        else: # Não é multipart
-            payload = msg.get_payload(decode=True)
-            if payload:
-                charset = msg.get_content_charset() or 'utf-8' # Default para utf-8
-                decoded_payload_str = None
-                try:
-                    decoded_payload_str = payload.decode(charset, errors='replace')
-                except (UnicodeDecodeError, LookupError):
-                    self.logger.debug(f"Falha ao decodificar payload (não multipart) com charset '{charset}', tentando latin-1.")
-                    try:
-                        decoded_payload_str = payload.decode('latin-1', errors='replace')
-                    except UnicodeDecodeError:
-                        self.logger.warning(f"Não foi possível decodificar payload (não multipart) com charset '{charset}' nem latin-1.")
-                if decoded_payload_str:
-                    body_parts.append(decoded_payload_str)
-        
-        return "\n".join(filter(None, body_parts))
+        return get_email_body_content(msg, self.logger)
 
     def _extract_date_time_from_body(self, body_content: str) -> Optional[datetime]:
         """
@@ -190,16 +230,19 @@ class EmlRenamer:
             try:
                 year = int("20" + yy) # Assume século 21
                 dt_obj = datetime(year, int(mm_date), int(dd), int(hh), int(min_time))
-                self.logger.info(f"Data/hora extraída do corpo do e-mail (após 'Mensagem='): {dt_obj.strftime('%Y-%m-%d %H:%M')}")
+                self.log_aggregator.log(logging.INFO, "datas extraídas do corpo", str(self.base_folder),
+                                        f"Data/hora extraída do corpo do e-mail (após 'Mensagem='): {dt_obj.strftime('%Y-%m-%d %H:%M')}")
                 return dt_obj
             except ValueError as ve:
                 self.logger.warning(f"Valor de data/hora inválido ('{data_hora_line_str}') extraído do corpo: {ve}")
         return None
 
-    def _get_formatted_date(self, msg: email.message.Message, date_header_string: Optional[str], fallback_file_path: Optional[Path] = None) -> str:
+    def _get_formatted_date(self, msg: email.message.Message, date_header_string: Optional[str], fallback_file_path: Optional[Path] = None,
+                            full_message_loader: Optional[Callable[[], email.message.Message]] = None) -> str:
         """
         Analisa o cabeçalho Date, tenta extrair do corpo do e-mail, ou usa data de modificação
         do arquivo como fallback. Retorna 'YYYY MM DD HHMM'.
+        Se `msg` tem apenas os cabeçalhos, `full_message_loader` lê a mensagem completa quando o corpo é necessário.
         """
         dt_object: Optional[datetime] = None
 
@@ -222,20 +265,26 @@ class EmlRenamer:
         # 2. Se não conseguiu pelo cabeçalho, tenta extrair do corpo do e-mail
         if not dt_object:
             file_id_for_log = fallback_file_path.name if fallback_file_path else "arquivo desconhecido"
-            self.logger.info(f"Data não encontrada/parseada no cabeçalho. Tentando extrair do corpo para '{file_id_for_log}'.")
+            self.log_aggregator.log(logging.INFO, "datas ausentes no cabeçalho", str(self.base_folder),
+                                    f"Data não encontrada/parseada no cabeçalho. Tentando extrair do corpo para '{file_id_for_log}'.")
+            if full_message_loader is not None:
+                msg = full_message_loader()
             email_body = self._get_email_body_content(msg)
             if email_body:
                 dt_object_from_body = self._extract_date_time_from_body(email_body)
                 if dt_object_from_body:
                     dt_object = dt_object_from_body
                 else:
-                    self.logger.info(f"Não foi possível extrair data/hora do corpo do e-mail para '{file_id_for_log}'.")
+                    self.log_aggregator.log(logging.INFO, "datas ausentes no corpo", str(self.base_folder),
+                                            f"Não foi possível extrair data/hora do corpo do e-mail para '{file_id_for_log}'.")
             else:
-                self.logger.info(f"Corpo do e-mail vazio ou não extraído para '{file_id_for_log}'. Não foi possível tentar extrair data do corpo.")
+                self.log_aggregator.log(logging.INFO, "corpos vazios", str(self.base_folder),
+                                        f"Corpo do e-mail vazio ou não extraído para '{file_id_for_log}'. Não foi possível tentar extrair data do corpo.")
 
         # 3. Se ainda não há data, usa data de modificação do arquivo como fallback
         if not dt_object and fallback_file_path and fallback_file_path.exists(): # type: ignore
-            self.logger.info(f"Usando data de modificação do arquivo '{fallback_file_path.name}' como fallback para data principal.")
+            self.log_aggregator.log(logging.INFO, "datas de modificação usadas", str(self.base_folder),
+                                    f"Usando data de modificação do arquivo '{fallback_file_path.name}' como fallback para data principal.")
             try:
                  mod_time = fallback_file_path.stat().st_mtime
                  dt_object = datetime.fromtimestamp(mod_time)
@@ -317,36 +366,80 @@ class EmlRenamer:
             return chr(ord('a') + first_char_index) + chr(ord('a') + second_char_index)
         return f"_err_suffix_{attempt_number}" # Fallback se exceder zz, não deve acontecer com MAX_SUFFIX_ATTEMPTS
 
-    def _process_single_eml(self, original_path: Path) -> None:
-        """Processa um único arquivo .eml."""
-        # self.logger.info(f"Processando: {original_path.name}") # Log removido conforme solicitado
+    def _read_message(self, original_path: Path) -> email.message.Message:
+        """Lê o .eml completo (binário; se falhar, como texto UTF-8 ou Latin-1)."""
+        msg = None
         try:
-            msg = None
+            with original_path.open('rb') as f:
+                msg = email.message_from_binary_file(f, policy=policy.default)
+        except Exception as bin_read_err: # Captura erros mais amplos na leitura binária
+            self.logger.warning(f"Falha ao ler '{original_path.name}' como binário com policy default ({bin_read_err}), tentando leitura manual...")
             try:
-                with original_path.open('rb') as f:
-                    msg = email.message_from_binary_file(f, policy=policy.default)
-            except Exception as bin_read_err: # Captura erros mais amplos na leitura binária
-                self.logger.warning(f"Falha ao ler '{original_path.name}' como binário com policy default ({bin_read_err}), tentando leitura manual...")
+                with original_path.open('r', encoding='utf-8', errors='ignore') as f:
+                    msg = email.message_from_file(f, policy=policy.default)
+            except UnicodeDecodeError:
                 try:
-                    with original_path.open('r', encoding='utf-8', errors='ignore') as f:
+                    with original_path.open('r', encoding='latin-1', errors='ignore') as f:
                         msg = email.message_from_file(f, policy=policy.default)
-                except UnicodeDecodeError:
-                    try:
-                        with original_path.open('r', encoding='latin-1', errors='ignore') as f:
-                            msg = email.message_from_file(f, policy=policy.default)
-                    except Exception as fallback_read_err:
-                        raise fallback_read_err # Re-levanta para o except externo
+                except Exception as fallback_read_err:
+                    raise fallback_read_err # Re-levanta para o except externo
 
-            if not msg:
-                raise ValueError("Não foi possível interpretar o arquivo EML após tentativas de leitura.")
+        if not msg:
+            raise ValueError("Não foi possível interpretar o arquivo EML após tentativas de leitura.")
+        return msg
 
-            date_str = msg.get("Date")
-            subject_str = self._decode_email_header(msg.get("Subject"))
-            from_str = self._decode_email_header(msg.get("From"))
-            # message_id_str = msg.get("Message-ID") # Não é mais usado no nome do arquivo
+    def _read_name_fields(self, original_path: Path, headers: Optional[email.message.Message] = None
+                          ) -> Tuple[email.message.Message, str, str, str]:
+        """
+        Lê o cabeçalho (se `headers` não vier pronto) e retorna a mensagem, a data formatada
+        ('YYYY MM DD HHMM'), o assunto e o remetente decodificados. O arquivo completo só é lido
+        se a data tiver de ser buscada no corpo ou se a leitura do cabeçalho falhar.
+        """
+        if headers is None:
+            try:
+                headers = read_headers(original_path, parse_headers_default)
+            except Exception:
+                headers = None  # A leitura completa abaixo registra o problema
+        if headers:
+            msg = headers
+            full_message_loader: Optional[Callable[[], email.message.Message]] = lambda: self._read_message(original_path)
+        else:
+            msg = self._read_message(original_path)
+            full_message_loader = None
+
+        date_str = msg.get("Date")
+        subject_str = self._header_text(msg, "subject")
+        from_str = self._header_text(msg, "from")
+        # message_id_str = msg.get("Message-ID") # Não é mais usado no nome do arquivo
+
+        formatted_date = self._get_formatted_date(msg, date_str, fallback_file_path=original_path,
+                                                  full_message_loader=full_message_loader)
+        return msg, formatted_date, subject_str, from_str
+
+    def _build_base_name(self, formatted_date: str, suffix_letter: str, sanitized_subject: str,
+                         sanitized_sender: str, original_path: Path) -> str:
+        """Monta o nome base (sem extensão) 'YYYY MM DD HHMM{sufixo} - Assunto - Remetente', truncado no limite."""
+        base_name_candidate = f"{formatted_date}{suffix_letter} - {sanitized_subject} - {sanitized_sender}"
+
+        # Truncar o nome base candidato se exceder o limite global
+        if len(base_name_candidate) > MAX_ALLOWED_FILENAME_BASE_LEN:
+            original_candidate_for_log = base_name_candidate
+            base_name_candidate = base_name_candidate[:MAX_ALLOWED_FILENAME_BASE_LEN]
+            self.logger.warning(f"Nome base truncado de '{original_candidate_for_log}' para '{base_name_candidate}' para o arquivo '{original_path.name}' devido ao limite de {MAX_ALLOWED_FILENAME_BASE_LEN} caracteres.")
+        return base_name_candidate
+
+    def _process_single_eml(self, original_path: Path, headers: Optional[email.message.Message] = None) -> None:
+        """
+        Processa um único arquivo .eml. `headers` são os cabeçalhos já lidos antecipadamente, se
+        houver; senão só o cabeçalho é lido aqui (mmap para arquivos grandes). O arquivo completo
+        só é lido se a data tiver de ser buscada no corpo ou se a leitura do cabeçalho falhar.
+        """
+        # self.logger.info(f"Processando: {original_path.name}") # Log removido conforme solicitado
+        try:
+            _msg, formatted_date, subject_str, from_str = self._read_name_fields(original_path, headers)
+
+            final_path: Optional[Path] = None  # Onde o arquivo ficou, para o índice
 
-            formatted_date = self._get_formatted_date(msg, date_str, fallback_file_path=original_path)
-            
             sanitized_subject = self._sanitize_filename_part(subject_str, MAX_SUBJECT_LEN)
             sanitized_sender = self._sanitize_filename_part(from_str, MAX_SENDER_LEN)
             # sanitized_message_id não é mais necessário para o nome do arquivo
@@ -359,15 +452,8 @@ class EmlRenamer:
                     return  # Aborta para este arquivo
 
                 suffix_letter = self._get_alphabetic_suffix(current_attempt_number)
-                # Construir o nome base candidato
-                # Formato: YYYY MM DD HHMM{sufixo_opcional} - Subject - From
-                base_name_candidate = f"{formatted_date}{suffix_letter} - {sanitized_subject} - {sanitized_sender}"
-
-                # Truncar o nome base candidato se exceder o limite global
-                if len(base_name_candidate) > MAX_ALLOWED_FILENAME_BASE_LEN:
-                    original_candidate_for_log = base_name_candidate
-                    base_name_candidate = base_name_candidate[:MAX_ALLOWED_FILENAME_BASE_LEN]
-                    self.logger.warning(f"Nome base truncado de '{original_candidate_for_log}' para '{base_name_candidate}' para o arquivo '{original_path.name}' devido ao limite de {MAX_ALLOWED_FILENAME_BASE_LEN} caracteres.")
+                base_name_candidate = self._build_base_name(formatted_date, suffix_letter, sanitized_subject,
+                                                            sanitized_sender, original_path)
 
                 new_filename_with_ext = f"{base_name_candidate}{original_path.suffix}"
                 potential_target_path = self.base_folder / new_filename_with_ext
@@ -381,27 +467,46 @@ class EmlRenamer:
                         original_path.rename(potential_target_path)
                         self.logger.info(f"Renomeado '{original_path.name}' para '{potential_target_path.name}'")
                         self.renamed_count += 1
+                        final_path = potential_target_path
+                        if self.message_index is not None:
+                            self.message_index.forget(original_path)
                     except Exception as rename_err:
                         self.logger.error(f"Erro ao renomear '{original_path.name}' para '{potential_target_path.name}': {rename_err}")
                         self.error_count += 1
+                        final_path = original_path
                     break # Sucesso, sai do loop while
                 else:
                     # Nome já existe. Verificar se é o próprio arquivo.
                     if original_path.resolve() == potential_target_path.resolve():
                         # O arquivo já tem o nome correto (com ou sem sufixo). Nenhuma ação.
                         # self.logger.info(f"Nome '{original_path.name}' já está correto. Ignorando renomeação.")
+                        final_path = original_path
                         break # Sai do loop while
                     else:
                         # É um arquivo diferente com o mesmo nome de destino.
                         # Prepara para tentar o próximo sufixo.
-                        self.logger.info(f"Nome '{potential_target_path.name}' (sufixo '{suffix_letter}') já existe. Tentando próximo sufixo para '{original_path.name}'.")
+                        self.log_aggregator.log(
+                            logging.INFO, "nomes já existentes", f"{formatted_date[:4]}-{formatted_date[5:7]}",
+                            f"Nome '{potential_target_path.name}' (sufixo '{suffix_letter}') já existe. Tentando próximo sufixo para '{original_path.name}'.")
                         current_attempt_number += 1
                         # O loop continuará
 
+            if self.message_index is not None and final_path is not None:
+                self._index_message(final_path, formatted_date, subject_str, from_str)
+
         except Exception as e:
             # Se qualquer outra exceção ocorrer durante o processamento do arquivo (incluindo falhas de leitura não tratadas antes)
             self._handle_problematic_file(original_path, str(e))
 
+    def _index_message(self, file_path: Path, formatted_date: str, subject: str, sender: str) -> None:
+        """Grava a mensagem no índice; falhas não interrompem a renomeação."""
+        try:
+            date_obj = datetime.strptime(formatted_date, "%Y %m %d %H%M")
+            self.message_index.record(file_path, date_obj, subject, sender)  # type: ignore[union-attr]
+        except Exception as index_err:
+            self.logger.error(f"Erro ao indexar '{file_path.name}': {index_err}")
+            self.error_count += 1
+
     def run(self) -> str:
         """Processa todos os arquivos .eml na pasta base."""
         self.logger.info(f"Iniciando processamento da pasta: {self.base_folder}")
@@ -409,9 +514,10 @@ class EmlRenamer:
         if not self.base_folder.is_dir():
             error_msg = f"O caminho selecionado não é uma pasta válida: {self.base_folder}"
             self.logger.error(error_msg)
-            messagebox.showerror("Erro de Pasta", error_msg)
+            self.error_count += 1
             return f"ERRO: {error_msg}"
 
+        eml_paths = []
         for item_path in self.base_folder.iterdir():
             # Pula subpastas (incluindo as especiais) e arquivos que não são .eml
             if item_path.is_dir():
@@ -423,12 +529,53 @@ class EmlRenamer:
                 self.skipped_count += 1
                 continue
 
-            self._process_single_eml(item_path)
+            eml_paths.append(item_path)
+
+        if self.index_path is not None:
+            try:
+                self.message_index = MessageIndex(self.index_path, self.base_folder)
+            except Exception as index_err:
+                self.logger.error(f"Não foi possível abrir o índice '{self.index_path}': {index_err}. Continuando sem índice.")
+                self.error_count += 1
+
+        # A lista é montada antes para que o total (e o tempo restante) seja conhecido
+        self.progress.start(total=len(eml_paths), stage="Renomeando")
+        try:
+            if self.read_concurrency > 1:
+                process_with_prefetch(eml_paths, self._handle_eml, self.read_concurrency, parse=parse_headers_default,
+                                      should_stop=lambda: self.progress.cancelled)
+            else:
+                for item_path in eml_paths:
+                    if self.progress.cancelled:
+                        break
+                    self._handle_eml(item_path)
+        finally:
+            if self.message_index is not None:
+                self._close_index()
+        self.log_aggregator.flush()
+        self.progress.finish(moved=self.renamed_count, errors=self.error_count)
 
         summary = self._generate_summary()
         self.logger.info(f"Processamento concluído para {self.base_folder}.\n{summary}")
         return summary
 
+    def _close_index(self) -> None:
+        """Grava o índice e, se a pasta foi percorrida até o fim, remove mensagens que não estão mais nela."""
+        index = self.message_index
+        try:
+            removed_count = 0 if self.progress.cancelled else index.prune_unseen()  # type: ignore[union-attr]
+            self.index_stats = {**index.stats(), "removed_count": removed_count}  # type: ignore[union-attr]
+            index.close()  # type: ignore[union-attr]
+        except Exception as index_err:
+            self.logger.error(f"Erro ao gravar o índice '{self.index_path}': {index_err}")
+            self.error_count += 1
+        self.message_index = None
+
+    def _handle_eml(self, item_path: Path, headers: Optional[email.message.Message] = None) -> None:
+        """Processa um .eml da lista e atualiza o progresso."""
+        self._process_single_eml(item_path, headers)
+        self.progress.advance(moved=self.renamed_count, errors=self.error_count)
+
     def _generate_summary(self) -> str:
         """Gera a mensagem de resumo do processamento."""
         summary_lines = [
@@ -438,10 +585,34 @@ class EmlRenamer:
             f"Arquivos/Pastas ignorados (não .eml ou pastas especiais): {self.skipped_count}",
             f"Erros totais encontrados (leitura/renomeação/movimentação): {self.error_count}"
         ]
+        if self.index_stats:
+            summary_lines.append(
+                f"Índice de mensagens: {self.index_stats['indexed_count']} indexadas, "
+                f"{self.index_stats['unchanged_count']} sem alteração, {self.index_stats['removed_count']} removidas "
+                f"({self.index_stats['index_path']})")
+        if self.progress.cancelled:
+            summary_lines.append("\nOperação cancelada pelo usuário antes do fim; os arquivos restantes não foram processados.")
         return "\n".join(summary_lines)
 
+    def summary_dict(self) -> Dict[str, Any]:
+        """Retorna os contadores da última execução em formato serializável (JSON)."""
+        return {
+            "tool": "renomear_eml",
+            "base_folder": str(self.base_folder),
+            "renamed_count": self.renamed_count,
+            "moved_to_problems_count": self.moved_to_problems_count,
+            "skipped_count": self.skipped_count,
+            "error_count": self.error_count,
+            "cancelled": self.progress.cancelled,
+            "log_folder": str(self.log_folder_path),
+            "index": self.index_stats or None,
+        }
+
 def main_gui_flow():
     """Controla o fluxo da GUI para seleção de pasta e exibição de resultados."""
+    import tkinter as tk_module # Importado apenas no modo gráfico
+    from tkinter import filedialog, messagebox
+
     root = tk_module.Tk()
     root.withdraw()
 
@@ -454,11 +625,56 @@ def main_gui_flow():
 
     renamer = EmlRenamer(folder_path_str)
     summary_message = renamer.run()
+    close_logger(renamer.logger)  # Grava o que falta do log
     
     print("-" * 30) # Separador no console
     print(summary_message) # Imprime resumo no console também
-    messagebox.showinfo("Concluído", summary_message)
+    if summary_message.startswith("ERRO:"):
+        messagebox.showerror("Erro de Pasta", summary_message)
+    else:
+        messagebox.showinfo("Concluído", summary_message)
     root.destroy()
 
+def build_arg_parser() -> argparse.ArgumentParser:
+    """Cria o parser de argumentos da linha de comando."""
+    parser = argparse.ArgumentParser(
+        description="Renomeia arquivos .eml com base em data, assunto e remetente.")
+    parser.add_argument("pasta", nargs="?",
+                        help="Pasta com os arquivos .eml. Se omitida, abre a interface gráfica.")
+    parser.add_argument("--indice", nargs="?", const="", metavar="ARQUIVO",
+                        help="Grava data, assunto, remetente, Message-ID, tamanho, anexos e hash do corpo de cada "
+                             f"mensagem em um índice SQLite (padrão: {LOG_FOLDER_NAME}/{INDEX_FILENAME} dentro da pasta). "
+                             "Execuções seguintes só releem arquivos novos ou alterados.")
+    add_read_concurrency_argument(parser)
+    return parser
+
+def run_headless(args: argparse.Namespace, progress: Optional[ProgressReporter] = None) -> Dict[str, Any]:
+    """Executa a renomeação sem interface gráfica e retorna o resumo em formato serializável."""
+    index_path = args.indice
+    if index_path == "":
+        index_path = str(Path(args.pasta) / LOG_FOLDER_NAME / INDEX_FILENAME)
+    renamer = EmlRenamer(args.pasta, progress=progress, read_concurrency=args.leituras_simultaneas,
+                         index_path=index_path)
+    try:
+        summary_message = renamer.run()
+    finally:
+        close_logger(renamer.logger)
+    result = renamer.summary_dict()
+    result["summary"] = summary_message
+    return result
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Ponto de entrada: modo linha de comando se a pasta for informada, senão modo gráfico."""
+    args = build_arg_parser().parse_args(argv)
+    if args.pasta is None:
+        main_gui_flow()
+        return 0
+
+    # Mensagens de progresso vão para stderr; stdout fica reservado ao resumo JSON
+    with contextlib.redirect_stdout(sys.stderr):
+        summary = run_headless(args)
+    print(json.dumps(summary, indent=2))
+    return 1 if summary["error_count"] else 0
+
 if __name__ == "__main__":
-    main_gui_flow()
+    raise SystemExit(main())